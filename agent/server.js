@@ -94,6 +94,10 @@ const isAuthenticated = (req, res, next) => {
     res.status(401).json({ error: 'Not authenticated' });
 };
 
+// The backend's JWT authorizer reads the caller from this; it never trusts the source IP,
+// which is this server's for every user
+const backendAuth = (req) => ({ Authorization: `Bearer ${req.session.tokens.access_token}` });
+
 app.get('/api/auth/status', (req, res) => {
     res.json({ user: req.session.user || null });
 });
@@ -105,7 +109,7 @@ app.post('/api/submit-job', isAuthenticated, async (req, res) => {
         // Determine the correct backend endpoint based on agentType
         const endpoint = agentType === 'interleaved' ? '/interleaved-agent' : '/standard-agent';
         
-        const response = await axios.post(`${AI_BACKEND_API_URL}${endpoint}`, { query });
+        const response = await axios.post(`${AI_BACKEND_API_URL}${endpoint}`, { query }, { headers: backendAuth(req) });
         res.json({ jobId: response.data.jobId });
     } catch (error) {
         console.error(`Error starting ${req.body.agentType} job:`, error);
@@ -116,13 +120,62 @@ app.post('/api/submit-job', isAuthenticated, async (req, res) => {
 app.get('/api/status/:jobId', isAuthenticated, async (req, res) => {
     try {
         const { jobId } = req.params;
-        const response = await axios.get(`${AI_BACKEND_API_URL}/get-job-status?jobId=${jobId}`);
+        const params = new URLSearchParams({ jobId });
+        // Pass ?sinceSeq=N through so the client only receives new progress chunks
+        if (req.query.sinceSeq !== undefined) params.append('sinceSeq', req.query.sinceSeq);
+        // Completed results are only read from storage when the client asks for the body
+        if (req.query.includeResult !== undefined) params.append('includeResult', req.query.includeResult);
+        if (req.query.consistentRead !== undefined) params.append('consistentRead', req.query.consistentRead);
+        // Long poll: the backend holds the request until the job's version passes sinceVersion
+        const waitSeconds = Number(req.query.waitSeconds) || 0;
+        if (waitSeconds && req.query.sinceVersion !== undefined) {
+            params.append('waitSeconds', waitSeconds);
+            params.append('sinceVersion', req.query.sinceVersion);
+        }
+        // Conditional read: an unchanged job comes back as a bodiless 304
+        const headers = req.get('If-None-Match') ? { 'If-None-Match': req.get('If-None-Match') } : {};
+        const response = await axios.get(`${AI_BACKEND_API_URL}/get-job-status?${params}`, {
+            headers,
+            timeout: (waitSeconds + 10) * 1000,
+            validateStatus: (status) => (status >= 200 && status < 300) || status === 304,
+        });
+        if (response.headers.etag) res.set('ETag', response.headers.etag);
+        if (response.status === 304) return res.status(304).end();
         res.json(response.data);
     } catch (error) {
         res.status(500).json({ status: 'FAILED', result: 'Could not retrieve job status.' });
     }
 });
 
+// Status-only check of many jobs at once, e.g. /api/status?jobIds=a,b,c
+app.get('/api/status', isAuthenticated, async (req, res) => {
+    try {
+        const params = new URLSearchParams({ jobIds: req.query.jobIds || '' });
+        const response = await axios.get(`${AI_BACKEND_API_URL}/get-job-status?${params}`);
+        res.json(response.data);
+    } catch (error) {
+        res.status(500).json({ error: 'Could not retrieve job statuses.' });
+    }
+});
+
+// The user's own jobs, newest first: /api/jobs?limit=20&nextToken=...&status=COMPLETE
+app.get('/api/jobs', isAuthenticated, async (req, res) => {
+    try {
+        const params = new URLSearchParams();
+        for (const name of ['limit', 'nextToken', 'status']) {
+            if (req.query[name] !== undefined) params.append(name, req.query[name]);
+        }
+        const response = await axios.get(`${AI_BACKEND_API_URL}/jobs?${params}`, {
+            headers: backendAuth(req),
+            validateStatus: (status) => status < 500,
+        });
+        // 400 for a bad limit/nextToken, 401 once the session's access token has expired
+        res.status(response.status).json(response.data);
+    } catch (error) {
+        res.status(500).json({ error: 'Could not list jobs.' });
+    }
+});
+
 
 app.listen(PORT, () => {
     console.log(`Express server is running at http://localhost:${PORT}`);
@@ -0,0 +1,205 @@
+# admission.py
+# Admission control for the start lambdas: a query is checked, normalized and
+# sized before a job exists, so oversized or garbage input is turned away with
+# a 4xx instead of failing in a worker after it has spent model tokens. Callers
+# are held to a per-minute request and token budget, and accepted jobs come
+# back with a rough cost and latency estimate.
+import hashlib
+import json
+import os
+import re
+import time
+import unicodedata
+from collections import namedtuple
+
+from pre_router import estimate_tokens, pre_router
+from response_cache import normalize_text
+
+# Longest query accepted, in estimated tokens
+ADMISSION_MAX_QUERY_TOKENS = int(os.environ.get('ADMISSION_MAX_QUERY_TOKENS', '8000'))
+# 'reject' answers 413 for longer queries; 'truncate' cuts them down to the limit
+ADMISSION_OVERSIZE = os.environ.get('ADMISSION_OVERSIZE', 'reject')
+# Per authenticated caller and minute (0 disables the check)
+ADMISSION_REQUESTS_PER_MINUTE = int(os.environ.get('ADMISSION_REQUESTS_PER_MINUTE', '60'))
+ADMISSION_TOKENS_PER_MINUTE = int(os.environ.get('ADMISSION_TOKENS_PER_MINUTE', '200000'))
+# Across all callers and per minute; the only budget for callers without an identity
+ADMISSION_GLOBAL_REQUESTS_PER_MINUTE = int(os.environ.get('ADMISSION_GLOBAL_REQUESTS_PER_MINUTE', '600'))
+ADMISSION_GLOBAL_TOKENS_PER_MINUTE = int(os.environ.get('ADMISSION_GLOBAL_TOKENS_PER_MINUTE', '2000000'))
+# Estimates: USD per 1000 tokens and seconds per model call of the default Sonnet model
+ADMISSION_INPUT_PRICE_PER_1K = float(os.environ.get('ADMISSION_INPUT_PRICE_PER_1K', '0.003'))
+ADMISSION_OUTPUT_PRICE_PER_1K = float(os.environ.get('ADMISSION_OUTPUT_PRICE_PER_1K', '0.015'))
+ADMISSION_SECONDS_PER_CALL = float(os.environ.get('ADMISSION_SECONDS_PER_CALL', '6'))
+# Jobs expected to finish within this can use the synchronous endpoints (API Gateway allows 29s)
+ADMISSION_SYNC_MAX_SECONDS = float(os.environ.get('ADMISSION_SYNC_MAX_SECONDS', '25'))
+
+ADMISSION_KEY_PREFIX = 'ratelimit#submit#'
+# The budget item shared by all callers ('*' is never a principal, those start with 'sub:')
+GLOBAL_CALLER = '*'
+# Queries this long or longer must look like text
+_GARBAGE_MIN_CHARS = 64
+
+# Model calls of a typical run, and the tokens a run reads and writes on top of the query.
+# 'orchestrated' is a standard job the pre-router leaves to the orchestrator.
+RUN_PROFILES = {
+    'fast_path': {'modelCalls': 1, 'inputTokens': 150, 'outputTokens': 700},
+    'orchestrated': {'modelCalls': 3, 'inputTokens': 1200, 'outputTokens': 900},
+    'interleaved': {'modelCalls': 10, 'inputTokens': 12000, 'outputTokens': 4000},
+}
+
+# A query that passed admission: normalized (and maybe truncated) text, its fingerprint and size
+Screened = namedtuple('Screened', ['query', 'fingerprint', 'tokens', 'truncated'])
+
+
+class AdmissionError(Exception):
+    """A request turned away before any job was created."""
+
+    def __init__(self, status_code, message, retry_after=None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.message = message
+        self.retry_after = retry_after
+
+    def response(self):
+        response = {'statusCode': self.status_code, 'body': json.dumps({'error': self.message})}
+        if self.retry_after is not None:
+            response['headers'] = {'Retry-After': str(self.retry_after)}
+        return response
+
+
+def normalize_query(text):
+    """
+    What the worker gets: NFKC form, no control characters (other than
+    newlines and tabs), no trailing spaces, and no more than one blank line
+    in a row. Case and wording are kept.
+    """
+    text = unicodedata.normalize('NFKC', text)
+    text = ''.join(ch for ch in text if ch in '\n\t' or unicodedata.category(ch)[0] != 'C')
+    text = re.sub(r'[ \t]+', ' ', text)
+    text = re.sub(r' *\n *', '\n', text)
+    return re.sub(r'\n{3,}', '\n\n', text).strip()
+
+
+def fingerprint(query):
+    """Stable id of a query's content: case, unicode form and whitespace don't change it."""
+    return hashlib.sha256(normalize_text(query).encode('utf-8')).hexdigest()[:32]
+
+
+def _looks_like_text(query):
+    if len(query) < _GARBAGE_MIN_CHARS:
+        return True
+    letters = sum(1 for ch in query if ch.isalnum())
+    return letters / len(query) >= 0.3 and len(set(query)) >= 8
+
+
+def _truncate(query, max_tokens):
+    cut = query[:max_tokens * 4]
+    # At a word boundary, unless that would lose a lot
+    boundary = cut.rfind(' ')
+    return cut[:boundary] if boundary > len(cut) * 0.9 else cut
+
+
+def screen_query(query, max_tokens=ADMISSION_MAX_QUERY_TOKENS, oversize=ADMISSION_OVERSIZE):
+    """Checks and normalizes one query. Raises AdmissionError (400, 413 or 422) if it is not accepted."""
+    if query is None or query == '':
+        raise AdmissionError(400, 'Query not provided.')
+    if not isinstance(query, str):
+        raise AdmissionError(400, 'Query must be a string.')
+    query = normalize_query(query)
+    if not query:
+        raise AdmissionError(400, 'Query is empty once whitespace and control characters are removed.')
+    if not _looks_like_text(query):
+        raise AdmissionError(422, 'Query does not look like text.')
+
+    tokens, truncated = estimate_tokens(query), False
+    if tokens > max_tokens:
+        if oversize != 'truncate':
+            raise AdmissionError(413, f'Query is about {tokens} tokens; the limit is {max_tokens}.')
+        query, truncated = _truncate(query, max_tokens), True
+        tokens = estimate_tokens(query)
+    return Screened(query, fingerprint(query), tokens, truncated)
+
+
+def charge_caller(table, caller, queries, requests_per_minute=ADMISSION_REQUESTS_PER_MINUTE,
+                  tokens_per_minute=ADMISSION_TOKENS_PER_MINUTE,
+                  global_requests_per_minute=ADMISSION_GLOBAL_REQUESTS_PER_MINUTE,
+                  global_tokens_per_minute=ADMISSION_GLOBAL_TOKENS_PER_MINUTE):
+    """
+    Counts queries (the raw submitted values) against the caller's budget for
+    the current minute, then against the budget all callers share: one
+    'ratelimit#submit#<caller>#<minute>' item each, incremented with a
+    conditional write. caller is an authenticated principal, or None to only
+    apply the shared budget (a source IP would put everyone behind the proxy in
+    one bucket). Raises AdmissionError (429) when the request would go over either.
+    """
+    count = len(queries)
+    tokens = sum(estimate_tokens(q) for q in queries if isinstance(q, str))
+    if caller:
+        _charge(table, caller, count, tokens, requests_per_minute, tokens_per_minute,
+                'Too many submissions')
+    _charge(table, GLOBAL_CALLER, count, tokens, global_requests_per_minute, global_tokens_per_minute,
+            'The service is taking too many submissions')
+
+
+def _charge(table, caller, count, tokens, requests_per_minute, tokens_per_minute, reason):
+    if not requests_per_minute and not tokens_per_minute:
+        return
+    minute = int(time.time() // 60)
+    retry_after = (minute + 1) * 60 - int(time.time())
+    if (requests_per_minute and count > requests_per_minute) or (tokens_per_minute and tokens > tokens_per_minute):
+        raise AdmissionError(429, f'Request exceeds the per-minute limit of {requests_per_minute} queries '
+                                  f'and {tokens_per_minute} tokens.')
+    # Only the limits that are on (a disabled one is 0)
+    checks, values = [], {':count': count, ':tokens': tokens, ':exp': (minute + 2) * 60}
+    if requests_per_minute:
+        checks.append("#c <= :max_count")
+        values[':max_count'] = requests_per_minute - count
+    if tokens_per_minute:
+        checks.append("tokens <= :max_tokens")
+        values[':max_tokens'] = tokens_per_minute - tokens
+    try:
+        table.update_item(
+            Key={'jobId': f"{ADMISSION_KEY_PREFIX}{caller}#{minute}"},
+            UpdateExpression="set expiresAt = :exp add #c :count, tokens :tokens",
+            ConditionExpression=f"attribute_not_exists(#c) OR ({' AND '.join(checks)})",
+            ExpressionAttributeNames={'#c': 'count'},
+            ExpressionAttributeValues=values,
+        )
+    except Exception as e:
+        if getattr(e, 'response', {}).get('Error', {}).get('Code') != 'ConditionalCheckFailedException':
+            # Like the model rate limiter, admission must not take submissions down with it
+            print(f"Submission rate limit unavailable, continuing without it: {e}")
+            return
+        raise AdmissionError(429, f'{reason}; at most {requests_per_minute} queries and '
+                                  f'{tokens_per_minute} tokens per minute.', retry_after=retry_after)
+
+
+def run_profile(query, workload):
+    """Which RUN_PROFILES entry a query is expected to follow."""
+    if workload == 'interleaved':
+        return 'interleaved'
+    # The same decision the worker's pre-router makes, without recording it in its metrics
+    routed = pre_router.would_route(*pre_router.classifier.classify(query))
+    return 'fast_path' if routed else 'orchestrated'
+
+
+def estimate(screened, workload):
+    """Rough cost and latency of running the screened queries as jobs of workload."""
+    calls = input_tokens = output_tokens = 0
+    latency = 0.0
+    for item in screened:
+        profile = RUN_PROFILES[run_profile(item.query, workload)]
+        calls += profile['modelCalls']
+        # Every model call of the run reads the query again
+        input_tokens += profile['inputTokens'] + item.tokens * profile['modelCalls']
+        output_tokens += profile['outputTokens']
+        # Jobs run in parallel, so a batch takes about as long as its slowest job
+        latency = max(latency, profile['modelCalls'] * ADMISSION_SECONDS_PER_CALL)
+    cost = input_tokens / 1000 * ADMISSION_INPUT_PRICE_PER_1K + output_tokens / 1000 * ADMISSION_OUTPUT_PRICE_PER_1K
+    return {
+        'modelCalls': calls,
+        'inputTokens': input_tokens,
+        'outputTokens': output_tokens,
+        'costUsd': round(cost, 4),
+        'latencySeconds': round(latency, 1),
+        'suggestedMode': 'sync' if len(screened) == 1 and latency <= ADMISSION_SYNC_MAX_SECONDS else 'async',
+    }
@@ -0,0 +1,125 @@
+# agent_pool.py
+import threading
+from contextlib import contextmanager
+
+import tracing
+from model_calls import call_agent
+from model_registry import freeze_config, get_model
+from response_cache import response_cache
+
+
+def _default_agent_factory(**kwargs):
+    # Imported lazily so modules that only touch the pool stay cheap to import
+    from strands import Agent
+    return Agent(**kwargs)
+
+
+class AgentPool:
+    """
+    Container-scoped registry of warm agents, keyed by system prompt, model config and tools.
+
+    Each acquire() hands out an agent that nobody else is using, with an empty
+    conversation. Agents go back to the pool on release, so a warm container
+    builds at most one agent per concurrently running call for each key.
+    """
+
+    def __init__(self, agent_factory=None, model_factory=None):
+        self._agent_factory = agent_factory or _default_agent_factory
+        self._model_factory = model_factory or get_model
+        self._lock = threading.Lock()
+        self._idle = {}
+        self.created = 0
+
+    def _key(self, system_prompt, model_config, tools, agent_kwargs):
+        tool_ids = tuple(id(t) for t in tools or ())
+        return (system_prompt, freeze_config(model_config), tool_ids, freeze_config(agent_kwargs))
+
+    def _build(self, system_prompt, model_config, tools, agent_kwargs):
+        kwargs = dict(agent_kwargs)
+        kwargs['system_prompt'] = system_prompt
+        # Models are shared container-wide; only the conversation is per agent
+        kwargs['model'] = self._model_factory(**(model_config or {}))
+        if tools:
+            kwargs['tools'] = list(tools)
+        with self._lock:
+            self.created += 1
+        return self._agent_factory(**kwargs)
+
+    @staticmethod
+    def _reset(agent):
+        """
+        Clears what a call left on agent: its conversation, its key-value state
+        and the conversation manager's bookkeeping. Returns False if the manager
+        still holds state (e.g. a summary of trimmed turns); such an agent is
+        dropped instead of going back to the pool.
+        """
+        agent.messages = []
+        state = getattr(agent, 'state', None)
+        if state is not None:
+            for name in list(state.get() or {}):
+                state.delete(name)
+        manager = getattr(agent, 'conversation_manager', None)
+        if manager is None:
+            return True
+        if hasattr(manager, 'removed_message_count'):
+            manager.removed_message_count = 0
+        manager_state = manager.get_state() if hasattr(manager, 'get_state') else {}
+        return not any(value for name, value in manager_state.items()
+                       if name not in ('__name__', 'removed_message_count'))
+
+    @contextmanager
+    def acquire(self, system_prompt, model_config=None, tools=None, **agent_kwargs):
+        """Checks out an agent with a clean conversation for the duration of the block."""
+        key = self._key(system_prompt, model_config, tools, agent_kwargs)
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            agent = idle.pop() if idle else None
+        if agent is None:
+            agent = self._build(system_prompt, model_config, tools, agent_kwargs)
+        try:
+            yield agent
+        finally:
+            if self._reset(agent):
+                with self._lock:
+                    self._idle[key].append(agent)
+
+    def run(self, system_prompt, prompt, model_config=None, tools=None, stream_to=None, **agent_kwargs):
+        """
+        Runs a single prompt on a pooled agent and returns the response as a string.
+        stream_to is a callback handler for this call only (e.g. a response stream).
+        """
+        with self.acquire(system_prompt, model_config, tools, **agent_kwargs) as agent:
+            kwargs = {'callback_handler': stream_to} if stream_to else {}
+            # Retried with backoff on throttling; see model_calls
+            return str(call_agent('specialist', agent, prompt, **kwargs))
+
+    def clear(self):
+        with self._lock:
+            self._idle.clear()
+
+
+# One pool per container, shared by the orchestrators and every tool in the module
+shared_pool = AgentPool()
+
+
+def run_specialist(system_prompt, prompt, cache=False, model_config=None, stream_to=None, **agent_kwargs):
+    """
+    Shortcut used by the @tool specialists. With cache=True, repeated (or, if
+    configured, near-duplicate) prompts are answered from the response cache
+    (a cached answer is not streamed to stream_to).
+    """
+    def compute():
+        return shared_pool.run(system_prompt, prompt, model_config=model_config, stream_to=stream_to,
+                               **agent_kwargs)
+
+    if cache and response_cache is not None:
+        computed = []
+
+        def compute_once():
+            computed.append(True)
+            return compute()
+
+        value = response_cache.get_or_compute(system_prompt, prompt, compute_once, model_config=model_config)
+        tracing.annotate(cache='miss' if computed else 'hit')
+        return value
+    return compute()
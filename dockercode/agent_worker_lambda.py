@@ -1,14 +1,52 @@
 # agent_worker_lambda.py
+import time
+_IMPORT_STARTED = time.perf_counter()
+
 import os
-import boto3
-from strands import Agent, tool
+import startup
+import tracing
+from agent_pool import shared_pool
+from job_batch import MAX_JOB_ATTEMPTS, RetryLater, build_retry_scheduler, handle_job_list, handle_sqs_batch
+from job_coalescing import settle_followers
+from job_lifecycle import build_archive, compact, is_compaction_event
+from job_scheduler import is_pump_event
+from job_store import claim_job, complete_job, fail_job, retry_job
+from job_submission import build_dispatcher, dispatch_queued, redeliver_expired
+from model_calls import ModelUnavailableError, call_agent, model_available, model_retry_after
+from model_tiers import run_tiered
+from pre_router import pre_router
+from progress_stream import make_streamer
+from result_store import build_result_store
 
 TABLE_NAME = os.environ.get('TABLE_NAME')
 if not TABLE_NAME:
     raise Exception("Error: TABLE_NAME environment variable not set.")
-    
-dynamodb = boto3.resource('dynamodb')
-table = dynamodb.Table(TABLE_NAME)
+
+# AWS clients are built on first use, inside an invocation (see startup.py)
+def _build_table():
+    import boto3
+    return boto3.resource('dynamodb').Table(TABLE_NAME)
+
+def _build_lambda_client():
+    import boto3
+    return boto3.client('lambda')
+
+def _build_sqs_client():
+    import boto3
+    return boto3.client('sqs')
+
+table = startup.Lazy('dynamodb_table', _build_table, phase=startup.INVOKE)
+lambda_client = startup.Lazy('lambda_client', _build_lambda_client, phase=startup.INVOKE)
+sqs_client = startup.Lazy('sqs_client', _build_sqs_client, phase=startup.INVOKE)
+retry_scheduler = startup.Lazy('retry_scheduler', build_retry_scheduler, phase=startup.INVOKE)
+result_store = startup.Lazy('result_store', lambda: build_result_store(table.get()), phase=startup.INVOKE)
+archive = startup.Lazy('archive', lambda: build_archive(table.get()), phase=startup.INVOKE)
+
+# Scheduled jobs of this workload are dispatched back to this function as slots free up
+WORKLOAD = 'standard'
+FUNCTION_NAME = os.environ.get('AWS_LAMBDA_FUNCTION_NAME')
+dispatcher = startup.Lazy('dispatcher', lambda: build_dispatcher(lambda_client.get(), FUNCTION_NAME),
+                          phase=startup.INVOKE)
 
 # --- Tool Definitions (Copied from before) ---
 
@@ -16,37 +54,34 @@ RESEARCH_ASSISTANT_PROMPT = """You are a specialized research assistant. Focus o
 factual, well-sourced information in response to research questions.
 Always cite your sources when possible."""
 
-@tool
+PRODUCT_ASSISTANT_PROMPT = """You are a specialized product recommendation assistant."""
+
+TRAVEL_ASSISTANT_PROMPT = """You are a specialized travel planning assistant."""
+
 def research_assistant(query: str) -> str:
     """Processes research-related queries."""
     try:
-        research_agent = Agent(system_prompt=RESEARCH_ASSISTANT_PROMPT)
-        response = research_agent(query)
-        return str(response)
+        return run_tiered('research_assistant', RESEARCH_ASSISTANT_PROMPT, query, cache=True)
+    except ModelUnavailableError:
+        raise
     except Exception as e:
         return f"Error in research assistant: {str(e)}"
 
-@tool
 def product_recommendation_assistant(query: str) -> str:
     """Handles product recommendation queries."""
     try:
-        product_agent = Agent(
-            system_prompt="""You are a specialized product recommendation assistant."""
-        )
-        response = product_agent(query)
-        return str(response)
+        return run_tiered('product_recommendation_assistant', PRODUCT_ASSISTANT_PROMPT, query)
+    except ModelUnavailableError:
+        raise
     except Exception as e:
         return f"Error in product recommendation: {str(e)}"
 
-@tool
 def trip_planning_assistant(query: str) -> str:
     """Creates travel itineraries."""
     try:
-        travel_agent = Agent(
-            system_prompt="""You are a specialized travel planning assistant."""
-        )
-        response = travel_agent(query)
-        return str(response)
+        return run_tiered('trip_planning_assistant', TRAVEL_ASSISTANT_PROMPT, query)
+    except ModelUnavailableError:
+        raise
     except Exception as e:
         return f"Error in trip planning: {str(e)}"
 
@@ -60,14 +95,27 @@ You are an assistant that routes queries to specialized agents:
 Always select the most appropriate tool based on the user's query.
 """
 
-orchestrator = Agent(
-    system_prompt=MAIN_SYSTEM_PROMPT,
-    tools=[
-        research_assistant,
-        product_recommendation_assistant,
-        trip_planning_assistant,
-    ],
-)
+# Wrapped with @tool on first use, so importing this module doesn't import strands
+ORCHESTRATOR_TOOLS = startup.Lazy('orchestrator_tools', lambda: startup.as_tools(
+    research_assistant,
+    product_recommendation_assistant,
+    trip_planning_assistant,
+))
+
+
+@startup.warmer('orchestrator')
+def _warm_orchestrator():
+    # Builds the model, its Bedrock client and one pooled orchestrator, without calling the model
+    with shared_pool.acquire(MAIN_SYSTEM_PROMPT, tools=ORCHESTRATOR_TOOLS.get()):
+        pass
+
+# Specialists the pre-router can answer with directly, skipping the orchestrator's
+# routing hop. Unlike the @tool wrappers, errors here propagate and fail the job.
+FAST_PATH_SPECIALISTS = {
+    'research_assistant': lambda query: run_tiered('research_assistant', RESEARCH_ASSISTANT_PROMPT, query, cache=True),
+    'product_recommendation_assistant': lambda query: run_tiered('product_recommendation_assistant', PRODUCT_ASSISTANT_PROMPT, query),
+    'trip_planning_assistant': lambda query: run_tiered('trip_planning_assistant', TRAVEL_ASSISTANT_PROMPT, query),
+}
 
 # --- Lambda Handler ---
 
@@ -75,42 +123,88 @@ def lambda_handler(event, context):
     """
     This is the long-running worker. It gets the job, runs the agent,
     and saves the result to DynamoDB.
+    Batch submissions dispatch several jobs per invocation as {'jobs': [...]},
+    and in queue-consumer mode the event is an SQS batch of jobs.
+    A {"warmup": true} event only initializes the container, and a
+    {"jobCompaction": true} event archives old finished jobs (see job_lifecycle).
     """
-    job_id = event.get('jobId')
-    query = event.get('query')
+    cold = startup.begin_invocation()
+    if startup.is_warmup_event(event):
+        return startup.handle_warmup(cold)
+    # Periodic scheduler pump: redelivers jobs whose invocation died (their lease ran out),
+    # then dispatches queued jobs that fit (e.g. once an expired slot is reclaimed)
+    if is_pump_event(event):
+        return {'redelivered': redeliver_expired(table.get(), dispatcher.get(), MAX_JOB_ATTEMPTS),
+                'dispatched': dispatch_queued(table.get(), dispatcher.get(), WORKLOAD)}
+    if is_compaction_event(event):
+        stats = compact(table.get(), archive.get(), context=context)
+        print(f"Job compaction: {stats}")
+        return stats
+    # While the model circuit is open, jobs are handed back instead of started, to run
+    # again no sooner than the circuit lets calls through
+    if 'Records' in event:
+        return handle_sqs_batch(event, context, process_job, sqs_client.get(), retry_after=model_retry_after,
+                                can_start=model_available)
+    return handle_job_list(event.get('jobs') or [event], context, process_job, lambda_client.get(),
+                           retry_scheduler.get(), retry_after=model_retry_after, can_start=model_available)
+
+
+def process_job(job_id, query):
+    """Runs one job and records its outcome."""
+    # Async invokes and SQS can deliver a job more than once: only the delivery
+    # that claims it runs it, and duplicates stop here, before any model call
+    claimed = claim_job(table.get(), job_id)
+    if claimed is None:
+        print(f"Job ID {job_id} is already running or finished; dropping duplicate delivery.")
+        return
+    # Set when identical queries were coalesced onto this job's run
+    coalesce_key = claimed.get('coalesceKey')
     print(f"Worker started for Job ID: {job_id} with query: {query}")
 
-    try:
-        # Run the agent as before
-        result = orchestrator(query)
-
-        # Save the successful result to DynamoDB
-        table.update_item(
-            Key={'jobId': job_id},
-            UpdateExpression="set #s = :s, #r = :r",
-            ExpressionAttributeNames={
-                '#s': 'status',
-                '#r': 'result'
-            },
-            ExpressionAttributeValues={
-                ':s': 'COMPLETE',
-                ':r': str(result)
-            }
-        )
-        print(f"Job ID {job_id} completed successfully.")
+    # Streams partial output to the job item so get_status can show progress
+    streamer = make_streamer(table.get(), job_id, claimed)
+    # Spans for the orchestrator, tools and model calls; the summary is saved with the outcome
+    with tracing.start_trace(job_id) as trace:
+        try:
+            def run_orchestrator(query):
+                # Jobs may run concurrently, so each one checks out its own orchestrator
+                with shared_pool.acquire(MAIN_SYSTEM_PROMPT, tools=ORCHESTRATOR_TOOLS.get()) as orchestrator:
+                    kwargs = {'callback_handler': streamer} if streamer else {}
+                    # Not retried as a whole (that would rerun its tools); throttling fails fast
+                    return call_agent('orchestrator', orchestrator, query, max_attempts=1, **kwargs)
 
-    except Exception as e:
-        print(f"Job ID {job_id} failed with error: {e}")
-        # Save the failure status to DynamoDB
-        table.update_item(
-            Key={'jobId': job_id},
-            UpdateExpression="set #s = :s, #r = :r",
-            ExpressionAttributeNames={
-                '#s': 'status',
-                '#r': 'result'
-            },
-            ExpressionAttributeValues={
-                ':s': 'FAILED',
-                ':r': str(e)
-            }
-        )
+            # Obvious queries go straight to their specialist; the rest are orchestrated
+            result = pre_router.dispatch(query, FAST_PATH_SPECIALISTS, run_orchestrator, MAIN_SYSTEM_PROMPT)
+            if streamer:
+                streamer.close()
+
+            # Save the successful result to DynamoDB
+            pointer = complete_job(table.get(), job_id, result, result_store.get(), trace=tracing.summarize(trace))
+            settle_followers(table.get(), coalesce_key, job_id, result=result, pointer=pointer)
+            print(f"Job ID {job_id} completed successfully.")
+
+        except ModelUnavailableError as e:
+            # Throttled or circuit open: hand the job back for a later run instead of failing it
+            print(f"Job ID {job_id} could not reach the model: {e}")
+            if streamer:
+                streamer.close()
+            tracing.annotate(error=str(e)[:200])
+            if retry_job(table.get(), job_id, e, MAX_JOB_ATTEMPTS, trace=tracing.summarize(trace)):
+                raise RetryLater(str(e)) from e
+            settle_followers(table.get(), coalesce_key, job_id, error=e)
+
+        except Exception as e:
+            print(f"Job ID {job_id} failed with error: {e}")
+            if streamer:
+                streamer.close()
+            tracing.annotate(error=str(e)[:200])
+            # Save the failure status to DynamoDB
+            fail_job(table.get(), job_id, e, trace=tracing.summarize(trace))
+            settle_followers(table.get(), coalesce_key, job_id, error=e)
+
+    # Frees the job's scheduler slot for the next queued job (a job handed back for a retry keeps it)
+    if claimed.get('workload'):
+        dispatch_queued(table.get(), dispatcher.get(), claimed['workload'], finished=job_id)
+
+
+startup.record('import:agent_worker_lambda', _IMPORT_STARTED)
@@ -0,0 +1,70 @@
+# benchmarks/bench_agent_pool.py
+"""
+Compares building a new specialist Agent on every tool call against reusing
+agents from agent_pool.AgentPool. Uses the stub model, so no Bedrock calls.
+
+    python benchmarks/bench_agent_pool.py --calls 200 --construct-ms 40 --call-ms 5 --threads 4
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from stubs import StubAgent, StubModel
+
+from agent_pool import AgentPool
+
+PROMPTS = [
+    "You are a research specialist.",
+    "You are a data analyst.",
+    "You are a fact checker.",
+    "You are a professional report writer.",
+]
+
+
+def bench_per_call(calls, threads, construct_ms, call_ms):
+    def one(i):
+        agent = StubAgent(system_prompt=PROMPTS[i % len(PROMPTS)], construct_ms=construct_ms, call_ms=call_ms)
+        return str(agent(f"query {i}"))
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(one, range(calls)))
+    return time.perf_counter() - start, calls
+
+
+def bench_pooled(calls, threads, construct_ms, call_ms):
+    models = {}
+
+    def model_factory(**config):
+        # Mirrors model_registry.get_model: one model (and client) per config
+        key = tuple(sorted(config.items()))
+        if key not in models:
+            models[key] = StubModel(construct_ms=construct_ms, call_ms=call_ms, **config)
+        return models[key]
+
+    pool = AgentPool(agent_factory=StubAgent, model_factory=model_factory)
+
+    def one(i):
+        return pool.run(PROMPTS[i % len(PROMPTS)], f"query {i}", callback_handler=None)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(one, range(calls)))
+    return time.perf_counter() - start, pool.created
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--calls', type=int, default=200)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--construct-ms', type=float, default=40.0, help='simulated Agent/model client setup cost')
+    parser.add_argument('--call-ms', type=float, default=5.0, help='simulated model latency per call')
+    args = parser.parse_args()
+
+    for name, fn in (('per-call', bench_per_call), ('pooled', bench_pooled)):
+        elapsed, built = fn(args.calls, args.threads, args.construct_ms, args.call_ms)
+        print(f"{name:9s} total={elapsed * 1000:8.1f} ms  per_call={elapsed * 1000 / args.calls:6.2f} ms  agents_built={built}")
+
+
+if __name__ == '__main__':
+    main()
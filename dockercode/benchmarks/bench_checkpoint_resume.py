@@ -0,0 +1,140 @@
+# benchmarks/bench_checkpoint_resume.py
+"""
+Cost of finishing an interleaved job whose first invocation died partway,
+with and without workflow checkpoints (workflow_checkpoint.py).
+
+The orchestrator is scripted: researcher x N, data_analyst, fact_checker and
+report_writer, each passing on the earlier results. The first run of the job
+is killed (as a timeout would) when it starts hop --kill-at; the job's lease
+is then expired and the scheduler pump delivers the job again (Lambda's own
+async retry arrives while the lease holds, and is dropped).
+Specialists are stub agents with --call-ms latency. The suspend scenario
+instead gives the first invocation too little time, so the workflow stops
+by itself and is handed back.
+
+    python benchmarks/bench_checkpoint_resume.py --research 3 --kill-at 5 --call-ms 200
+"""
+import argparse
+import contextlib
+import io
+import os
+import time
+
+os.environ.setdefault('TRACE_LOG_SPANS', 'false')
+os.environ.setdefault('RESPONSE_CACHE_ENABLED', 'false')
+
+from load_test import WORKERS, install_stand_ins
+from stubs import FakeLambdaContext, StubAgent
+
+
+class Killed(BaseException):
+    """Ends the invocation like a timeout does: nothing gets to handle it."""
+
+
+class ScriptedOrchestrator(StubAgent):
+    plan = []
+    kill_at = None
+    specialist_calls = 0
+    hops_started = 0
+
+    def __call__(self, prompt, callback_handler=None):
+        if not self.tools:
+            ScriptedOrchestrator.specialist_calls += 1
+            return super().__call__(prompt, callback_handler)
+        tools = {tool.__name__: tool for tool in self.tools}
+        outputs = []
+        for name, needs in self.plan:
+            ScriptedOrchestrator.hops_started += 1
+            if ScriptedOrchestrator.hops_started == self.kill_at:
+                raise Killed()
+            argument = ' '.join(outputs[i].split(']')[0].lstrip('[') for i in needs) or f"subtopic {len(outputs)}"
+            outputs.append(str(tools[name](argument)))
+        return super().__call__(f"final answer over {len(outputs)} results", callback_handler)
+
+
+def plan(research_count):
+    research = list(range(research_count))
+    return ([('researcher', []) for _ in research] + [('data_analyst', research)]
+            + [('fact_checker', [research_count])] + [('report_writer', research + [research_count + 1])])
+
+
+def run_job(worker, table, job_id, query, context=None):
+    """One delivery of the job. Returns seconds taken and whether it was killed."""
+    started = time.perf_counter()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            worker.lambda_handler({'jobs': [{'jobId': job_id, 'query': query}]}, context)
+        killed = False
+    except Killed:
+        killed = True
+    return time.perf_counter() - started, killed
+
+
+def scenario(worker, table, name, checkpoints, kill_at=None, first_context=None):
+    import workflow_checkpoint
+    workflow_checkpoint.CHECKPOINTS_ENABLED = checkpoints
+    worker.CHECKPOINTS_ENABLED = checkpoints
+    ScriptedOrchestrator.specialist_calls = ScriptedOrchestrator.hops_started = 0
+    ScriptedOrchestrator.kill_at = kill_at
+    job_id = f"bench-{name}"
+    table.put_item(Item={'jobId': job_id, 'status': 'PENDING', 'query': 'Report on tidal energy', 'version': 1})
+
+    deliveries, total = 0, 0.0
+    while table.items[job_id]['status'] not in ('COMPLETE', 'FAILED') and deliveries < 5:
+        deliveries += 1
+        elapsed, killed = run_job(worker, table, job_id, 'Report on tidal energy',
+                                  first_context() if first_context and deliveries == 1 else None)
+        total += elapsed
+        if killed:
+            # Lambda retries the event while the dead invocation's lease holds: dropped
+            run_job(worker, table, job_id, 'Report on tidal energy')
+            # Once the lease runs out, the pump reclaims the job and delivers it again
+            table.items[job_id]['leaseExpiresAt'] = 0
+            started = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                worker.lambda_handler({'schedulerPump': True}, None)
+            total += time.perf_counter() - started
+            deliveries += 1
+    item = table.items[job_id]
+    trace = item.get('trace', {})
+    return {'deliveries': deliveries, 'status': item['status'], 'specialist_calls': ScriptedOrchestrator.specialist_calls,
+            'seconds': total, 'replayed': trace.get('hopsReplayed', 0), 'checkpoint_bytes': item.get('checkpointSize')}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--research', type=int, default=3)
+    parser.add_argument('--kill-at', type=int, default=5, help='hop (1-based) during which the first run dies')
+    parser.add_argument('--call-ms', type=float, default=200.0, help='stub specialist latency')
+    args = parser.parse_args()
+
+    _, _, table, _ = install_stand_ins(args.call_ms)
+    import interleaved_worker_lambda as worker
+    from agent_pool import shared_pool
+    shared_pool._agent_factory = ScriptedOrchestrator
+    ScriptedOrchestrator.plan = plan(args.research)
+    hops = len(ScriptedOrchestrator.plan)
+
+    import workflow_checkpoint
+    workflow_checkpoint.CHECKPOINT_RESERVE_SECONDS = 0
+    # Enough time for about half the hops, then the workflow has to stop
+    # (the handed-back job is re-dispatched to the worker, which runs it inline here)
+    def short():
+        return FakeLambdaContext(timeout_ms=args.call_ms * (hops // 2 + 0.5), function_name=WORKERS['interleaved'])
+
+    rows = [
+        ('no failure', scenario(worker, table, 'clean', True)),
+        (f'killed at hop {args.kill_at}, no checkpoints', scenario(worker, table, 'rerun', False, args.kill_at)),
+        (f'killed at hop {args.kill_at}, checkpoints', scenario(worker, table, 'resume', True, args.kill_at)),
+        ('out of time, suspended', scenario(worker, table, 'suspend', True, first_context=short)),
+    ]
+    print(f"{hops} specialist hops per workflow, {args.call_ms:g}ms per specialist call\n")
+    print(f"{'scenario':38s} {'runs':>4s} {'status':>9s} {'specialist calls':>17s} {'replayed':>9s} {'seconds':>8s}")
+    for label, row in rows:
+        print(f"{label:38s} {row['deliveries']:4d} {row['status']:>9s} {row['specialist_calls']:17d} "
+              f"{row['replayed']:9d} {row['seconds']:8.2f}")
+    print(f"\nCheckpoint size after the last hop: {rows[2][1]['checkpoint_bytes']} bytes (uncompressed)")
+
+
+if __name__ == '__main__':
+    main()
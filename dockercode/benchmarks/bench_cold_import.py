@@ -0,0 +1,145 @@
+# benchmarks/bench_cold_import.py
+"""
+Measures the cold start of each worker module in a fresh interpreter, against
+stub `strands`, `boto3` and `botocore` packages that take a fixed time to import
+(the real ones take hundreds of milliseconds). For each module it reports:
+- import: what every cold start pays now that heavy imports and clients are lazy
+- warm-up: handling a {"warmup": true} event, i.e. the deferred initialization
+- import + warm-up: roughly what module-level initialization used to cost
+and whether strands/boto3 were imported before the first invocation.
+
+    python benchmarks/bench_cold_import.py --strands-ms 400 --boto3-ms 150 --runs 3
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+from stubs import DOCKERCODE_DIR
+
+MODULES = [
+    'agent_worker_lambda',
+    'interleaved_worker_lambda',
+    'lambda_function_standard',
+    'lambda_function_interleaved',
+]
+
+STUB_PACKAGES = {
+    'strands/__init__.py': '''
+import os, time
+time.sleep(float(os.environ['STUB_STRANDS_MS']) / 1000.0)
+
+class Agent:
+    def __init__(self, model=None, system_prompt=None, tools=None, **kwargs):
+        self.model, self.system_prompt, self.tools, self.messages = model, system_prompt, tools, []
+
+def tool(fn):
+    return fn
+''',
+    'strands/models/__init__.py': '''
+class _Events:
+    def register(self, event_name, handler):
+        pass
+
+class _Meta:
+    region_name = 'us-east-1'
+    events = _Events()
+
+class _Client:
+    meta = _Meta()
+
+class BedrockModel:
+    def __init__(self, boto_client_config=None, **config):
+        self.config = config
+        self.client = _Client()
+''',
+    'boto3/__init__.py': '''
+import os, time
+time.sleep(float(os.environ['STUB_BOTO3_MS']) / 1000.0)
+
+class _Resource:
+    def Table(self, name):
+        return self
+
+def resource(name, **kwargs):
+    return _Resource()
+
+def client(name, **kwargs):
+    return object()
+
+class Session:
+    def __init__(self, region_name=None):
+        self.region_name = region_name
+''',
+    'botocore/__init__.py': '',
+    'botocore/config.py': '''
+class Config:
+    def __init__(self, **kwargs):
+        self.kwargs = kwargs
+''',
+}
+
+# Runs inside the fresh interpreter and prints one JSON line
+PROBE = '''
+import importlib, json, sys, time
+started = time.perf_counter()
+module = importlib.import_module(sys.argv[1])
+imported = time.perf_counter()
+heavy = [name for name in ('strands', 'boto3') if name in sys.modules]
+response = module.lambda_handler({'warmup': True}, None)
+warmed = time.perf_counter()
+print(json.dumps({
+    'import_ms': (imported - started) * 1000,
+    'warmup_ms': (warmed - imported) * 1000,
+    'heavy_at_import': heavy,
+    'timings': response['timings'],
+}))
+'''
+
+
+def write_stubs(directory):
+    for path, source in STUB_PACKAGES.items():
+        full_path = os.path.join(directory, path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        with open(full_path, 'w') as f:
+            f.write(source)
+
+
+def probe(module, stub_dir, strands_ms, boto3_ms):
+    env = dict(os.environ,
+               PYTHONPATH=os.pathsep.join([stub_dir, DOCKERCODE_DIR]),
+               TABLE_NAME='bench-jobs',
+               STUB_STRANDS_MS=str(strands_ms),
+               STUB_BOTO3_MS=str(boto3_ms),
+               PYTHONDONTWRITEBYTECODE='1')
+    output = subprocess.run([sys.executable, '-c', PROBE, module], env=env, cwd=stub_dir,
+                            capture_output=True, text=True, check=True).stdout
+    # The handler logs a cold_start line first; the probe's result is the last line
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--strands-ms', type=float, default=400.0, help='simulated strands import time')
+    parser.add_argument('--boto3-ms', type=float, default=150.0, help='simulated boto3 import time')
+    parser.add_argument('--runs', type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as stub_dir:
+        write_stubs(stub_dir)
+        print(f"{'module':30s} {'import':>9s} {'warm-up':>9s} {'import+warm-up':>15s}  heavy imports at import")
+        for module in MODULES:
+            results = [probe(module, stub_dir, args.strands_ms, args.boto3_ms) for _ in range(args.runs)]
+            import_ms = statistics.median(r['import_ms'] for r in results)
+            warmup_ms = statistics.median(r['warmup_ms'] for r in results)
+            heavy = ', '.join(results[-1]['heavy_at_import']) or 'none'
+            print(f"{module:30s} {import_ms:7.1f}ms {warmup_ms:7.1f}ms {import_ms + warmup_ms:13.1f}ms  {heavy}")
+        print("\nInit timings reported by the last warm-up event:")
+        print(json.dumps(results[-1]['timings'], indent=2))
+
+
+if __name__ == '__main__':
+    main()
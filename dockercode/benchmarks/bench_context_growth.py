@@ -0,0 +1,108 @@
+# benchmarks/bench_context_growth.py
+"""
+Orchestrator prompt size per hop of an interleaved workflow, with specialist
+outputs copied into the transcript (before) and kept under handles with only
+a digest in the transcript (after, context_store.py).
+
+The workflow is: researcher x N, data_analyst over all research, fact_checker
+over the analysis, report_writer over everything, then the final answer. The
+orchestrator re-reads its whole transcript on every turn, and in the "before"
+run it also has to copy earlier outputs into each tool call's arguments.
+
+    python benchmarks/bench_context_growth.py --research 3 --output-chars 4000 --budget 60000
+"""
+import argparse
+
+import stubs  # noqa: F401  (puts dockercode/ on sys.path)
+
+from context_store import WorkflowContext, compacting, workflow_context
+from pre_router import estimate_tokens
+
+SYSTEM_PROMPT_CHARS = 1200
+
+
+def fake_output(name, size):
+    """Specialist-like text: a heading, some bullets and filler sentences."""
+    lines = [f"# {name} findings", f"{name} summarized the material it was given. The key points follow."]
+    lines += [f"- Point {i}: {name} observed a notable pattern worth keeping." for i in range(1, 6)]
+    sentence = f"Further detail from {name} that supports the points above with specifics and sources. "
+    text = '\n'.join(lines) + '\n'
+    return text + sentence * max((size - len(text)) // len(sentence), 0)
+
+
+def make_tool(name, size):
+    def tool(text: str) -> str:
+        tool.received.append(estimate_tokens(text))
+        return fake_output(name, size)
+    tool.__name__ = name
+    tool.received = []
+    return tool
+
+
+def plan(research_count):
+    """(tool, indexes of earlier hops whose output the call needs) per hop."""
+    hops = [('researcher', []) for _ in range(research_count)]
+    research = list(range(research_count))
+    hops.append(('data_analyst', research))
+    hops.append(('fact_checker', [research_count]))
+    hops.append(('report_writer', research + [research_count, research_count + 1]))
+    return hops
+
+
+def run(hops, output_chars, compact, budget):
+    tools = {}
+    transcript = 'x' * SYSTEM_PROMPT_CHARS + ' task: research and report on a topic'
+    prompt_tokens, outputs, handles = [], [], []
+    with workflow_context(token_budget=budget) if compact else _null_context() as context:
+        for name, needs in hops:
+            tool = tools.setdefault(name, make_tool(name, output_chars))
+            wrapped = compacting(tool) if compact else tool
+            prompt_tokens.append(estimate_tokens(transcript))  # the turn that decides on this call
+            if compact:
+                argument = ' '.join(handles[i] for i in needs) or f"subtopic {len(outputs)}"
+            else:
+                argument = '\n'.join(outputs[i] for i in needs) or f"subtopic {len(outputs)}"
+            result = wrapped(argument)
+            outputs.append(result)
+            handles.append(result.split(']')[0].lstrip('[') if compact else None)
+            transcript += f"\n<tool_use {name}>{argument}</tool_use>\n<tool_result>{result}</tool_result>"
+        prompt_tokens.append(estimate_tokens(transcript))  # final answer turn
+        usage = context.usage() if context is not None else None
+    specialist_tokens = sum(sum(t.received) for t in tools.values())
+    return prompt_tokens, specialist_tokens, usage
+
+
+class _null_context:
+    def __enter__(self):
+        return None
+
+    def __exit__(self, *exc):
+        return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--research', type=int, default=3, help='researcher calls before the analysis')
+    parser.add_argument('--output-chars', type=int, default=4000, help='size of each specialist output')
+    parser.add_argument('--budget', type=int, default=WorkflowContext().token_budget,
+                        help='per-workflow context token budget')
+    args = parser.parse_args()
+
+    hops = plan(args.research)
+    before, before_specialist, _ = run(hops, args.output_chars, False, args.budget)
+    after, after_specialist, usage = run(hops, args.output_chars, True, args.budget)
+
+    labels = [name for name, _ in hops] + ['final answer']
+    print(f"{'hop':>3s} {'orchestrator turn':20s} {'before':>9s} {'after':>9s}  prompt tokens")
+    for i, (label, b, a) in enumerate(zip(labels, before, after), 1):
+        print(f"{i:3d} {label:20s} {b:9d} {a:9d}")
+    print(f"\nOrchestrator input tokens over the workflow: before {sum(before)}, after {sum(after)} "
+          f"({100.0 * (1 - sum(after) / sum(before)):.0f}% less)")
+    print(f"Growth per hop (average): before {(before[-1] - before[0]) / len(hops):.0f}, "
+          f"after {(after[-1] - after[0]) / len(hops):.0f} tokens")
+    print(f"Tokens passed to specialists: before {before_specialist}, after {after_specialist}")
+    print(f"Context store usage: {usage}")
+
+
+if __name__ == '__main__':
+    main()
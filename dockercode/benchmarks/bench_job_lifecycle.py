@@ -0,0 +1,99 @@
+# benchmarks/bench_job_lifecycle.py
+"""
+Size of the job table's hot set before and after a compaction pass, and the
+cost of listing one user's jobs with the per-user index instead of a scan.
+
+Jobs are registered, run and finished through the real job_submission and
+job_store functions (results go to the default 'dynamodb' result store) on
+stubs.InMemoryTable; the compaction pass then runs as if --days-later days
+had passed.
+
+    python benchmarks/bench_job_lifecycle.py --jobs 2000 --users 50 --failed 0.1
+"""
+import argparse
+import contextlib
+import io
+import json
+import random
+import time
+import uuid
+
+from stubs import InMemoryTable
+
+
+def item_bytes(items):
+    """Rough stored size: JSON for attributes, raw length for binary ones (compressed chunks)."""
+    total = 0
+    for item in items:
+        binary = {k: v for k, v in item.items() if isinstance(v, (bytes, bytearray))}
+        total += sum(len(v) for v in binary.values())
+        total += len(json.dumps({k: v for k, v in item.items() if k not in binary}, default=str))
+    return total
+
+
+def job_items(table):
+    return [item for item in table.items.values() if '#' not in item['jobId']]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--jobs', type=int, default=2000)
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--failed', type=float, default=0.1, help='share of jobs that fail')
+    parser.add_argument('--days-later', type=float, default=2.0)
+    parser.add_argument('--page-size', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    import job_lifecycle
+    from job_store import claim_job, complete_job, fail_job
+    from job_submission import register_jobs
+    from result_store import build_result_store
+
+    rng = random.Random(args.seed)
+    table = InMemoryTable()
+    store = build_result_store(table, 'dynamodb')
+    words = "tidal solar wind grid storage battery policy market cost demand forecast region".split()
+    trace = {'totalMs': 5400, 'modelCalls': 3, 'spans': [{'name': f"span{i}", 'ms': 100 * i} for i in range(20)]}
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        for i in range(args.jobs):
+            owner = f"sub:user{i % args.users}"
+            query = ' '.join(rng.choice(words) for _ in range(rng.randint(20, 200)))
+            job_id = str(uuid.uuid4())
+            register_jobs(table, [{'jobId': job_id, 'query': query}], owner=owner)
+            claim_job(table, job_id)
+            if rng.random() < args.failed:
+                fail_job(table, job_id, f"Error: {' '.join(words)}", trace=trace)
+            else:
+                complete_job(table, job_id, ' '.join(rng.choice(words) for _ in range(800)), store, trace=trace)
+
+    jobs_before, table_before = item_bytes(job_items(table)), item_bytes(table.items.values())
+
+    started, reads = time.perf_counter(), table.reads
+    stats = job_lifecycle.compact(table, job_lifecycle.build_archive(table),
+                                  now=time.time() + args.days_later * 86400)
+    compact_s = time.perf_counter() - started
+    jobs_after, table_after = item_bytes(job_items(table)), item_bytes(table.items.values())
+
+    print(f"{args.jobs} finished jobs from {args.users} users; compaction {args.days_later:g} days later\n")
+    print(f"{'':28s} {'job items':>12s} {'whole table':>12s}")
+    print(f"{'before compaction (bytes)':28s} {jobs_before:12d} {table_before:12d}")
+    print(f"{'after compaction (bytes)':28s} {jobs_after:12d} {table_after:12d}")
+    print(f"\ncompaction: {stats['archived']} archived, {stats['skipped']} skipped, {stats['failed']} failed, "
+          f"{table.reads - reads} reads, {compact_s:.2f}s")
+    expiring = sum(1 for item in table.items.values() if 'expiresAt' in item)
+    print(f"items with a TTL: {expiring} of {len(table.items)}")
+
+    # One user's first page: index query vs scanning every item
+    reads = table.reads
+    page = table.query(IndexName=job_lifecycle.USER_JOBS_INDEX, KeyConditionExpression="userId = :u",
+                       ExpressionAttributeValues={':u': 'sub:user0'}, Limit=args.page_size, ScanIndexForward=False,
+                       ProjectionExpression="jobId, createdAtMs, #s, queryPreview", ExpressionAttributeNames={'#s': 'status'})
+    print(f"\nlisting one user's newest {len(page['Items'])} jobs: 1 query ({table.reads - reads} read), "
+          f"{item_bytes(page['Items'])} bytes returned; a scan would read all {len(table.items)} items "
+          f"({table_after} bytes)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+# benchmarks/bench_model_tiers.py
+"""
+Latency, tokens and cost of the fact_checker specialist with model tiering on
+and off. The fast tier's stub model is quicker and cheaper and reports a
+confidence that is below the threshold for --hard of the prompts, which are
+then escalated to the standard tier.
+
+Calls go through the real model_tiers.run_tiered and agent_pool, with the
+pool's agents and models replaced by stubs.
+
+    python benchmarks/bench_model_tiers.py --calls 200 --hard 0.25 --fast-ms 15 --standard-ms 60
+"""
+import argparse
+import contextlib
+import io
+import random
+import statistics
+import time
+import zlib
+
+from stubs import StubAgent, StubModel
+
+FAST_MODEL = 'anthropic.claude-3-haiku-20240307-v1:0'
+# USD per 1000 input / output tokens
+PRICES = {FAST_MODEL: (0.00025, 0.00125), 'default': (0.003, 0.015)}
+
+
+class TierModel(StubModel):
+    """The fast model is confident about prompts outside the --hard share; the default model always answers."""
+
+    hard = 0.25
+
+    def _text(self, prompt):
+        text = f"The claim holds up against the sources provided: {prompt[:60]}"
+        if self.config.get('model_id') == FAST_MODEL:
+            hard = zlib.crc32(prompt.encode('utf-8')) % 1000 < self.hard * 1000
+            text += f"\nConfidence: {40 if hard else 90}"
+        return text
+
+
+class Usage:
+    """What strands returns from an agent call: the text, and token counts under metrics."""
+
+    def __init__(self, text, input_tokens, output_tokens):
+        self.text = text
+        self.metrics = type('Metrics', (), {'accumulated_usage': {'inputTokens': input_tokens,
+                                                                  'outputTokens': output_tokens}})()
+
+    def __str__(self):
+        return self.text
+
+
+class UsageAgent(StubAgent):
+    def __call__(self, prompt, callback_handler=None):
+        text = super().__call__(prompt, callback_handler)
+        return Usage(text, (len(self.system_prompt or '') + len(prompt)) // 4 + 1, 250)
+
+
+def run(calls, prompts, tiering):
+    import model_tiers
+    import tracing
+
+    model_tiers.MODEL_TIERING_ENABLED = tiering
+    model_tiers.tier_metrics = model_tiers.TierMetrics()
+    latencies, cost = [], 0.0
+    with contextlib.redirect_stdout(io.StringIO()):
+        for i in range(calls):
+            with tracing.start_trace(f"bench-{tiering}-{i}") as trace:
+                started = time.perf_counter()
+                model_tiers.run_tiered('fact_checker', "You are a fact checker.", prompts[i])
+                latencies.append((time.perf_counter() - started) * 1000)
+            for span in trace.spans:
+                if span.kind == 'agent':
+                    input_price, output_price = PRICES.get(span.attrs.get('modelId'), PRICES['default'])
+                    cost += (span.attrs.get('inputTokens', 0) / 1000 * input_price
+                             + span.attrs.get('outputTokens', 0) / 1000 * output_price)
+    return latencies, cost, model_tiers.tier_metrics.as_dict()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--calls', type=int, default=200)
+    parser.add_argument('--hard', type=float, default=0.25, help='share of prompts the fast tier is unsure about')
+    parser.add_argument('--fast-ms', type=float, default=15.0)
+    parser.add_argument('--standard-ms', type=float, default=60.0)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    from agent_pool import shared_pool
+
+    TierModel.hard = args.hard
+    shared_pool._agent_factory = UsageAgent
+    shared_pool._model_factory = lambda **config: TierModel(
+        call_ms=args.fast_ms if config.get('model_id') == FAST_MODEL else args.standard_ms, **config)
+
+    rng = random.Random(args.seed)
+    words = "the reactor output doubled in 2021 according to the operator report and grid data".split()
+    prompts = [f"Check claim {i}: " + ' '.join(rng.choice(words) for _ in range(rng.randint(10, 60)))
+               for i in range(args.calls)]
+
+    print(f"{args.calls} fact_checker calls, {args.hard:.0%} hard for the fast tier "
+          f"(fast {args.fast_ms:g} ms, standard {args.standard_ms:g} ms per call)\n")
+    print(f"{'':14s} {'p50 ms':>8s} {'p95 ms':>8s} {'mean ms':>8s} {'cost USD':>10s}")
+    results = {}
+    for tiering in (False, True):
+        latencies, cost, tiers = run(args.calls, prompts, tiering)
+        results[tiering] = tiers
+        latencies.sort()
+        print(f"{'tiering on' if tiering else 'tiering off':14s} {statistics.median(latencies):8.1f} "
+              f"{latencies[int(len(latencies) * 0.95) - 1]:8.1f} {statistics.mean(latencies):8.1f} {cost:10.4f}")
+
+    print(f"\n{'tier (on)':14s} {'calls':>8s} {'avg ms':>8s} {'in tok':>8s} {'out tok':>8s} {'escalated':>10s}")
+    for tier, counts in results[True].items():
+        print(f"{tier:14s} {counts['calls']:8d} {counts['avg_ms']:8.1f} {counts['inputTokens']:8d} "
+              f"{counts['outputTokens']:8d} {counts['escalation_rate']:10.1%}")
+
+
+if __name__ == '__main__':
+    main()
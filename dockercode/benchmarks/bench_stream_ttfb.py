@@ -0,0 +1,115 @@
+# benchmarks/bench_stream_ttfb.py
+"""
+Time to first byte of lambda_function_standard in buffered mode (the JSON
+response, which is only sent once the answer is complete) versus SSE mode
+(stream_request(), which yields each token as the model produces it), both
+called in-process and over HTTP through response_stream's server, as the
+Lambda Web Adapter calls it in the streaming image (Dockerfile.stream).
+
+The model is a stub that spreads --call-ms over the words of its answer; the
+queries are ones the pre-router sends straight to a specialist, so strands
+isn't needed.
+
+    python benchmarks/bench_stream_ttfb.py --call-ms 3000 --runs 3
+"""
+import argparse
+import contextlib
+import http.client
+import io
+import json
+import os
+import statistics
+import threading
+import time
+
+# Each run must reach the model, and the span logs would drown the report
+os.environ.setdefault('RESPONSE_CACHE_ENABLED', 'false')
+os.environ.setdefault('TRACE_LOG_SPANS', 'false')
+
+from stubs import StubAgent, StubModel
+
+import lambda_function_standard
+from agent_pool import shared_pool
+from response_stream import make_server
+
+QUERIES = [
+    'Explain the history and scientific evidence behind plate tectonics theory',
+    'Recommend noise cancelling headphones under $200, which brand should i get',
+    'Plan a 5 days in Lisbon trip itinerary with hotel and sightseeing tips',
+]
+
+
+def buffered(query):
+    started = time.perf_counter()
+    response = lambda_function_standard.lambda_handler({'body': json.dumps({'query': query})}, None)
+    elapsed = (time.perf_counter() - started) * 1000
+    assert response['statusCode'] == 200, response
+    return elapsed, elapsed
+
+
+def streamed(query):
+    started = time.perf_counter()
+    first = None
+    events = []
+    for chunk in lambda_function_standard.stream_request({'query': query}):
+        if first is None:
+            first = (time.perf_counter() - started) * 1000
+        events.append(chunk)
+    assert events[-1].startswith('event: done'), events[-1]
+    return first, (time.perf_counter() - started) * 1000
+
+
+def over_http(port):
+    def run(query):
+        started = time.perf_counter()
+        connection = http.client.HTTPConnection('127.0.0.1', port)
+        connection.request('POST', '/', body=json.dumps({'query': query}))
+        response = connection.getresponse()
+        assert response.status == 200, response.status
+        first = response.read1(65536)
+        ttfb = (time.perf_counter() - started) * 1000
+        body = first + response.read()
+        connection.close()
+        assert b'event: done' in body, body[-200:]
+        return ttfb, (time.perf_counter() - started) * 1000
+    return run
+
+
+def error_status(port):
+    """Status of a streamed request that fails before any event (no query)."""
+    connection = http.client.HTTPConnection('127.0.0.1', port)
+    connection.request('POST', '/', body='{}')
+    response = connection.getresponse()
+    response.read()
+    connection.close()
+    return response.status
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--call-ms', type=float, default=3000.0, help='simulated generation time per answer')
+    parser.add_argument('--runs', type=int, default=3)
+    args = parser.parse_args()
+
+    shared_pool._agent_factory = StubAgent
+    shared_pool._model_factory = lambda **config: StubModel(call_ms=args.call_ms, **config)
+
+    server = make_server(lambda_function_standard.stream_request, port=0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port = server.server_address[1]
+
+    print(f"{'mode':10s} {'ttfb p50':>10s} {'total p50':>10s}")
+    for name, run in (('buffered', buffered), ('sse', streamed), ('sse http', over_http(port))):
+        # The handlers and the server log every request; keep the report readable
+        with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+            results = [run(query) for _ in range(args.runs) for query in QUERIES]
+        ttfb = statistics.median(r[0] for r in results)
+        total = statistics.median(r[1] for r in results)
+        print(f"{name:10s} {ttfb:8.1f}ms {total:8.1f}ms")
+    with contextlib.redirect_stderr(io.StringIO()):
+        print(f"\nstreamed request without a query: HTTP {error_status(port)}")
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
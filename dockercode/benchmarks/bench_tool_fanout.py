@@ -0,0 +1,49 @@
+# benchmarks/bench_tool_fanout.py
+"""
+Wall-clock time of one orchestrator turn that asks for several specialists,
+run one after another versus fanned out through tool_runtime.BoundedToolRunner.
+
+    python benchmarks/bench_tool_fanout.py --latencies 400,250,300,150 --concurrency 4
+"""
+import argparse
+import time
+
+import stubs  # noqa: F401  (puts dockercode/ on sys.path)
+
+from tool_runtime import BoundedToolRunner, ToolTimeoutError
+
+
+def fake_specialist(name, latency_ms):
+    time.sleep(latency_ms / 1000.0)
+    return f"{name} done in {latency_ms} ms"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--latencies', default='400,250,300,150', help='comma separated ms per tool call')
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--timeout', type=float, default=10.0, help='per-tool timeout in seconds')
+    args = parser.parse_args()
+
+    latencies = [int(x) for x in args.latencies.split(',')]
+    calls = [(f"tool{i}", fake_specialist, (f"tool{i}", ms)) for i, ms in enumerate(latencies)]
+
+    start = time.perf_counter()
+    for _, fn, fn_args in calls:
+        fn(*fn_args)
+    sequential = time.perf_counter() - start
+
+    runner = BoundedToolRunner(max_concurrency=args.concurrency, default_timeout=args.timeout, jobs=1)
+    start = time.perf_counter()
+    results = runner.run_all(calls)
+    fanned_out = time.perf_counter() - start
+
+    print(f"sequential  {sequential * 1000:7.1f} ms  (sum of latencies {sum(latencies)} ms)")
+    print(f"fan-out     {fanned_out * 1000:7.1f} ms  (slowest call {max(latencies)} ms, cap {args.concurrency})")
+    for (name, _, _), result in zip(calls, results):
+        status = 'timeout' if isinstance(result, ToolTimeoutError) else 'ok'
+        print(f"  {name}: {status}  {result}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+# benchmarks/cache_harness.py
+"""
+Replays a query mix with exact, reformatted and near-duplicate repeats through
+response_cache.ResponseCache backed by the stub model and an in-memory table.
+A second "container" shares only the table, to show persistent-tier hits.
+
+    python benchmarks/cache_harness.py --call-ms 20 --similarity 0.8
+"""
+import argparse
+import time
+
+from stubs import InMemoryTable, StubModel
+
+from response_cache import DynamoDBCacheTier, LRUCache, ResponseCache, TokenJaccardMatcher
+
+SYSTEM_PROMPT = "You are a research specialist. Gather factual information and cite sources."
+
+QUERIES = [
+    "What is the capital of Australia?",
+    "what is the capital of   Australia?",
+    "What is the capital city of Australia?",
+    "How does photosynthesis work?",
+    "How does photosynthesis work?",
+    "Explain how photosynthesis works",
+    "Who wrote Pride and Prejudice?",
+    "WHO WROTE PRIDE AND PREJUDICE?",
+    "Summarize the causes of the French Revolution",
+    "What is the capital of Australia?",
+]
+
+
+def build_cache(table, similarity):
+    matcher = TokenJaccardMatcher(similarity) if similarity > 0 else None
+    return ResponseCache(memory=LRUCache(max_entries=64, ttl_seconds=300),
+                         persistent=DynamoDBCacheTier(lambda: table), matcher=matcher)
+
+
+def replay(cache, model, queries):
+    start = time.perf_counter()
+    for query in queries:
+        cache.get_or_compute(SYSTEM_PROMPT, query, lambda q=query: model.complete(SYSTEM_PROMPT, q))
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--call-ms', type=float, default=20.0)
+    parser.add_argument('--similarity', type=float, default=0.8, help='near-duplicate threshold, 0 disables')
+    args = parser.parse_args()
+
+    table = InMemoryTable()
+    for label in ('container-1', 'container-2'):
+        model = StubModel(call_ms=args.call_ms)
+        cache = build_cache(table, args.similarity)
+        elapsed = replay(cache, model, QUERIES)
+        print(f"{label}: {elapsed * 1000:7.1f} ms  model_calls={model.calls}  {cache.stats.as_dict()}")
+    print(f"table: reads={table.reads} writes={table.writes} items={len(table.items)}")
+
+
+if __name__ == '__main__':
+    main()
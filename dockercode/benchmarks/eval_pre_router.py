@@ -0,0 +1,103 @@
+# benchmarks/eval_pre_router.py
+"""
+Offline evaluation of pre_router.PreRouter over a labeled query file (JSON lines
+of {"query", "label"}, where label is a specialist tool name or "orchestrator"
+for queries that should not skip the orchestrator).
+
+Reports coverage (share of queries that skip the orchestrator), precision of
+those routes, misroutes, and an estimate of the orchestrator time and tokens
+saved. --sweep repeats the headline numbers over a range of thresholds. Exits
+with status 1 when precision is below --min-precision: the labels include
+queries that only look like a specialist's (a single incidental keyword), and a
+threshold change that routes those is not worth its coverage.
+
+    python benchmarks/eval_pre_router.py --labels benchmarks/routing_labels.jsonl --orchestrator-ms 2500 --sweep
+"""
+import argparse
+import json
+import os
+import sys
+
+import stubs  # noqa: F401  (puts dockercode on sys.path)
+
+from lambda_function_standard import MAIN_SYSTEM_PROMPT
+from pre_router import ORCHESTRATOR, PRE_ROUTER_MIN_SCORE, PRE_ROUTER_THRESHOLD, PreRouter, estimate_tokens
+
+DEFAULT_LABELS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'routing_labels.jsonl')
+# Share of fast-path routes that must go to the right specialist
+MIN_PRECISION = 0.95
+
+
+def load_labels(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def evaluate(rows, threshold, orchestrator_ms, min_score=PRE_ROUTER_MIN_SCORE):
+    router = PreRouter(threshold=threshold, enabled=True, min_score=min_score)
+    routed = correct = tokens_saved = 0
+    misroutes, confusion = [], {}
+    for row in rows:
+        decision = router.route(row['query'])
+        predicted = decision.label if decision.routed else ORCHESTRATOR
+        confusion.setdefault(row['label'], {}).setdefault(predicted, 0)
+        confusion[row['label']][predicted] += 1
+        if not decision.routed:
+            continue
+        routed += 1
+        if predicted == row['label']:
+            correct += 1
+            tokens_saved += 2 * estimate_tokens(MAIN_SYSTEM_PROMPT + row['query'])
+        else:
+            misroutes.append({'query': row['query'], 'label': row['label'], 'routed_to': predicted,
+                              'confidence': decision.confidence})
+    metrics = router.metrics.as_dict()
+    return {
+        'threshold': threshold,
+        'queries': len(rows),
+        'routed': routed,
+        'coverage': round(routed / len(rows), 4) if rows else 0.0,
+        'precision': round(correct / routed, 4) if routed else None,
+        'misroutes': len(misroutes),
+        'orchestrator_ms_saved': correct * orchestrator_ms,
+        'orchestrator_input_tokens_saved': tokens_saved,
+        'avg_classify_ms': metrics['avg_classify_ms'],
+    }, misroutes, confusion
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--labels', default=DEFAULT_LABELS)
+    parser.add_argument('--threshold', type=float, default=PRE_ROUTER_THRESHOLD)
+    parser.add_argument('--orchestrator-ms', type=float, default=2500.0,
+                        help='typical latency of the orchestrator routing hop that a correct route skips')
+    parser.add_argument('--min-score', type=float, default=PRE_ROUTER_MIN_SCORE)
+    parser.add_argument('--min-precision', type=float, default=MIN_PRECISION)
+    parser.add_argument('--sweep', action='store_true', help='also evaluate thresholds 0.4 to 0.9')
+    args = parser.parse_args()
+
+    rows = load_labels(args.labels)
+    summary, misroutes, confusion = evaluate(rows, args.threshold, args.orchestrator_ms, args.min_score)
+    print(json.dumps(summary, indent=2))
+    print("\nConfusion (expected -> predicted):")
+    for label, predicted in sorted(confusion.items()):
+        print(f"  {label:34s} {json.dumps(predicted, sort_keys=True)}")
+    if misroutes:
+        print("\nMisroutes:")
+        for miss in misroutes:
+            print(f"  [{miss['confidence']:.2f}] {miss['query']!r}: expected {miss['label']}, routed to {miss['routed_to']}")
+
+    if args.sweep:
+        print(f"\n{'threshold':>9s} {'coverage':>9s} {'precision':>10s} {'misroutes':>10s}")
+        for step in range(4, 10):
+            result, _, _ = evaluate(rows, step / 10.0, args.orchestrator_ms, args.min_score)
+            precision = f"{result['precision']:.3f}" if result['precision'] is not None else '-'
+            print(f"{result['threshold']:9.1f} {result['coverage']:9.3f} {precision:>10s} {result['misroutes']:10d}")
+
+    if summary['precision'] is not None and summary['precision'] < args.min_precision:
+        print(f"\nPrecision {summary['precision']:.3f} is below {args.min_precision}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,216 @@
+# benchmarks/load_test.py
+"""
+Offline load test of the job pipeline: start lambda -> worker -> get_status,
+using the real handlers from dockercode/ with three stand-ins patched in:
+- a deterministic fake model with fixed latency (orchestrators call one tool,
+  chosen by a hash of the prompt, then answer);
+- an in-memory DynamoDB (stubs.InMemoryDynamoDB) behind a fake boto3;
+- a synchronous Lambda invoker, so an async invoke runs the worker inline.
+
+Clients submit a synthetic job mix at the given concurrency and poll
+get_status until each job is finished. Reports end-to-end latency
+percentiles, jobs/sec, DynamoDB reads/writes, Lambda invocations, model
+calls and memory per job.
+
+    python benchmarks/load_test.py --jobs 200 --concurrency 8 --model-ms 40 \\
+        --mix fast=0.5,orchestrated=0.3,duplicate=0.2 --pipeline standard
+"""
+import argparse
+import contextlib
+import hashlib
+import io
+import json
+import os
+import random
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+import types
+from concurrent.futures import ThreadPoolExecutor
+
+from stubs import FakeLambdaContext, InMemoryDynamoDB, StubAgent, StubModel
+
+TABLE_NAME = 'load-test-jobs'
+WORKERS = {'standard': 'standard-agent-worker', 'interleaved': 'interleaved-agent-worker'}
+DUPLICATE_QUERIES = [
+    'Explain the history of the printing press',
+    'Recommend a budget laptop for students',
+    'Tell me something surprising about octopuses',
+]
+
+
+class SyncLambdaInvoker:
+    """Stand-in for boto3.client('lambda'): invoke() runs the named handler before returning."""
+
+    def __init__(self):
+        self.handlers = {}
+        self.invocations = 0
+        self._lock = threading.Lock()
+
+    def invoke(self, FunctionName, InvocationType='RequestResponse', Payload='{}'):
+        with self._lock:
+            self.invocations += 1
+        result = self.handlers[FunctionName](json.loads(Payload), FakeLambdaContext(function_name=FunctionName))
+        return {'StatusCode': 202 if InvocationType == 'Event' else 200, 'Payload': result}
+
+
+class FakeBoto3(types.ModuleType):
+    def __init__(self, dynamodb, lambda_client):
+        super().__init__('boto3')
+        self._dynamodb = dynamodb
+        self._lambda = lambda_client
+
+    def resource(self, name, **kwargs):
+        return self._dynamodb
+
+    def client(self, name, **kwargs):
+        if name == 'lambda':
+            return self._lambda
+        raise NotImplementedError(f"No stand-in for the {name} client")
+
+
+class FakeAgent(StubAgent):
+    """StubAgent that, given tools, acts as an orchestrator: it calls one and then answers."""
+
+    calls = 0
+    _lock = threading.Lock()
+
+    def __call__(self, prompt, callback_handler=None):
+        with FakeAgent._lock:
+            FakeAgent.calls += 1
+        if not self.tools:
+            return super().__call__(prompt, callback_handler)
+        choice = int(hashlib.sha256(prompt.encode('utf-8')).hexdigest(), 16) % len(self.tools)
+        tool_output = self.tools[choice](prompt[:200])
+        return super().__call__(f"{prompt[:100]} | {str(tool_output)[:100]}", callback_handler)
+
+
+def install_stand_ins(model_ms):
+    """Patches boto3 (and strands' @tool, if strands isn't installed) and imports the handlers."""
+    dynamodb, invoker = InMemoryDynamoDB(), SyncLambdaInvoker()
+    sys.modules['boto3'] = FakeBoto3(dynamodb, invoker)
+    try:
+        import strands  # noqa: F401
+    except ImportError:
+        # With the agent factory replaced, only @tool is used, as a plain wrapper
+        sys.modules['strands'] = types.SimpleNamespace(tool=lambda fn: fn)
+
+    os.environ['TABLE_NAME'] = TABLE_NAME
+    # Simulated clients have no identity, so only the shared submission budget applies; it would cap the run
+    os.environ.setdefault('ADMISSION_GLOBAL_REQUESTS_PER_MINUTE', '0')
+    os.environ.setdefault('ADMISSION_GLOBAL_TOKENS_PER_MINUTE', '0')
+    import importlib
+    handlers = {}
+    for pipeline, start_module, worker_module in (
+            ('standard', 'start_job_lambda', 'agent_worker_lambda'),
+            ('interleaved', 'start_interleaved_job_lambda', 'interleaved_worker_lambda')):
+        os.environ['AGENT_FUNCTION_NAME'] = WORKERS[pipeline]
+        # The worker dispatches scheduled jobs that were queued back to itself
+        os.environ['AWS_LAMBDA_FUNCTION_NAME'] = WORKERS[pipeline]
+        start = importlib.import_module(start_module)
+        worker = importlib.import_module(worker_module)
+        invoker.handlers[WORKERS[pipeline]] = worker.lambda_handler
+        handlers[pipeline] = start.lambda_handler
+    import get_status_lambda
+    from agent_pool import shared_pool
+
+    shared_pool._agent_factory = FakeAgent
+    shared_pool._model_factory = lambda **config: StubModel(call_ms=model_ms, **config)
+    return handlers, get_status_lambda.lambda_handler, dynamodb.Table(TABLE_NAME), invoker
+
+
+def job_mix(spec, jobs, seed):
+    """Deterministic list of (kind, query) from a 'fast=0.5,orchestrated=0.3,duplicate=0.2' spec."""
+    weights = {kind: float(share) for kind, share in (part.split('=') for part in spec.split(','))}
+    rng = random.Random(seed)
+    kinds = rng.choices(list(weights), weights=list(weights.values()), k=jobs)
+    queries = []
+    for i, kind in enumerate(kinds):
+        if kind == 'fast':
+            queries.append((kind, f"Explain the history and scientific evidence of discovery number {i}"))
+        elif kind == 'orchestrated':
+            queries.append((kind, f"Tell me something interesting about item {i}"))
+        else:
+            queries.append((kind, DUPLICATE_QUERIES[i % len(DUPLICATE_QUERIES)]))
+    return queries
+
+
+def run_job(start_handler, status_handler, query, poll_seconds):
+    """Submits one job and polls until it is finished. Returns (latency seconds, final status)."""
+    started = time.perf_counter()
+    response = start_handler({'body': json.dumps({'query': query})}, None)
+    if response['statusCode'] != 202:
+        return time.perf_counter() - started, f"HTTP {response['statusCode']}"
+    job_id = json.loads(response['body'])['jobId']
+    while True:
+        status = json.loads(status_handler({'queryStringParameters': {'jobId': job_id}}, None)['body'])
+        if status.get('status') in ('COMPLETE', 'FAILED'):
+            return time.perf_counter() - started, status['status']
+        time.sleep(poll_seconds)
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(round(pct / 100.0 * len(ordered))) - 1))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--jobs', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=8, help='clients submitting and polling at once')
+    parser.add_argument('--model-ms', type=float, default=40.0, help='fake model latency per call')
+    parser.add_argument('--mix', default='fast=0.5,orchestrated=0.3,duplicate=0.2')
+    parser.add_argument('--pipeline', choices=sorted(WORKERS), default='standard')
+    parser.add_argument('--poll-ms', type=float, default=20.0)
+    parser.add_argument('--model-rate', default='0', help='MODEL_RATE_PER_SECOND for the workers (0: no limit)')
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    os.environ.setdefault('TRACE_LOG_SPANS', 'false')
+    os.environ['MODEL_RATE_PER_SECOND'] = args.model_rate
+    handlers, status_handler, table, invoker = install_stand_ins(args.model_ms)
+    mix = job_mix(args.mix, args.jobs, args.seed)
+
+    tracemalloc.start()
+    baseline, _ = tracemalloc.get_traced_memory()
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    started = time.perf_counter()
+    # The handlers log every step; keep the report readable
+    with contextlib.redirect_stdout(io.StringIO()):
+        with ThreadPoolExecutor(max_workers=args.concurrency) as clients:
+            results = list(clients.map(
+                lambda job: run_job(handlers[args.pipeline], status_handler, job[1], args.poll_ms / 1000.0), mix))
+    elapsed = time.perf_counter() - started
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    latencies_ms = [latency * 1000 for latency, _ in results]
+    statuses = {}
+    for _, status in results:
+        statuses[status] = statuses.get(status, 0) + 1
+    print(json.dumps({
+        'pipeline': args.pipeline,
+        'jobs': args.jobs,
+        'concurrency': args.concurrency,
+        'mix': {kind: sum(1 for k, _ in mix if k == kind) for kind in dict.fromkeys(k for k, _ in mix)},
+        'statuses': statuses,
+        'latency_ms': {'p50': round(percentile(latencies_ms, 50), 1), 'p95': round(percentile(latencies_ms, 95), 1),
+                       'p99': round(percentile(latencies_ms, 99), 1), 'max': round(max(latencies_ms), 1)},
+        'jobs_per_sec': round(args.jobs / elapsed, 2),
+        'dynamodb': {'reads': table.reads, 'writes': table.writes,
+                     'reads_per_job': round(table.reads / args.jobs, 2),
+                     'writes_per_job': round(table.writes / args.jobs, 2),
+                     'conditional_failures': table.conditional_failures},
+        'lambda_invocations': invoker.invocations,
+        'model_calls': FakeAgent.calls,
+        'memory': {'peak_traced_mb': round((peak - baseline) / 1e6, 2),
+                   'retained_kb_per_job': round((current - baseline) / 1e3 / args.jobs, 2),
+                   'max_rss_growth_mb': (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before) // 1024},
+        'wall_clock_s': round(elapsed, 2),
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+# benchmarks/longpoll_sim.py
+"""
+Follows one simulated job with three clients and counts requests, table reads,
+read capacity units and notification lag:
+- fixed-interval polling of the whole item (what the frontend used to do, every 5s)
+- long polling over change_feed.TableChangeFeed
+- long polling over change_feed.InMemoryChangeFeed
+
+As in get_status, the long poll's checks read the status fields, and the
+check that ends the wait is the answer. Time is compressed: --poll-interval stands for the frontend's 5 seconds, and the
+table feed's check gaps are scaled to match (0.5s doubling up to 5s).
+
+    python benchmarks/longpoll_sim.py --updates 6 --gap 0.4 --poll-interval 1.0 --item-kb 12
+"""
+import argparse
+import threading
+import time
+
+from stubs import InMemoryTable
+
+from change_feed import InMemoryChangeFeed, TableChangeFeed
+
+# When each version was written. Kept off the item, since the feed only reads
+# the projected status fields.
+changed_at = {}
+
+STATUS_PROJECTION = "jobId, #s, version, progressSeq"
+
+
+def run_job(table, feed, updates, gap, item_kb):
+    """Writer: bumps the job's version every `gap` seconds, growing its partial output, then completes it."""
+    for version in range(2, updates + 2):
+        time.sleep(gap)
+        status = 'COMPLETE' if version == updates + 1 else 'RUNNING'
+        partial = 'x' * int(item_kb * 1024 * (version - 1) / updates)
+        item = {'jobId': 'job-1', 'status': status, 'version': version, 'progressSeq': version, 'result': partial}
+        changed_at[version] = time.monotonic()
+        table.items['job-1'] = item
+        if feed is not None:
+            feed.publish({k: v for k, v in item.items() if k != 'result'})
+
+
+def fixed_interval_client(table, interval):
+    requests, lags, seen = 0, [], 1
+    while True:
+        time.sleep(interval)
+        requests += 1
+        item = table.get_item(Key={'jobId': 'job-1'})['Item']
+        if item['version'] > seen:
+            lags.append(time.monotonic() - changed_at[item['version']])
+            seen = item['version']
+        if item['status'] == 'COMPLETE':
+            return requests, lags
+
+
+def long_poll_client(feed, wait_seconds):
+    requests, lags, seen = 0, [], 1
+    while True:
+        requests += 1
+        item = feed.wait_for_change('job-1', seen, wait_seconds)
+        if item['version'] > seen:
+            lags.append(time.monotonic() - changed_at[item['version']])
+            seen = item['version']
+        if item['status'] == 'COMPLETE':
+            return requests, lags
+
+
+def simulate(name, client, args, feed=None):
+    table = InMemoryTable()
+    table.items['job-1'] = {'jobId': 'job-1', 'status': 'PENDING', 'version': 1, 'progressSeq': 0}
+    changed_at[1] = time.monotonic()
+    if isinstance(feed, InMemoryChangeFeed):
+        feed.publish(table.items['job-1'])
+    elif feed == 'table':
+        scale = args.poll_interval / 5.0
+        feed = TableChangeFeed(table, first_interval=0.5 * scale, max_interval=5.0 * scale,
+                               projection=STATUS_PROJECTION, names={'#s': 'status'})
+    writer = threading.Thread(target=run_job, args=(table, feed if isinstance(feed, InMemoryChangeFeed) else None,
+                                                    args.updates, args.gap, args.item_kb))
+    writer.start()
+    requests, lags = client(table, feed)
+    writer.join()
+    avg_lag = sum(lags) / len(lags) * 1000 if lags else 0.0
+    print(f"{name:22s} client_requests={requests:3d}  table_reads={table.reads:3d}  "
+          f"read_units={table.read_units:5.1f}  updates_seen={len(lags)}/{args.updates}  "
+          f"avg_notify_lag={avg_lag:7.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--updates', type=int, default=6)
+    parser.add_argument('--gap', type=float, default=0.4, help='seconds between job updates')
+    parser.add_argument('--poll-interval', type=float, default=1.0)
+    parser.add_argument('--wait', type=int, default=20)
+    parser.add_argument('--item-kb', type=float, default=12, help='size of the finished job item')
+    args = parser.parse_args()
+
+    simulate('fixed-interval', lambda table, feed: fixed_interval_client(table, args.poll_interval), args)
+    simulate('long-poll (table)', lambda table, feed: long_poll_client(feed, args.wait), args, feed='table')
+    simulate('long-poll (in-memory)', lambda table, feed: long_poll_client(feed, args.wait), args,
+             feed=InMemoryChangeFeed())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+# benchmarks/queue_drain_sim.py
+"""
+Drains an in-memory job queue through job_batch.handle_sqs_batch, the workers'
+queue-consumer mode, with short simulated invocations. Shows jobs processed per
+invocation, jobs handed back because time ran low or (for --retry-share of the
+jobs, on their first run) because of a temporary error, and redeliveries.
+
+The queue hides received messages for the real 5400 second visibility timeout,
+so a handed-back message only comes back as soon as the worker's retry delay
+(scaled down by --retry-delay-s) allows. With --no-backoff the worker leaves
+the visibility timeout alone, and the messages it hands back are stranded.
+
+    python benchmarks/queue_drain_sim.py --jobs 40 --job-ms 300 --timeout-ms 1000 --concurrency 3 --retry-share 0.2
+"""
+import argparse
+import json
+import time
+import zlib
+
+from stubs import FakeLambdaContext, InMemoryQueue
+
+import job_batch
+from job_batch import RetryLater, handle_sqs_batch
+from job_submission import QueueDispatcher
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--jobs', type=int, default=40)
+    parser.add_argument('--job-ms', type=float, default=300.0, help='simulated agent run time per job')
+    parser.add_argument('--timeout-ms', type=int, default=1000, help='simulated Lambda timeout')
+    parser.add_argument('--min-remaining-ms', type=int, default=300)
+    parser.add_argument('--concurrency', type=int, default=3)
+    parser.add_argument('--batch-size', type=int, default=10)
+    parser.add_argument('--retry-share', type=float, default=0.0, help='share of jobs handed back on their first run')
+    parser.add_argument('--retry-delay-s', type=float, default=0.2, help='stands for JOB_RETRY_DELAY_SECONDS')
+    parser.add_argument('--no-backoff', action='store_true', help='report failures without changing visibility')
+    parser.add_argument('--give-up-s', type=float, default=10.0, help='stop once no message is visible for this long')
+    args = parser.parse_args()
+
+    # The sim runs in seconds, so the visibility timeouts it sets are fractions of one
+    job_batch.JOB_RETRY_DELAY_SECONDS = args.retry_delay_s
+
+    queue = InMemoryQueue()
+    QueueDispatcher(queue, 'local').dispatch([{'jobId': f"job-{i}", 'query': f"query {i}"} for i in range(args.jobs)])
+
+    done = []
+
+    retried = set()
+
+    def run_job(job_id, query):
+        time.sleep(args.job_ms / 1000.0)
+        if zlib.crc32(job_id.encode()) % 1000 < args.retry_share * 1000 and job_id not in retried:
+            retried.add(job_id)
+            raise RetryLater("model throttled")
+        done.append(job_id)
+
+    invocations = handed_back = 0
+    start = time.perf_counter()
+    while len(queue):
+        wait = queue.next_visible_in()
+        if wait > args.give_up_s:
+            break
+        time.sleep(wait)
+        event = queue.receive_event(args.batch_size)
+        if not event['Records']:
+            continue
+        response = handle_sqs_batch(event, FakeLambdaContext(args.timeout_ms), run_job,
+                                    None if args.no_backoff else queue,
+                                    concurrency=args.concurrency, min_remaining_ms=args.min_remaining_ms)
+        handed_back += len(response['batchItemFailures'])
+        queue.complete(event, response)
+        invocations += 1
+    elapsed = time.perf_counter() - start
+
+    redelivered = sum(1 for count in queue.receives.values() if count > 1)
+    print(json.dumps({
+        'jobs': args.jobs,
+        'completed': len(done),
+        'unique_completed': len(set(done)),
+        'invocations': invocations,
+        'jobs_per_invocation': round(len(done) / invocations, 2),
+        'handed_back': handed_back,
+        'redelivered_messages': redelivered,
+        'stranded_messages': len(queue),
+        'wall_clock_s': round(elapsed, 2),
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
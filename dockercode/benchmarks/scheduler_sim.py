@@ -0,0 +1,184 @@
+# benchmarks/scheduler_sim.py
+"""
+Local simulation of job scheduling: one synthetic workload run on a virtual
+clock, twice.
+
+- immediate: today's behaviour. Every job is invoked as soon as it is
+  submitted and only the account's concurrency limit holds jobs back (first
+  come, first served).
+- scheduled: jobs go through job_scheduler (the real enqueue/admit/release
+  functions, on stubs.InMemoryTable). It applies priority classes, per-user
+  quotas with fair-share ordering, and per-workload caps.
+
+The default workload is one user dumping a batch of long interleaved jobs,
+a few users sending quick standard jobs all along, and an analyst sending
+an interleaved job now and then. The report shows waits per workload and
+class, and per-user concurrency. It also checks that no workload ever ran
+above its cap.
+
+    python benchmarks/scheduler_sim.py --minutes 30 --account-concurrency 12 \\
+        --caps standard=8,interleaved=4 --user-quota 2 --bulk-jobs 60
+"""
+import argparse
+import heapq
+import importlib
+import os
+import random
+import statistics
+
+from stubs import InMemoryTable
+
+
+def workload_plan(args):
+    """(submit time s, user, workload, batch, duration s) per job, sorted by submit time."""
+    rng = random.Random(args.seed)
+    horizon = args.minutes * 60
+    jobs = [(0.0, 'sub:bulk', 'interleaved', True, rng.uniform(180, 420)) for _ in range(args.bulk_jobs)]
+    for user in range(args.quick_users):
+        t = rng.expovariate(1.0 / args.quick_every)
+        while t < horizon:
+            jobs.append((t, f"sub:user{user}", 'standard', False, rng.uniform(4, 15)))
+            t += rng.expovariate(1.0 / args.quick_every)
+    t = 30.0
+    while t < horizon:
+        jobs.append((t, 'sub:analyst', 'interleaved', False, rng.uniform(180, 420)))
+        t += args.analyst_every
+    return sorted(jobs, key=lambda job: job[0])
+
+
+class Stats:
+    def __init__(self):
+        self.waits = {}           # (workload, class) -> [wait s]
+        self.running = {}         # workload -> running now
+        self.peak = {}            # workload -> peak running
+        self.user_running = {}
+        self.user_peak = {}
+        self.depths = []
+
+    def start(self, workload, user, key, wait):
+        self.waits.setdefault(key, []).append(wait)
+        self.running[workload] = self.running.get(workload, 0) + 1
+        self.peak[workload] = max(self.peak.get(workload, 0), self.running[workload])
+        self.user_running[user] = self.user_running.get(user, 0) + 1
+        self.user_peak[user] = max(self.user_peak.get(user, 0), self.user_running[user])
+
+    def finish(self, workload, user):
+        self.running[workload] -= 1
+        self.user_running[user] -= 1
+
+
+def simulate_immediate(plan, account_concurrency):
+    stats, events, waiting, running = Stats(), [], [], 0
+    for i, (at, user, workload, batch, duration) in enumerate(plan):
+        heapq.heappush(events, (at, 1, i))
+    while events:
+        now, kind, i = heapq.heappop(events)
+        _, user, workload, batch, duration = plan[i]
+        if kind == 0:
+            stats.finish(workload, user)
+            running -= 1
+        else:
+            waiting.append(i)
+        while waiting and running < account_concurrency:
+            j = waiting.pop(0)
+            submitted, user_j, workload_j, batch_j, duration_j = plan[j]
+            stats.start(workload_j, user_j, (workload_j, 'batch' if batch_j else 'default'), now - submitted)
+            running += 1
+            heapq.heappush(events, (now + duration_j, 0, j))
+    return stats
+
+
+def simulate_scheduled(plan, account_concurrency, scheduler):
+    table = InMemoryTable()
+    stats, events, throttled = Stats(), [], 0
+    meta = {}
+    for i, job in enumerate(plan):
+        heapq.heappush(events, (job[0], 1, i))
+
+    def start(admitted, now):
+        nonlocal throttled
+        for entry in admitted:
+            i = meta[entry['jobId']]
+            submitted, user, workload, batch, duration = plan[i]
+            if sum(stats.running.values()) >= account_concurrency:
+                throttled += 1
+            stats.start(workload, user, (workload, entry['priority']), now - submitted)
+            heapq.heappush(events, (now + duration, 0, i))
+
+    while events:
+        now, kind, i = heapq.heappop(events)
+        submitted, user, workload, batch, duration = plan[i]
+        job_id = f"job-{i}"
+        if kind == 0:
+            stats.finish(workload, user)
+            scheduler.release(table, workload, [job_id], now=now)
+            start(scheduler.admit(table, workload, now=now), now)
+            continue
+        meta[job_id] = i
+        table.put_item(Item={'jobId': job_id, 'status': 'PENDING', 'query': f"query {i}", 'version': 1})
+        submission = scheduler.Submission(workload, user, scheduler.priority_class(workload, batch=batch))
+        queued = scheduler.enqueue(table, [{'jobId': job_id, 'query': f"query {i}"}], submission, now=now)
+        stats.depths.append(queued[0]['queueDepth'])
+        start(scheduler.admit(table, workload, candidates=queued, now=now), now)
+    return stats, table, throttled
+
+
+def report(name, stats):
+    print(f"\n{name}")
+    print(f"  {'workload':12s} {'class':12s} {'jobs':>5s} {'wait p50':>9s} {'wait p95':>9s} {'wait max':>9s}")
+    for (workload, klass), waits in sorted(stats.waits.items()):
+        ordered = sorted(waits)
+        p95 = ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))]
+        print(f"  {workload:12s} {klass:12s} {len(waits):5d} {statistics.median(waits):8.1f}s "
+              f"{p95:8.1f}s {max(waits):8.1f}s")
+    print(f"  peak running per workload: {stats.peak}")
+    print(f"  peak running per user: {dict(sorted(stats.user_peak.items()))}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--minutes', type=float, default=30.0, help='submission window')
+    parser.add_argument('--account-concurrency', type=int, default=12)
+    parser.add_argument('--caps', default='standard=8,interleaved=4', help='SCHEDULER_WORKLOAD_CAPS')
+    parser.add_argument('--shares', default='interactive=1.0,standard=0.8,batch=0.5',
+                        help='SCHEDULER_PRIORITY_SHARES')
+    parser.add_argument('--user-quota', type=int, default=2, help='SCHEDULER_USER_MAX_RUNNING')
+    parser.add_argument('--bulk-jobs', type=int, default=60, help='interleaved batch jobs submitted at t=0')
+    parser.add_argument('--quick-users', type=int, default=5)
+    parser.add_argument('--quick-every', type=float, default=20.0, help='mean seconds between quick jobs per user')
+    parser.add_argument('--analyst-every', type=float, default=120.0)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    os.environ['SCHEDULER_WORKLOAD_CAPS'] = args.caps
+    os.environ['SCHEDULER_PRIORITY_SHARES'] = args.shares
+    os.environ['SCHEDULER_USER_MAX_RUNNING'] = str(args.user_quota)
+    scheduler = importlib.import_module('job_scheduler')
+
+    plan = workload_plan(args)
+    print(f"{len(plan)} jobs: {sum(1 for j in plan if j[2] == 'standard')} standard, "
+          f"{sum(1 for j in plan if j[2] == 'interleaved')} interleaved "
+          f"({args.bulk_jobs} of them one batch at t=0)")
+
+    report(f"immediate (account concurrency {args.account_concurrency}, first come first served)",
+           simulate_immediate(plan, args.account_concurrency))
+
+    import contextlib
+    import io
+    with contextlib.redirect_stdout(io.StringIO()):
+        stats, table, throttled = simulate_scheduled(plan, args.account_concurrency, scheduler)
+    report(f"scheduled (caps {args.caps}, user quota {args.user_quota}, shares {args.shares})", stats)
+    caps = scheduler.WORKLOAD_CAPS
+    over = {w: peak for w, peak in stats.peak.items() if peak > caps.get(w, peak)}
+    print(f"  caps respected: {not over}{'' if not over else f' (over: {over})'}; "
+          f"starts above account concurrency: {throttled}")
+    print(f"  queue depth at submit: p50 {statistics.median(stats.depths):.0f}, max {max(stats.depths)}")
+    print(f"  DynamoDB: {table.reads} reads, {table.writes} writes "
+          f"({(table.reads + table.writes) / len(plan):.1f} per job), "
+          f"{table.conditional_failures} failed conditions")
+    left = [item['jobId'] for item in table.items.values() if item.get('status') == 'QUEUED']
+    print(f"  jobs left queued: {len(left)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,440 @@
+# benchmarks/stubs.py
+# Local stand-ins used by the benchmark scripts so they run without AWS or Bedrock.
+import os
+import re
+import sys
+import threading
+import time
+
+DOCKERCODE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if DOCKERCODE_DIR not in sys.path:
+    sys.path.insert(0, DOCKERCODE_DIR)
+
+
+class StubModel:
+    """Deterministic fake model. Construction and each call cost a fixed amount of time."""
+
+    def __init__(self, construct_ms=0.0, call_ms=0.0, **config):
+        time.sleep(construct_ms / 1000.0)
+        self.config = config
+        self.call_ms = call_ms
+        self.calls = 0
+
+    def _text(self, prompt):
+        return f"[stub:{self.config.get('model_id', 'default')}] {prompt[:80]}"
+
+    def complete(self, system_prompt, prompt):
+        time.sleep(self.call_ms / 1000.0)
+        self.calls += 1
+        return self._text(prompt)
+
+    def stream(self, system_prompt, prompt):
+        """Same text as complete(), yielded word by word with call_ms spread over the words."""
+        self.calls += 1
+        words = self._text(prompt).split(' ')
+        for i, word in enumerate(words):
+            time.sleep(self.call_ms / 1000.0 / len(words))
+            yield word if i == 0 else ' ' + word
+
+
+class StubAgent:
+    """Mimics the small part of strands.Agent the workers rely on."""
+
+    def __init__(self, model=None, system_prompt=None, tools=None, callback_handler=None,
+                 construct_ms=0.0, call_ms=0.0, **kwargs):
+        self.model = model if model is not None else StubModel(construct_ms=construct_ms, call_ms=call_ms)
+        self.system_prompt = system_prompt
+        self.tools = tools or []
+        self.callback_handler = callback_handler
+        self.messages = []
+
+    def __call__(self, prompt, callback_handler=None):
+        self.messages.append({'role': 'user', 'content': [{'text': prompt}]})
+        # Like strands, a per-call callback_handler overrides the agent's own
+        callback = callback_handler or self.callback_handler
+        if callback is not None:
+            text = ''
+            for token in self.model.stream(self.system_prompt, prompt):
+                callback(data=token)
+                text += token
+        else:
+            text = self.model.complete(self.system_prompt, prompt)
+        self.messages.append({'role': 'assistant', 'content': [{'text': text}]})
+        return text
+
+
+class ConditionalCheckFailedException(Exception):
+    """Raised like botocore's ClientError, with the error code in .response."""
+
+    def __init__(self):
+        super().__init__('The conditional request failed')
+        self.response = {'Error': {'Code': 'ConditionalCheckFailedException'}}
+
+
+_MISSING = object()
+_TOKEN = re.compile(r"\s*(<=|>=|<>|[=<>(),]|[:#]?[A-Za-z_][\w.]*|\d+)")
+
+
+def _tokens(expression):
+    expression = expression.strip()
+    tokens, pos = [], 0
+    while pos < len(expression):
+        match = _TOKEN.match(expression, pos)
+        if not match:
+            raise ValueError(f"Can't parse expression at: {expression[pos:]!r}")
+        tokens.append(match.group(1))
+        pos = match.end()
+    return tokens
+
+
+class _Expression:
+    """
+    Evaluates the subset of DynamoDB condition and update expressions the
+    workers use: comparisons, IN, AND/OR/NOT, attribute_(not_)exists, and
+    SET (with list_append/if_not_exists), ADD and REMOVE clauses.
+    """
+
+    def __init__(self, expression, names, values):
+        self.tokens = _tokens(expression)
+        self.pos = 0
+        self.names = names or {}
+        self.values = values or {}
+
+    def _peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else None
+
+    def _next(self):
+        token = self._peek()
+        self.pos += 1
+        return token
+
+    def _expect(self, token):
+        if self._next() != token:
+            raise ValueError(f"Expected {token!r} in {' '.join(self.tokens)}")
+
+    def _name(self, token):
+        return self.names[token] if token.startswith('#') else token
+
+    def _operand(self, item):
+        token = self._next()
+        if token.startswith(':'):
+            return self.values[token]
+        if token in ('list_append', 'if_not_exists'):
+            self._expect('(')
+            first = self._operand(item)
+            self._expect(',')
+            second = self._operand(item)
+            self._expect(')')
+            if token == 'list_append':
+                return list(first) + list(second)
+            return second if first is _MISSING else first
+        return item.get(self._name(token), _MISSING)
+
+    # Conditions
+    def condition(self, item):
+        result = self._and(item)
+        while self._peek() and self._peek().upper() == 'OR':
+            self._next()
+            result = self._and(item) or result
+        return result
+
+    def _and(self, item):
+        result = self._unary(item)
+        while self._peek() and self._peek().upper() == 'AND':
+            self._next()
+            result = self._unary(item) and result
+        return result
+
+    def _unary(self, item):
+        if self._peek().upper() == 'NOT':
+            self._next()
+            return not self._unary(item)
+        if self._peek() == '(':
+            self._next()
+            result = self.condition(item)
+            self._expect(')')
+            return result
+        if self._peek() in ('attribute_exists', 'attribute_not_exists'):
+            function = self._next()
+            self._expect('(')
+            exists = self._name(self._next()) in item
+            self._expect(')')
+            return exists if function == 'attribute_exists' else not exists
+        left = self._operand(item)
+        operator = self._next()
+        if operator.upper() == 'IN':
+            self._expect('(')
+            options = [self._operand(item)]
+            while self._peek() == ',':
+                self._next()
+                options.append(self._operand(item))
+            self._expect(')')
+            return left in options
+        right = self._operand(item)
+        if left is _MISSING or right is _MISSING:
+            return operator == '<>'
+        return {'=': left == right, '<>': left != right, '<': left < right, '<=': left <= right,
+                '>': left > right, '>=': left >= right}[operator]
+
+    # Updates
+    def update(self, item):
+        """Applies the update to item in place; returns the names it set or added."""
+        changed = []
+        clause = None
+        while self._peek() is not None:
+            if self._peek().upper() in ('SET', 'ADD', 'REMOVE'):
+                clause = self._next().upper()
+                continue
+            if self._peek() == ',':
+                self._next()
+                continue
+            name = self._name(self._next())
+            if clause == 'SET':
+                self._expect('=')
+                item[name] = self._operand(item)
+                changed.append(name)
+            elif clause == 'ADD':
+                item[name] = item.get(name, 0) + self._operand(item)
+                changed.append(name)
+            else:
+                item.pop(name, None)
+        return changed
+
+
+class InMemoryTable:
+    """
+    Dict-backed stand-in for a boto3 DynamoDB Table, keyed by 'jobId'. Supports
+    the condition, update and projection expressions the handlers use, queries
+    on the table's indexes, and counts reads, writes and failed conditions.
+    """
+
+    # Global secondary indexes, as declared in terraform-infra/dynamodb.tf: name -> (hash key, range key)
+    INDEXES = {
+        'scheduler-queue-index': ('schedQueue', 'schedRank'),
+        'user-jobs-index': ('userId', 'createdAtMs'),
+        'archive-queue-index': ('archiveDay', 'finishedAt'),
+        'lease-expiry-index': ('leaseQueue', 'leaseExpiresAt'),
+    }
+
+    def __init__(self):
+        self.items = {}
+        self.reads = 0
+        # Read capacity units, as DynamoDB bills them (see _charge_read)
+        self.read_units = 0.0
+        self.writes = 0
+        self.conditional_failures = 0
+        self._lock = threading.Lock()
+
+    def _charge_read(self, item, consistent):
+        """One unit per 4 KB of the whole item (projections don't reduce it), half for eventual reads."""
+        size = sum(len(str(k)) + (len(v) if isinstance(v, (bytes, bytearray)) else len(str(v)))
+                   for k, v in (item or {}).items())
+        self.read_units += max(1, -(-size // 4096)) * (1.0 if consistent else 0.5)
+
+    def _check(self, item, condition, names, values):
+        if condition and not _Expression(condition, names, values).condition(item or {}):
+            self.conditional_failures += 1
+            raise ConditionalCheckFailedException()
+
+    def _project(self, item, projection, names):
+        if not projection:
+            return dict(item)
+        wanted = [names.get(n.strip(), n.strip()) if names else n.strip() for n in projection.split(',')]
+        return {k: v for k, v in item.items() if k in wanted}
+
+    def get_item(self, Key, ProjectionExpression=None, ExpressionAttributeNames=None, ConsistentRead=False,
+                 **kwargs):
+        with self._lock:
+            self.reads += 1
+            item = self.items.get(Key['jobId'])
+            self._charge_read(item, ConsistentRead)
+            return {'Item': self._project(item, ProjectionExpression, ExpressionAttributeNames)} if item else {}
+
+    def put_item(self, Item, ConditionExpression=None, ExpressionAttributeNames=None,
+                 ExpressionAttributeValues=None, **kwargs):
+        with self._lock:
+            self.writes += 1
+            self._check(self.items.get(Item['jobId']), ConditionExpression,
+                        ExpressionAttributeNames, ExpressionAttributeValues)
+            self.items[Item['jobId']] = dict(Item)
+            return {}
+
+    def update_item(self, Key, UpdateExpression, ConditionExpression=None, ExpressionAttributeNames=None,
+                    ExpressionAttributeValues=None, ReturnValues='NONE', **kwargs):
+        with self._lock:
+            self.writes += 1
+            current = self.items.get(Key['jobId'])
+            self._check(current, ConditionExpression, ExpressionAttributeNames, ExpressionAttributeValues)
+            item = dict(current or Key)
+            changed = _Expression(UpdateExpression, ExpressionAttributeNames, ExpressionAttributeValues).update(item)
+            self.items[Key['jobId']] = item
+            if ReturnValues == 'ALL_NEW':
+                return {'Attributes': dict(item)}
+            if ReturnValues == 'UPDATED_NEW':
+                return {'Attributes': {name: item[name] for name in changed}}
+            return {}
+
+    def query(self, IndexName, KeyConditionExpression, ExpressionAttributeValues, Limit=None,
+              ScanIndexForward=True, ExclusiveStartKey=None, FilterExpression=None, ProjectionExpression=None,
+              ExpressionAttributeNames=None, **kwargs):
+        """
+        Equality on the index's hash key, ordered by its range key (see
+        INDEXES). Like DynamoDB, Limit applies before FilterExpression, and a
+        page cut short by Limit returns a LastEvaluatedKey.
+        """
+        hash_key, range_key = self.INDEXES[IndexName]
+        name, value = (part.strip() for part in KeyConditionExpression.split('='))
+        assert name == hash_key, f"{IndexName} is keyed by {hash_key}, not {name}"
+        with self._lock:
+            self.reads += 1
+            found = sorted((dict(item) for item in self.items.values()
+                            if item.get(hash_key) == ExpressionAttributeValues[value] and range_key in item),
+                           key=lambda item: (item[range_key], item['jobId']), reverse=not ScanIndexForward)
+        if ExclusiveStartKey:
+            start = (ExclusiveStartKey[range_key], ExclusiveStartKey['jobId'])
+            found = [item for item in found
+                     if ((item[range_key], item['jobId']) > start if ScanIndexForward
+                         else (item[range_key], item['jobId']) < start)]
+        page = found[:Limit] if Limit else found
+        response = {}
+        if Limit and len(found) > Limit:
+            last = page[-1]
+            response['LastEvaluatedKey'] = {'jobId': last['jobId'], hash_key: last[hash_key],
+                                            range_key: last[range_key]}
+        if FilterExpression:
+            page = [item for item in page if _Expression(FilterExpression, ExpressionAttributeNames,
+                                                         ExpressionAttributeValues).condition(item)]
+        response['Items'] = [self._project(item, ProjectionExpression, ExpressionAttributeNames) for item in page]
+        return response
+
+    def delete_item(self, Key, **kwargs):
+        with self._lock:
+            self.writes += 1
+            self.items.pop(Key['jobId'], None)
+            return {}
+
+    def batch_writer(self, **kwargs):
+        return _BatchWriter(self)
+
+
+class InMemoryDynamoDB:
+    """Stand-in for boto3.resource('dynamodb'): one InMemoryTable per name, plus batch_get_item."""
+
+    def __init__(self):
+        self.tables = {}
+
+    def Table(self, name):
+        return self.tables.setdefault(name, InMemoryTable())
+
+    def batch_get_item(self, RequestItems):
+        responses = {}
+        for name, request in RequestItems.items():
+            table = self.Table(name)
+            responses[name] = [
+                found['Item'] for found in (
+                    table.get_item(Key=key, ProjectionExpression=request.get('ProjectionExpression'),
+                                   ExpressionAttributeNames=request.get('ExpressionAttributeNames'))
+                    for key in request['Keys'])
+                if 'Item' in found
+            ]
+        return {'Responses': responses, 'UnprocessedKeys': {}}
+
+
+class _BatchWriter:
+    def __init__(self, table):
+        self.table = table
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def put_item(self, Item):
+        self.table.put_item(Item=Item)
+
+
+class InMemoryQueue:
+    """
+    SQS stand-in. receive_event() builds a Lambda SQS event from visible messages
+    and hides them for visibility_timeout seconds, as sqs.tf configures;
+    change_message_visibility_batch() shortens that, and complete() applies a
+    partial batch response by deleting the handled messages. Reported failures
+    stay hidden until their visibility timeout is up.
+    """
+
+    ARN = 'arn:aws:sqs:local:000000000000:jobs'
+
+    def __init__(self, visibility_timeout=5400, clock=time.monotonic):
+        self.visibility_timeout = visibility_timeout
+        self.clock = clock
+        self.messages = {}
+        self.visible_at = {}
+        self.receives = {}
+        self.visibility_changes = 0
+        self._next_id = 0
+
+    def send_message_batch(self, QueueUrl=None, Entries=()):
+        for entry in Entries:
+            self.send(entry['MessageBody'])
+        return {'Successful': [{'Id': e['Id']} for e in Entries], 'Failed': []}
+
+    def send(self, body):
+        self._next_id += 1
+        message_id = f"msg-{self._next_id}"
+        self.messages[message_id] = body
+        return message_id
+
+    def receive_event(self, max_messages=10):
+        now = self.clock()
+        visible = [m for m in self.messages if self.visible_at.get(m, 0) <= now][:max_messages]
+        records = []
+        for message_id in visible:
+            self.visible_at[message_id] = now + self.visibility_timeout
+            self.receives[message_id] = self.receives.get(message_id, 0) + 1
+            records.append({'messageId': message_id, 'body': self.messages[message_id],
+                            'receiptHandle': f"{message_id}/{self.receives[message_id]}",
+                            'attributes': {'ApproximateReceiveCount': str(self.receives[message_id])},
+                            'eventSourceARN': self.ARN})
+        return {'Records': records}
+
+    def change_message_visibility_batch(self, QueueUrl=None, Entries=()):
+        failed = []
+        for entry in Entries:
+            message_id, _, receive = entry['ReceiptHandle'].partition('/')
+            if message_id not in self.messages or str(self.receives.get(message_id)) != receive:
+                failed.append({'Id': entry['Id'], 'Code': 'ReceiptHandleIsInvalid'})
+                continue
+            self.visible_at[message_id] = self.clock() + entry['VisibilityTimeout']
+            self.visibility_changes += 1
+        return {'Successful': [{'Id': e['Id']} for e in Entries if e['Id'] not in {f['Id'] for f in failed}],
+                'Failed': failed}
+
+    def complete(self, event, response):
+        failed = {f['itemIdentifier'] for f in (response or {}).get('batchItemFailures', [])}
+        for record in event['Records']:
+            if record['messageId'] not in failed:
+                del self.messages[record['messageId']]
+                self.visible_at.pop(record['messageId'], None)
+
+    def next_visible_in(self):
+        """Seconds until the next message becomes visible (0 if one is now), or None if the queue is empty."""
+        if not self.messages:
+            return None
+        now = self.clock()
+        return max(0.0, min(self.visible_at.get(m, 0) for m in self.messages) - now)
+
+    def __len__(self):
+        return len(self.messages)
+
+
+class FakeLambdaContext:
+    """Lambda context whose remaining time runs down in real time from timeout_ms."""
+
+    def __init__(self, timeout_ms=900000, function_name='local-worker'):
+        self.function_name = function_name
+        self.invoked_function_arn = f"arn:aws:lambda:local:000000000000:function:{function_name}"
+        self._deadline = time.monotonic() + timeout_ms / 1000.0
+
+    def get_remaining_time_in_millis(self):
+        return max(0, int((self._deadline - time.monotonic()) * 1000))
@@ -0,0 +1,109 @@
+# change_feed.py
+import abc
+import threading
+import time
+
+# Long polls are capped well under API Gateway's 29 second integration timeout
+LONG_POLL_MAX_SECONDS = 20
+TERMINAL_STATUSES = ('COMPLETE', 'FAILED')
+
+
+def _version(item):
+    return int(item.get('version', 0)) if item else 0
+
+
+def _changed(item, since_version):
+    return item is None or _version(item) > since_version or item.get('status') in TERMINAL_STATUSES
+
+
+class ChangeFeed(abc.ABC):
+    """
+    Lets a reader block until a job item changes. wait_for_change() returns the
+    job's latest status fields as soon as its version passes since_version (or
+    it reaches a final status), or whatever is current once the timeout expires.
+    Returns None if the job does not exist.
+    """
+
+    @abc.abstractmethod
+    def latest(self, job_id):
+        """The job's status and version, or None."""
+
+    @abc.abstractmethod
+    def wait_for_change(self, job_id, since_version, timeout):
+        """Blocks until the job changes past since_version or timeout (capped at LONG_POLL_MAX_SECONDS)."""
+
+
+class TableChangeFeed(ChangeFeed):
+    """
+    Change feed over the DynamoDB job table. Each check is an eventually
+    consistent read (half the read capacity of a consistent one) of
+    `projection`, which holds at least status and version, repeated with gaps
+    that double up to the 5 seconds the frontend used to poll at. A long poll
+    ends at the first check that sees a newer version or a final status, and
+    the caller answers from the item that ended the wait instead of reading
+    it again.
+    """
+
+    def __init__(self, table, first_interval=0.5, max_interval=5.0, backoff=2.0,
+                 projection="#s, version", names=None):
+        self.table = table
+        self.projection = projection
+        self.names = names or {'#s': 'status'}
+        self.first_interval = first_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.reads = 0
+
+    def latest(self, job_id, consistent=False):
+        self.reads += 1
+        return self.table.get_item(
+            Key={'jobId': job_id},
+            ProjectionExpression=self.projection,
+            ExpressionAttributeNames=self.names,
+            ConsistentRead=consistent
+        ).get('Item')
+
+    def wait_for_change(self, job_id, since_version, timeout):
+        deadline = time.monotonic() + min(timeout, LONG_POLL_MAX_SECONDS)
+        interval = self.first_interval
+        if since_version > 0:
+            # The client has just been answered with since_version: checking at once would
+            # almost always find nothing new, so the first check waits one interval
+            time.sleep(max(min(interval, deadline - time.monotonic()), 0))
+            interval = min(interval * self.backoff, self.max_interval)
+        while True:
+            # A job created a moment ago may not be visible to an eventually consistent read yet
+            item = self.latest(job_id) or self.latest(job_id, consistent=True)
+            remaining = deadline - time.monotonic()
+            if _changed(item, since_version) or remaining <= 0:
+                return item
+            time.sleep(min(interval, remaining))
+            interval = min(interval * self.backoff, self.max_interval)
+
+
+class InMemoryChangeFeed(ChangeFeed):
+    """Local stand-in: writers call publish(item) and waiting readers wake immediately."""
+
+    def __init__(self):
+        self._items = {}
+        self._condition = threading.Condition()
+
+    def publish(self, item):
+        with self._condition:
+            self._items[item['jobId']] = dict(item)
+            self._condition.notify_all()
+
+    def latest(self, job_id):
+        with self._condition:
+            item = self._items.get(job_id)
+            return dict(item) if item else None
+
+    def wait_for_change(self, job_id, since_version, timeout):
+        deadline = time.monotonic() + min(timeout, LONG_POLL_MAX_SECONDS)
+        with self._condition:
+            while True:
+                item = self._items.get(job_id)
+                remaining = deadline - time.monotonic()
+                if _changed(item, since_version) or remaining <= 0:
+                    return dict(item) if item else None
+                self._condition.wait(remaining)
@@ -0,0 +1,194 @@
+# context_store.py
+# Keeps specialist outputs out of the orchestrator's transcript. Each output is
+# stored under a handle (e.g. ctx:researcher:1) and the orchestrator only sees a
+# short digest; other tools, and the final answer, get the full text back when
+# they mention the handle.
+import contextvars
+import functools
+import os
+import re
+import threading
+from contextlib import contextmanager
+
+import tracing
+from pre_router import estimate_tokens
+
+CONTEXT_COMPACTION = os.environ.get('CONTEXT_COMPACTION', 'true').lower() == 'true'
+# Outputs up to this size go into the transcript as they are
+CONTEXT_INLINE_MAX_CHARS = int(os.environ.get('CONTEXT_INLINE_MAX_CHARS', '1200'))
+CONTEXT_DIGEST_CHARS = int(os.environ.get('CONTEXT_DIGEST_CHARS', '600'))
+# Tokens a workflow may move through tools: digests and reads into the
+# orchestrator transcript, plus dereferenced text passed to specialists
+CONTEXT_TOKEN_BUDGET = int(os.environ.get('CONTEXT_TOKEN_BUDGET', '60000'))
+
+HANDLE_PATTERN = re.compile(r'\bctx:[a-z_]+:\d+\b')
+
+HANDLE_GUIDANCE = """
+Specialist results come back as a short digest tagged with a handle such as ctx:researcher:1.
+To hand a result to another specialist, pass its handle instead of copying the text; the specialist
+receives the full text. Call read_artifact(handle) only if you need the full text yourself.
+To include a result in your final answer verbatim, write its handle; it is replaced with the full text.""" if CONTEXT_COMPACTION else ""
+
+_current = contextvars.ContextVar('workflow_context', default=None)
+_active_lock = threading.Lock()
+_active = []
+
+
+def digest(text, max_chars=CONTEXT_DIGEST_CHARS):
+    """
+    Extractive digest: headings and bullet lines first (they carry the
+    structure), then leading sentences, up to max_chars. No model call.
+    """
+    text = (text or '').strip()
+    if len(text) <= max_chars:
+        return text
+    lines = [line.strip() for line in text.splitlines() if line.strip()]
+    picked = [line for line in lines if line.startswith(('#', '-', '*', '•')) or re.match(r'\d+[.)] ', line)]
+    sentences = re.split(r'(?<=[.!?])\s+', ' '.join(line for line in lines if line not in picked))
+    out, size = [], 0
+    for piece in sentences[:2] + picked + sentences[2:]:
+        if size + len(piece) + 1 > max_chars:
+            break
+        out.append(piece)
+        size += len(piece) + 1
+    return ' '.join(out) or text[:max_chars]
+
+
+class WorkflowContext:
+    """Artifacts and token budget of one workflow run."""
+
+    def __init__(self, token_budget=CONTEXT_TOKEN_BUDGET, inline_max_chars=CONTEXT_INLINE_MAX_CHARS,
+                 digest_chars=CONTEXT_DIGEST_CHARS):
+        self.token_budget = token_budget
+        self.inline_max_chars = inline_max_chars
+        self.digest_chars = digest_chars
+        self._lock = threading.Lock()
+        self._artifacts = {}
+        self._counters = {}
+        self.tokens_used = 0
+        self.tokens_saved = 0
+
+    @property
+    def remaining(self):
+        return max(self.token_budget - self.tokens_used, 0)
+
+    def _charge(self, text):
+        with self._lock:
+            self.tokens_used += estimate_tokens(text)
+        return text
+
+    def put(self, tool_name, text):
+        with self._lock:
+            n = self._counters[tool_name] = self._counters.get(tool_name, 0) + 1
+            handle = f"ctx:{tool_name}:{n}"
+            self._artifacts[handle] = text
+        return handle
+
+    def get(self, handle):
+        with self._lock:
+            return self._artifacts.get(handle)
+
+    def compact(self, tool_name, text):
+        """What the orchestrator sees of a tool's output."""
+        text = str(text)
+        if len(text) <= self.inline_max_chars:
+            return self._charge(text)
+        handle = self.put(tool_name, text)
+        # Digests shrink as the budget runs out, down to a single sentence
+        share = self.remaining / self.token_budget if self.token_budget else 0
+        summary = digest(text, max(int(self.digest_chars * share), 120))
+        entry = f"[{handle}] {summary} ({len(text)} chars stored under {handle})"
+        with self._lock:
+            self.tokens_saved += estimate_tokens(text) - estimate_tokens(entry)
+        return self._charge(entry)
+
+    def expand(self, text, charge=True):
+        """Replaces handles in text with the stored artifacts, cut to the remaining budget."""
+        def replace(match):
+            artifact = self.get(match.group(0))
+            if artifact is None:
+                return match.group(0)
+            limit = self.remaining * 4 if charge else len(artifact)
+            if len(artifact) > limit:
+                artifact = artifact[:limit] + f"\n[truncated: workflow context budget reached; see {match.group(0)}]"
+            return self._charge(artifact) if charge else artifact
+        return HANDLE_PATTERN.sub(replace, str(text))
+
+    def read(self, handle):
+        """Full text of one artifact, for the orchestrator itself (counts against the budget)."""
+        handle = handle.strip()
+        if self.get(handle) is None:
+            return f"No artifact named {handle}."
+        return self.expand(handle)
+
+    def snapshot(self):
+        """The stored artifacts, for a workflow checkpoint."""
+        with self._lock:
+            return dict(self._artifacts)
+
+    def restore(self, artifacts):
+        """Puts back artifacts from a checkpoint; new handles continue their numbering."""
+        with self._lock:
+            self._artifacts.update(artifacts)
+            for handle in artifacts:
+                _, tool_name, n = handle.split(':')
+                self._counters[tool_name] = max(self._counters.get(tool_name, 0), int(n))
+
+    def usage(self):
+        with self._lock:
+            return {'contextTokens': self.tokens_used, 'contextTokensSaved': max(self.tokens_saved, 0),
+                    'artifacts': len(self._artifacts)}
+
+
+def current_context():
+    """The calling workflow, or the only one in flight when the thread didn't inherit the context."""
+    ctx = _current.get()
+    if ctx is not None:
+        return ctx
+    with _active_lock:
+        active = list(_active)
+    if len(active) > 1:
+        # Compaction is off for this call; see tracing.call_agent for how tools keep the context
+        tracing.context_lost('workflow_context', len(active))
+    return active[0] if len(active) == 1 else None
+
+
+@contextmanager
+def workflow_context(**options):
+    """Scopes artifacts and the token budget to one workflow run. Yields None when compaction is off."""
+    if not CONTEXT_COMPACTION:
+        yield None
+        return
+    ctx = WorkflowContext(**options)
+    token = _current.set(ctx)
+    with _active_lock:
+        _active.append(ctx)
+    try:
+        yield ctx
+    finally:
+        _current.reset(token)
+        with _active_lock:
+            _active.remove(ctx)
+
+
+def compacting(fn):
+    """
+    Decorator for specialist tools: handles in string arguments are expanded to
+    the full text, and the return value is compacted for the orchestrator.
+    Outside a workflow context the tool runs unchanged.
+    """
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        ctx = current_context()
+        if ctx is None:
+            return fn(*args, **kwargs)
+        args = [ctx.expand(a) if isinstance(a, str) else a for a in args]
+        kwargs = {k: ctx.expand(v) if isinstance(v, str) else v for k, v in kwargs.items()}
+        return ctx.compact(fn.__name__, fn(*args, **kwargs))
+    return wrapper
+
+
+def read_artifact(handle: str) -> str:
+    """Returns the full text stored under a handle such as ctx:researcher:1."""
+    ctx = current_context()
+    return ctx.read(handle) if ctx is not None else f"No artifact named {handle}."
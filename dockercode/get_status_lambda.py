@@ -2,6 +2,13 @@
 import json
 import boto3
 import os
+import time
+from decimal import Decimal
+
+from change_feed import TableChangeFeed
+from job_lifecycle import load_archive
+from progress_stream import chunks_since
+from result_store import load_result
 
 TABLE_NAME = os.environ.get('TABLE_NAME')
 if not TABLE_NAME:
@@ -10,31 +17,201 @@ if not TABLE_NAME:
 dynamodb = boto3.resource('dynamodb')
 table = dynamodb.Table(TABLE_NAME)
 
+# batch_get_item accepts at most 100 keys per request
+BATCH_GET_LIMIT = 100
+MAX_BATCH_JOBS = int(os.environ.get('MAX_BATCH_JOBS', '500'))
+BATCH_GET_RETRIES = 5
+
+# Polling reads only touch the small status fields, never the query or result
+STATUS_PROJECTION = "jobId, #s, version, progressSeq, resultSize, resultSha256, queueDepth, waitMs"
+STATUS_NAMES = {'#s': 'status'}
+# The streamed progress, read only for ?sinceSeq=N
+CHUNKS_PROJECTION = "chunks, chunkBase"
+TERMINAL_STATUSES = ('COMPLETE', 'FAILED')
+
+# A long poll's checks read what the answer needs, so the check that ends the wait is the answer
+change_feed = TableChangeFeed(table, projection=STATUS_PROJECTION + ", " + CHUNKS_PROJECTION, names=STATUS_NAMES)
+
+def _json_default(value):
+    # DynamoDB returns numbers (e.g. progressSeq) as Decimal
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def _response(status_code, body, headers=None):
+    response = {'statusCode': status_code, 'body': json.dumps(body, default=_json_default)}
+    if headers:
+        response['headers'] = headers
+    return response
+
+def _etag(item):
+    return f'"{item.get("jobId")}-{int(item.get("version", 0))}"'
+
+def _if_none_match(event):
+    headers = event.get('headers') or {}
+    return next((v for k, v in headers.items() if k.lower() == 'if-none-match'), None)
+
+def _flag(params, name):
+    return str(params.get(name, 'false')).lower() == 'true'
+
 def lambda_handler(event, context):
     """
     Checks the status of a job in the DynamoDB table.
+
+    Query string parameters:
+      jobId            the job to check (or jobIds=a,b,c for a batch check)
+      includeResult    'true' to include the result body once the job is COMPLETE/FAILED
+      sinceSeq         return only the progress chunks after this sequence number
+      consistentRead   'true' for a strongly consistent read (default: eventually consistent)
+      view             'full' for the whole item, including the original query (read back
+                       from the archive once the job has been archived)
+      waitSeconds      long poll: together with sinceVersion, block (up to 20s) until the
+      sinceVersion     job's version passes sinceVersion or it finishes, then respond
+    An If-None-Match header matching the job's ETag returns 304 with no body.
     """
     try:
         # The jobId will be passed as a query string parameter, e.g., /get-job-status?jobId=1234
-        job_id = event.get('queryStringParameters', {}).get('jobId')
+        params = event.get('queryStringParameters') or {}
+
+        if params.get('jobIds'):
+            return get_batch_status(params['jobIds'], _flag(params, 'consistentRead'))
 
+        job_id = params.get('jobId')
         if not job_id:
-            return {'statusCode': 400, 'body': json.dumps({'error': 'jobId not provided.'})}
+            return _response(400, {'error': 'jobId not provided.'})
+
+        wait_seconds = params.get('waitSeconds')
+        since_version = params.get('sinceVersion')
+        waited = None
+        if wait_seconds is not None and since_version is not None:
+            if not str(since_version).isdigit() or not str(wait_seconds).isdigit():
+                return _response(400, {'error': 'waitSeconds and sinceVersion must be non-negative integers.'})
+            waited = change_feed.wait_for_change(job_id, int(since_version), int(wait_seconds))
+            if waited is None:
+                return _response(404, {'error': 'Job not found.'})
+
+        consistent = _flag(params, 'consistentRead')
+        if waited is not None and waited.get('status') in TERMINAL_STATUSES:
+            # The wait saw the job finish; the result read must not hit an older replica
+            consistent = True
+        # Offloaded results are only fetched when the client asks for the body
+        include_result = _flag(params, 'includeResult')
+
+        since_seq = params.get('sinceSeq')
+        if since_seq is not None:
+            if not str(since_seq).isdigit():
+                return _response(400, {'error': 'sinceSeq must be a non-negative integer.'})
+            return get_progress(job_id, int(since_seq), include_result, consistent, item=waited)
 
-        # Query DynamoDB for the job
-        response = table.get_item(Key={'jobId': job_id})
-        
-        item = response.get('Item')
+        if params.get('view') == 'full':
+            item = table.get_item(Key={'jobId': job_id}, ConsistentRead=consistent).get('Item')
+            if item and item.get('archiveRef'):
+                item.update(load_archive(table, item))
+                item.pop('archiveRef')
+        elif waited is not None:
+            item = {k: v for k, v in waited.items() if k not in ('chunks', 'chunkBase')}
+        else:
+            item = table.get_item(
+                Key={'jobId': job_id},
+                ProjectionExpression=STATUS_PROJECTION,
+                ExpressionAttributeNames=STATUS_NAMES,
+                ConsistentRead=consistent
+            ).get('Item')
 
         if not item:
-            return {'statusCode': 404, 'body': json.dumps({'error': 'Job not found.'})}
+            return _response(404, {'error': 'Job not found.'})
 
-        # Return the full item (status, result, etc.)
-        return {
-            'statusCode': 200,
-            'body': json.dumps(item)
-        }
+        etag = _etag(item)
+        if _if_none_match(event) == etag:
+            return {'statusCode': 304, 'headers': {'ETag': etag}, 'body': ''}
+
+        if include_result:
+            attach_result(item, consistent)
+        item.pop('resultRef', None)
+
+        return _response(200, item, {'ETag': etag})
 
     except Exception as e:
         print(f"Error: {e}")
-        return {'statusCode': 500, 'body': json.dumps({'error': str(e)})}
+        return _response(500, {'error': str(e)})
+
+
+def attach_result(item, consistent=False):
+    """Adds the result body to a finished job: from result storage, the inline attribute or the archive."""
+    if item.get('status') not in TERMINAL_STATUSES or 'result' in item:
+        return
+    stored = table.get_item(
+        Key={'jobId': item['jobId']},
+        ProjectionExpression="jobId, #r, resultRef, resultSha256, archiveRef",
+        ExpressionAttributeNames={'#r': 'result'},
+        ConsistentRead=consistent
+    ).get('Item', {})
+    if stored.get('resultRef') and item.get('status') == 'COMPLETE':
+        item['result'] = load_result(table, stored)
+    elif 'result' in stored:
+        item['result'] = stored['result']
+    elif stored.get('archiveRef'):
+        archived = load_archive(table, stored)
+        if 'result' in archived:
+            item['result'] = archived['result']
+
+
+def get_progress(job_id, since_seq, include_result=False, consistent=False, item=None):
+    """
+    Incremental read for ?sinceSeq=N: returns only the streamed chunks after N.
+    The (potentially large) result is only read once the job has finished.
+    item is the status and chunks a long poll already read, if any.
+    """
+    if item is None:
+        item = table.get_item(
+            Key={'jobId': job_id},
+            ProjectionExpression=STATUS_PROJECTION + ", " + CHUNKS_PROJECTION,
+            ExpressionAttributeNames=STATUS_NAMES,
+            ConsistentRead=consistent
+        ).get('Item')
+    if not item:
+        return _response(404, {'error': 'Job not found.'})
+
+    item['chunks'] = chunks_since(item, since_seq)
+    item.pop('chunkBase', None)
+    item['progressSeq'] = int(item.get('progressSeq', 0))
+    if include_result:
+        attach_result(item, consistent)
+    return _response(200, item, {'ETag': _etag(item)})
+
+
+def get_batch_status(job_ids_param, consistent=False):
+    """Status-only check of many jobs (?jobIds=a,b,c) using batch_get_item."""
+    job_ids = list(dict.fromkeys(j.strip() for j in job_ids_param.split(',') if j.strip()))
+    if len(job_ids) > MAX_BATCH_JOBS:
+        return _response(400, {'error': f'At most {MAX_BATCH_JOBS} jobIds per request.'})
+
+    found = {}
+    unprocessed = []
+    for start in range(0, len(job_ids), BATCH_GET_LIMIT):
+        request = {TABLE_NAME: {
+            'Keys': [{'jobId': j} for j in job_ids[start:start + BATCH_GET_LIMIT]],
+            'ProjectionExpression': STATUS_PROJECTION,
+            'ExpressionAttributeNames': STATUS_NAMES,
+            'ConsistentRead': consistent,
+        }}
+        for attempt in range(BATCH_GET_RETRIES):
+            response = dynamodb.batch_get_item(RequestItems=request)
+            for item in response.get('Responses', {}).get(TABLE_NAME, []):
+                found[item['jobId']] = item
+            request = response.get('UnprocessedKeys') or {}
+            if not request:
+                break
+            # Throttled keys come back unprocessed; back off before retrying them
+            time.sleep(0.05 * 2 ** attempt)
+        if request:
+            unprocessed.extend(k['jobId'] for k in request[TABLE_NAME]['Keys'])
+
+    jobs = []
+    for job_id in job_ids:
+        if job_id in found:
+            item = found[job_id]
+            item['etag'] = _etag(item)
+            jobs.append(item)
+    missing = [j for j in job_ids if j not in found and j not in unprocessed]
+    return _response(200, {'jobs': jobs, 'missing': missing, 'unprocessed': unprocessed})
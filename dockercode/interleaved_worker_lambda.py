@@ -1,67 +1,134 @@
 # interleaved_worker_lambda.py (Definitive Version)
+import time
+_IMPORT_STARTED = time.perf_counter()
+
 import os
-import boto3
-from strands import Agent, tool
-from strands.models import BedrockModel
+import startup
+import tracing
+from agent_pool import shared_pool
+from context_store import HANDLE_GUIDANCE, compacting, read_artifact, workflow_context
+from tool_runtime import orchestrator_kwargs, tool_runner
+from job_coalescing import settle_followers
+from job_scheduler import is_pump_event
+from job_store import claim_job, complete_job, fail_job, retry_job, suspend_job
+from job_submission import build_dispatcher, dispatch_queued, redeliver_expired
+from job_batch import MAX_JOB_ATTEMPTS, RetryLater, build_retry_scheduler, handle_job_list, handle_sqs_batch
+from model_calls import ModelUnavailableError, call_agent, model_available, model_retry_after
+from model_tiers import orchestrator_config, run_tiered
+from progress_stream import make_streamer
+from result_store import build_result_store
+from workflow_checkpoint import (CHECKPOINT_MAX_SUSPENSIONS, CHECKPOINTS_ENABLED, WorkflowCheckpoint,
+                                 checkpointed, resuming, start_invocation)
 
 # --- Boilerplate for DynamoDB ---
 TABLE_NAME = os.environ.get('TABLE_NAME')
 if not TABLE_NAME:
     raise Exception("Error: TABLE_NAME environment variable not set.")
-dynamodb = boto3.resource('dynamodb')
-table = dynamodb.Table(TABLE_NAME)
+
+# AWS clients are built on first use, inside an invocation (see startup.py)
+def _build_table():
+    import boto3
+    return boto3.resource('dynamodb').Table(TABLE_NAME)
+
+def _build_lambda_client():
+    import boto3
+    return boto3.client('lambda')
+
+def _build_sqs_client():
+    import boto3
+    return boto3.client('sqs')
+
+table = startup.Lazy('dynamodb_table', _build_table, phase=startup.INVOKE)
+lambda_client = startup.Lazy('lambda_client', _build_lambda_client, phase=startup.INVOKE)
+sqs_client = startup.Lazy('sqs_client', _build_sqs_client, phase=startup.INVOKE)
+retry_scheduler = startup.Lazy('retry_scheduler', build_retry_scheduler, phase=startup.INVOKE)
+result_store = startup.Lazy('result_store', lambda: build_result_store(table.get()), phase=startup.INVOKE)
+
+# Scheduled jobs of this workload are dispatched back to this function as slots free up
+WORKLOAD = 'interleaved'
+FUNCTION_NAME = os.environ.get('AWS_LAMBDA_FUNCTION_NAME')
+dispatcher = startup.Lazy('dispatcher', lambda: build_dispatcher(lambda_client.get(), FUNCTION_NAME),
+                          phase=startup.INVOKE)
 
 # --- Tool Agent Definitions (from before) ---
-@tool
+# Specialist agents come from the shared pool, so a warm container reuses them
+RESEARCHER_PROMPT = "You are a research specialist. Gather factual information and cite sources."
+DATA_ANALYST_PROMPT = "You are a data analyst. Extract key insights and identify patterns."
+FACT_CHECKER_PROMPT = "You are a fact checker. Verify claims and assess credibility."
+REPORT_WRITER_PROMPT = "You are a professional report writer. Create clear, well-structured reports."
+
+@checkpointed
+@compacting
 def researcher(query: str) -> str:
     """Research specialist that gathers factual information."""
-    agent = Agent(system_prompt="You are a research specialist. Gather factual information and cite sources.", callback_handler=None)
-    return str(agent(f"Research: {query}"))
+    return tool_runner.call('researcher', run_tiered, 'researcher', RESEARCHER_PROMPT, f"Research: {query}", cache=True, callback_handler=None)
 
-@tool
+@checkpointed
+@compacting
 def data_analyst(data: str) -> str:
     """Data analyst that processes and analyzes information."""
-    agent = Agent(system_prompt="You are a data analyst. Extract key insights and identify patterns.", callback_handler=None)
-    return str(agent(f"Analyze this data and provide insights: {data}"))
+    return tool_runner.call('data_analyst', run_tiered, 'data_analyst', DATA_ANALYST_PROMPT, f"Analyze this data and provide insights: {data}", callback_handler=None)
 
-@tool
+@checkpointed
+@compacting
 def fact_checker(information: str) -> str:
     """Fact checker that verifies information accuracy."""
-    agent = Agent(system_prompt="You are a fact checker. Verify claims and assess credibility.", callback_handler=None)
-    return str(agent(f"Fact-check this information: {information}"))
+    return tool_runner.call('fact_checker', run_tiered, 'fact_checker', FACT_CHECKER_PROMPT, f"Fact-check this information: {information}", callback_handler=None)
 
-@tool
+@checkpointed
+@compacting
 def report_writer(analysis: str) -> str:
     """Report writer that creates polished final documents."""
-    agent = Agent(system_prompt="You are a professional report writer. Create clear, well-structured reports.", callback_handler=None)
-    return str(agent(f"Create a professional report based on: {analysis}"))
+    return tool_runner.call('report_writer', run_tiered, 'report_writer', REPORT_WRITER_PROMPT, f"Create a professional report based on: {analysis}", callback_handler=None)
 
 # --- Orchestrator Class ---
+# Replicating the exact BedrockModel configuration from the working notebook
+# Note: The model_id in the notebook was a beta version. We'll use the official Sonnet 3.5 ID,
+# but keep the structure for interleaved thinking if the feature is supported.
+# ORCHESTRATOR_MODEL_CONFIG (JSON) in the environment overrides any of these (see model_tiers.py);
+# specialists get their models from their tier profiles.
+ORCHESTRATOR_MODEL_CONFIG = orchestrator_config({
+    'model_id': "anthropic.claude-3-5-sonnet-20240620-v1:0", # Using the latest Sonnet model
+    'max_tokens': 4096,
+    'temperature': 1.0, # Temperature must be > 0 for interleaved thinking
+})
+
 class StrandsInterleavedWorkflowOrchestrator:
     def __init__(self):
         self.system_prompt = """You are an intelligent workflow orchestrator with access to specialist agents:
         - researcher, data_analyst, fact_checker, report_writer.
-        Your role is to intelligently coordinate a workflow using these agents to fulfill the user's task."""
-
-    def run_workflow(self, task: str) -> str:
-        # --- THIS IS THE CRITICAL FIX ---
-        # Replicating the exact BedrockModel configuration from the working notebook
-        # Note: The model_id in the notebook was a beta version. We'll use the official Sonnet 3.5 ID,
-        # but keep the structure for interleaved thinking if the feature is supported.
-        claude_model = BedrockModel(
-            model_id="anthropic.claude-3-5-sonnet-20240620-v1:0", # Using the latest Sonnet model
-            max_tokens=4096,
-            temperature=1.0, # Temperature must be > 0 for interleaved thinking
-            
-        )
-        # --- END OF CRITICAL FIX ---
+        Your role is to intelligently coordinate a workflow using these agents to fulfill the user's task.
+        When sub-questions are independent of each other, request all of those tool calls in the same turn so they run in parallel.""" + HANDLE_GUIDANCE
+        # Wrapped with @tool on first use, so importing this module doesn't import strands
+        self.tools = startup.Lazy('orchestrator_tools', lambda: startup.as_tools(
+            researcher, data_analyst, fact_checker, report_writer, read_artifact))
 
-        orchestrator = Agent(
-            model=claude_model,
-            system_prompt=self.system_prompt,
-            tools=[researcher, data_analyst, fact_checker, report_writer]
+    def acquire(self):
+        """Checks out a pooled orchestrator Agent with a fresh conversation."""
+        return shared_pool.acquire(
+            self.system_prompt,
+            model_config=ORCHESTRATOR_MODEL_CONFIG,
+            tools=self.tools.get(),
+            **orchestrator_kwargs(),
         )
-        
+
+    def run_workflow(self, task: str, callback_handler=None, checkpoint=None) -> str:
+        # The model (and its Bedrock client) and the orchestrator Agent are cached per
+        # configuration in the shared pool; each request only gets a fresh conversation.
+        # Specialist outputs are kept out of the orchestrator's transcript (see context_store.py)
+        # With a checkpoint, every tool hop is saved and an earlier run's hops are picked up
+        with self.acquire() as orchestrator, workflow_context() as context, resuming(checkpoint, context):
+            # A per-call callback_handler (e.g. the progress streamer) overrides the agent's own
+            kwargs = {'callback_handler': callback_handler} if callback_handler else {}
+            prompt = self._build_prompt(task) + (checkpoint.resume_notes() if checkpoint else "")
+            # Not retried as a whole (that would rerun its tools); throttling fails fast
+            result = str(call_agent('orchestrator', orchestrator, prompt, max_attempts=1, **kwargs))
+            if context is None:
+                return result
+            tracing.annotate(**context.usage())
+            return context.expand(result, charge=False)
+
+    def _build_prompt(self, task: str) -> str:
         prompt = f"""Complete this task using intelligent workflow coordination: {task}
         Instructions:
         1. Think carefully about what information you need to accomplish this task.
@@ -69,27 +136,90 @@ class StrandsInterleavedWorkflowOrchestrator:
         3. After each tool use, reflect on the results and adapt your approach.
         4. Provide a comprehensive final response that addresses all aspects of the task.
         """
-        
-        return str(orchestrator(prompt))
+        return prompt
 
 # --- Lambda Handler ---
 workflow_orchestrator = StrandsInterleavedWorkflowOrchestrator()
+
+@startup.warmer('orchestrator')
+def _warm_orchestrator():
+    # Builds the model, its Bedrock client and one pooled orchestrator, without calling the model
+    with workflow_orchestrator.acquire():
+        pass
+
 def lambda_handler(event, context):
-    job_id = event.get('jobId')
-    query = event.get('query')
+    # A {"warmup": true} event only initializes the container
+    cold = startup.begin_invocation()
+    if startup.is_warmup_event(event):
+        return startup.handle_warmup(cold)
+    # Workflows stop starting specialists shortly before the invocation times out
+    start_invocation(context)
+    # Periodic scheduler pump: redelivers jobs whose invocation died (their lease ran out),
+    # then dispatches queued jobs that fit (e.g. once an expired slot is reclaimed)
+    if is_pump_event(event):
+        return {'redelivered': redeliver_expired(table.get(), dispatcher.get(), MAX_JOB_ATTEMPTS),
+                'dispatched': dispatch_queued(table.get(), dispatcher.get(), WORKLOAD)}
+    # Queue-consumer mode: an SQS batch of jobs, drained under a concurrency limit
+    # While the model circuit is open, jobs are handed back instead of started, to run
+    # again no sooner than the circuit lets calls through
+    if 'Records' in event:
+        return handle_sqs_batch(event, context, process_job, sqs_client.get(), retry_after=model_retry_after,
+                                can_start=model_available)
+    # Batch submissions dispatch several jobs per invocation as {'jobs': [...]}
+    return handle_job_list(event.get('jobs') or [event], context, process_job, lambda_client.get(),
+                           retry_scheduler.get(), retry_after=model_retry_after, can_start=model_available)
+
+def process_job(job_id, query):
+    # Async invokes and SQS can deliver a job more than once: only the delivery
+    # that claims it runs it, and duplicates stop here, before any model call
+    claimed = claim_job(table.get(), job_id)
+    if claimed is None:
+        print(f"Job ID {job_id} is already running or finished; dropping duplicate delivery.")
+        return
+    # Set when identical queries were coalesced onto this job's run
+    coalesce_key = claimed.get('coalesceKey')
     print(f"Interleaved worker started for Job ID: {job_id} with query: {query}")
-    try:
-        result = workflow_orchestrator.run_workflow(query)
-        table.update_item(
-            Key={'jobId': job_id}, UpdateExpression="set #s = :s, #r = :r",
-            ExpressionAttributeNames={'#s': 'status', '#r': 'result'},
-            ExpressionAttributeValues={':s': 'COMPLETE', ':r': str(result)}
-        )
-        print(f"Job ID {job_id} completed successfully.")
-    except Exception as e:
-        print(f"Job ID {job_id} failed with error: {e}")
-        table.update_item(
-            Key={'jobId': job_id}, UpdateExpression="set #s = :s, #r = :r",
-            ExpressionAttributeNames={'#s': 'status', '#r': 'result'},
-            ExpressionAttributeValues={':s': 'FAILED', ':r': str(e)}
-        )
+    # Hops completed by an earlier, interrupted run of this job are not run again
+    checkpoint = (WorkflowCheckpoint.load(table.get(), result_store.get(), job_id, claimed)
+                  if CHECKPOINTS_ENABLED else None)
+    streamer = make_streamer(table.get(), job_id, claimed)
+    with tracing.start_trace(job_id) as trace:
+        try:
+            result = workflow_orchestrator.run_workflow(query, callback_handler=streamer, checkpoint=checkpoint)
+            if streamer:
+                streamer.close()
+            if checkpoint is not None and checkpoint.suspended:
+                # Out of invocation time: hand the job back to resume in a fresh invocation
+                if suspend_job(table.get(), job_id, CHECKPOINT_MAX_SUSPENSIONS, trace=tracing.summarize(trace)):
+                    raise RetryLater(f"suspended after {len(checkpoint.hops)} checkpointed hop(s)", delay_seconds=0)
+                settle_followers(table.get(), coalesce_key, job_id, error="Did not finish in time")
+            else:
+                pointer = complete_job(table.get(), job_id, result, result_store.get(),
+                                       trace=tracing.summarize(trace))
+                settle_followers(table.get(), coalesce_key, job_id, result=result, pointer=pointer)
+                print(f"Job ID {job_id} completed successfully.")
+        except RetryLater:
+            raise
+        except ModelUnavailableError as e:
+            # Throttled or circuit open: hand the job back for a later run instead of failing it
+            print(f"Job ID {job_id} could not reach the model: {e}")
+            if streamer:
+                streamer.close()
+            tracing.annotate(error=str(e)[:200])
+            if retry_job(table.get(), job_id, e, MAX_JOB_ATTEMPTS, trace=tracing.summarize(trace)):
+                raise RetryLater(str(e)) from e
+            settle_followers(table.get(), coalesce_key, job_id, error=e)
+        except Exception as e:
+            print(f"Job ID {job_id} failed with error: {e}")
+            if streamer:
+                streamer.close()
+            tracing.annotate(error=str(e)[:200])
+            fail_job(table.get(), job_id, e, trace=tracing.summarize(trace))
+            settle_followers(table.get(), coalesce_key, job_id, error=e)
+
+    # Frees the job's scheduler slot for the next queued job (a job handed back for a retry keeps it)
+    if claimed.get('workload'):
+        dispatch_queued(table.get(), dispatcher.get(), claimed['workload'], finished=job_id)
+
+
+startup.record('import:interleaved_worker_lambda', _IMPORT_STARTED)
@@ -0,0 +1,244 @@
+# job_batch.py
+# Runs several jobs inside one warm worker invocation.
+import json
+import math
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+# Jobs processed at the same time by one invocation
+WORKER_CONCURRENCY = int(os.environ.get('WORKER_CONCURRENCY', '2'))
+# A job is only started if at least this much invocation time is left
+JOB_START_MIN_REMAINING_MS = int(os.environ.get('JOB_START_MIN_REMAINING_MS', '300000'))
+# Runs per job (see RetryLater) before it is marked FAILED
+MAX_JOB_ATTEMPTS = int(os.environ.get('MAX_JOB_ATTEMPTS', '3'))
+# A handed-back job waits this long before it is delivered again, doubling with
+# each delivery up to the max (SQS allows at most 12 hours of visibility timeout)
+JOB_RETRY_DELAY_SECONDS = int(os.environ.get('JOB_RETRY_DELAY_SECONDS', '30'))
+JOB_RETRY_MAX_DELAY_SECONDS = int(os.environ.get('JOB_RETRY_MAX_DELAY_SECONDS', '900'))
+SQS_BATCH_LIMIT = 10
+# Role EventBridge Scheduler assumes to re-invoke a worker with the jobs it handed
+# back in async-invoke mode (see RetryScheduler); unset, they are re-invoked at once
+JOB_RETRY_SCHEDULER_ROLE_ARN = os.environ.get('JOB_RETRY_SCHEDULER_ROLE_ARN')
+JOB_RETRY_SCHEDULE_GROUP = os.environ.get('JOB_RETRY_SCHEDULE_GROUP', 'default')
+
+
+class RetryLater(Exception):
+    """
+    Raised by run_job when the job hit a temporary problem and should be handed
+    back, not failed. delay_seconds overrides the retry backoff (0 for a job
+    that only ran out of invocation time and can resume at once).
+    """
+
+    def __init__(self, message, delay_seconds=None):
+        super().__init__(message)
+        self.delay_seconds = delay_seconds
+
+
+def retry_delay_seconds(deliveries):
+    """Backoff before the next delivery of a job handed back after `deliveries` deliveries."""
+    return min(JOB_RETRY_MAX_DELAY_SECONDS, JOB_RETRY_DELAY_SECONDS * 2 ** max(deliveries - 1, 0))
+
+
+def _retry_delay(job, retry_after=None):
+    """
+    Whole seconds before a deferred job is delivered again: its 'retryDelay' if
+    process_batch set one, else the backoff for its deliveries, but no less
+    than retry_after() (e.g. the time the model circuit stays open).
+    """
+    if 'retryDelay' in job:
+        return int(job['retryDelay'])
+    delay = retry_delay_seconds(job.get('deliveries', 1))
+    if retry_after is not None:
+        delay = max(delay, min(retry_after(), JOB_RETRY_MAX_DELAY_SECONDS))
+    return int(math.ceil(delay))
+
+
+def _remaining_ms(context):
+    if context is None or not hasattr(context, 'get_remaining_time_in_millis'):
+        return float('inf')
+    return context.get_remaining_time_in_millis()
+
+
+def process_batch(jobs, run_job, context, concurrency=WORKER_CONCURRENCY,
+                  min_remaining_ms=JOB_START_MIN_REMAINING_MS, can_start=None):
+    """
+    Runs run_job(job_id, query) for each job, at most `concurrency` at a time.
+
+    Before a job starts, the remaining invocation time is checked; once it drops
+    below min_remaining_ms the rest of the batch is left unstarted so it can be
+    handed back (the first job always runs, so a short timeout can't bounce jobs
+    forever). Jobs are also left unstarted while can_start() returns False (e.g.
+    the model circuit is open), the first one included, since a run that can't
+    reach the model would only use up an attempt. Jobs whose run_job raised
+    RetryLater are handed back too. Returns (completed, deferred, failed) lists of job dicts, where
+    failed holds jobs whose run_job raised anything else (e.g. the result could
+    not be saved). A deferred job that may run again at once (it was left
+    unstarted for lack of time) has its 'retryDelay' set to 0.
+    """
+    completed, deferred, failed = [], [], []
+    lock = threading.Lock()
+    out_of_time = threading.Event()
+    started = []
+
+    def run(job):
+        with lock:
+            if can_start is not None and not can_start():
+                deferred.append(job)
+                return
+            if started and (out_of_time.is_set() or _remaining_ms(context) < min_remaining_ms):
+                out_of_time.set()
+                job['retryDelay'] = 0
+                deferred.append(job)
+                return
+            started.append(job)
+        try:
+            run_job(job.get('jobId'), job.get('query'))
+            with lock:
+                completed.append(job)
+        except RetryLater as e:
+            print(f"Job ID {job.get('jobId')} handed back for a retry: {e}")
+            if e.delay_seconds is not None:
+                job['retryDelay'] = e.delay_seconds
+            with lock:
+                deferred.append(job)
+        except Exception as e:
+            print(f"Job ID {job.get('jobId')} could not be processed: {e}")
+            with lock:
+                failed.append(job)
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        list(executor.map(run, jobs))
+    return completed, deferred, failed
+
+
+def _queue_url(arn):
+    """arn:aws:sqs:<region>:<account>:<name> -> the queue's URL."""
+    _, _, _, region, account, name = arn.split(':', 5)
+    return f"https://sqs.{region}.amazonaws.com/{account}/{name}"
+
+
+def sqs_records_to_jobs(event):
+    """Each SQS message body is a {'jobId', 'query'} payload, as sent by the start lambdas."""
+    jobs = []
+    for record in event.get('Records', []):
+        job = json.loads(record['body'])
+        job['messageId'] = record['messageId']
+        job['receiptHandle'] = record.get('receiptHandle')
+        job['deliveries'] = int(record.get('attributes', {}).get('ApproximateReceiveCount', 1))
+        if record.get('eventSourceARN'):
+            job['queueUrl'] = _queue_url(record['eventSourceARN'])
+        jobs.append(job)
+    return jobs
+
+
+def hand_back(sqs_client, jobs, retry_after=None):
+    """
+    Sets the visibility timeout of the jobs' messages to their retry delay, so
+    the queue redelivers them after a short backoff instead of after the
+    queue's visibility timeout (which has to cover a whole run). Messages whose
+    visibility can't be changed are left to that timeout.
+    """
+    by_queue = {}
+    for job in jobs:
+        if job.get('receiptHandle') and job.get('queueUrl'):
+            by_queue.setdefault(job['queueUrl'], []).append(job)
+    for queue_url, queued in by_queue.items():
+        for start in range(0, len(queued), SQS_BATCH_LIMIT):
+            chunk = queued[start:start + SQS_BATCH_LIMIT]
+            entries = [{'Id': str(i), 'ReceiptHandle': job['receiptHandle'],
+                        'VisibilityTimeout': _retry_delay(job, retry_after)}
+                       for i, job in enumerate(chunk)]
+            try:
+                response = sqs_client.change_message_visibility_batch(QueueUrl=queue_url, Entries=entries)
+            except Exception as e:
+                print(f"Could not set the retry delay of {len(chunk)} messages: {e}")
+                continue
+            for failed in response.get('Failed', []):
+                print(f"Could not set the retry delay of Job ID {chunk[int(failed['Id'])].get('jobId')}: "
+                      f"{failed.get('Message', failed.get('Code'))}")
+
+
+def handle_sqs_batch(event, context, run_job, sqs_client=None, retry_after=None, **options):
+    """
+    Queue-consumer mode. Returns an SQS partial batch response: deferred and
+    failed messages are reported back so the queue redelivers only those, once
+    their retry delay is up (see hand_back).
+    """
+    jobs = sqs_records_to_jobs(event)
+    completed, deferred, failed = process_batch(jobs, run_job, context, **options)
+    print(f"Queue batch: {len(completed)} completed, {len(deferred)} handed back, {len(failed)} failed")
+    if sqs_client is not None and deferred + failed:
+        hand_back(sqs_client, deferred + failed, retry_after)
+    return {'batchItemFailures': [{'itemIdentifier': job['messageId']} for job in deferred + failed]}
+
+
+class RetryScheduler:
+    """
+    Re-invokes a function with handed-back jobs after a delay, through one-time
+    EventBridge Scheduler schedules that delete themselves once they have run.
+    Schedules fire at whole-second times, within about a minute of them.
+    """
+
+    def __init__(self, scheduler_client, role_arn, group=JOB_RETRY_SCHEDULE_GROUP, clock=time.time):
+        self.scheduler_client = scheduler_client
+        self.role_arn = role_arn
+        self.group = group
+        self.clock = clock
+
+    def schedule(self, function_arn, jobs, delay_seconds):
+        at = datetime.fromtimestamp(self.clock() + delay_seconds, timezone.utc).strftime('%Y-%m-%dT%H:%M:%S')
+        self.scheduler_client.create_schedule(
+            Name=f"job-retry-{uuid.uuid4().hex}",
+            GroupName=self.group,
+            ScheduleExpression=f"at({at})",
+            ScheduleExpressionTimezone='UTC',
+            FlexibleTimeWindow={'Mode': 'OFF'},
+            ActionAfterCompletion='DELETE',
+            Target={'Arn': function_arn, 'RoleArn': self.role_arn, 'Input': json.dumps({'jobs': jobs})}
+        )
+
+
+def build_retry_scheduler():
+    if not JOB_RETRY_SCHEDULER_ROLE_ARN:
+        return None
+    import boto3
+    return RetryScheduler(boto3.client('scheduler'), JOB_RETRY_SCHEDULER_ROLE_ARN)
+
+
+def handle_job_list(jobs, context, run_job, lambda_client=None, retry_scheduler=None, retry_after=None,
+                    **options):
+    """
+    Async-invoke mode ({'jobs': [...]}). There is no queue to hand jobs back to,
+    so deferred jobs are re-dispatched to this function: at once if they were
+    only left unstarted for lack of time, otherwise through retry_scheduler once
+    their retry delay is up (see _retry_delay). Each job carries its number of
+    deliveries so the delay backs off.
+    """
+    completed, deferred, failed = process_batch(jobs, run_job, context, **options)
+    if deferred and context is not None:
+        by_delay = {}
+        for job in deferred:
+            delay = _retry_delay(job, retry_after) if retry_scheduler is not None else 0
+            by_delay.setdefault(delay, []).append(
+                {'jobId': job['jobId'], 'query': job['query'], 'deliveries': job.get('deliveries', 1) + 1})
+        for delay, payload in sorted(by_delay.items()):
+            if delay > 0:
+                try:
+                    retry_scheduler.schedule(context.invoked_function_arn, payload, delay)
+                    print(f"Scheduled {len(payload)} handed-back jobs to run again in {delay}s")
+                    continue
+                except Exception as e:
+                    # Better an early retry than a job nothing will ever pick up again
+                    print(f"Could not schedule {len(payload)} handed-back jobs, re-dispatching now: {e}")
+            if lambda_client is not None:
+                lambda_client.invoke(
+                    FunctionName=context.function_name,
+                    InvocationType='Event',
+                    Payload=json.dumps({'jobs': payload})
+                )
+                print(f"Re-dispatched {len(payload)} deferred jobs")
+    return {'completed': len(completed), 'deferred': len(deferred), 'failed': len(failed)}
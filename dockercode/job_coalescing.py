@@ -0,0 +1,114 @@
+# job_coalescing.py
+# Identical queries submitted close together run once. The first job becomes
+# the leader of a 'coalesce#<fingerprint>' item in the job table; jobs that
+# arrive within the window join it as followers and are never dispatched. When
+# the leader finishes, the followers get its outcome (sharing its stored result).
+import hashlib
+import os
+import time
+
+from job_store import complete_job, fail_job
+from response_cache import normalize_text
+
+# Identical queries submitted within this many seconds share one run (0 disables)
+COALESCE_WINDOW_SECONDS = int(os.environ.get('COALESCE_WINDOW_SECONDS', '60'))
+# A leader that never finishes (e.g. its worker crashed for good) frees the key after this
+COALESCE_MAX_AGE_SECONDS = int(os.environ.get('COALESCE_MAX_AGE_SECONDS', '86400'))
+
+COALESCE_KEY_PREFIX = 'coalesce#'
+
+
+def _conditional_check_failed(error):
+    return getattr(error, 'response', {}).get('Error', {}).get('Code') == 'ConditionalCheckFailedException'
+
+
+def coalesce_key(scope, query):
+    """Same normalization as the response cache; scope keeps the standard and interleaved workers apart."""
+    digest = hashlib.sha256(f"{scope}\n{normalize_text(query)}".encode('utf-8')).hexdigest()
+    return f"{COALESCE_KEY_PREFIX}{digest}"
+
+
+def try_lead(table, key, job_id, window_seconds=COALESCE_WINDOW_SECONDS):
+    """
+    Makes job_id the leader for key, unless a leader that hasn't finished
+    already holds it. Returns True if job_id is now the leader.
+    """
+    now = int(time.time())
+    try:
+        table.put_item(
+            Item={'jobId': key, 'leader': job_id, 'followers': [], 'windowEndsAt': now + window_seconds,
+                  'expiresAt': now + COALESCE_MAX_AGE_SECONDS},
+            ConditionExpression="attribute_not_exists(jobId) OR attribute_exists(doneAt) OR expiresAt < :now",
+            ExpressionAttributeValues={':now': now}
+        )
+        return True
+    except Exception as e:
+        if not _conditional_check_failed(e):
+            # Coalescing is an optimization; never let it block a submission
+            print(f"Coalescing unavailable for {job_id}: {e}")
+        return False
+
+
+def try_follow(table, key, job_id):
+    """
+    Attaches job_id to the running leader for key while its window is open.
+    Returns the leader's jobId, or None if the job has to run on its own.
+    """
+    now = int(time.time())
+    try:
+        response = table.update_item(
+            Key={'jobId': key},
+            UpdateExpression="set followers = list_append(followers, :f)",
+            ConditionExpression="windowEndsAt >= :now AND attribute_not_exists(doneAt)",
+            ExpressionAttributeValues={':f': [job_id], ':now': now},
+            ReturnValues='ALL_NEW'
+        )
+    except Exception as e:
+        if not _conditional_check_failed(e):
+            print(f"Coalescing unavailable for {job_id}: {e}")
+        return None
+    return response['Attributes']['leader']
+
+
+def release(table, key, job_id):
+    """Closes the leader's item so no one else joins. Returns the followers to settle."""
+    try:
+        response = table.update_item(
+            Key={'jobId': key},
+            UpdateExpression="set doneAt = :now",
+            ConditionExpression="leader = :me AND attribute_not_exists(doneAt)",
+            ExpressionAttributeValues={':now': int(time.time()), ':me': job_id},
+            ReturnValues='ALL_NEW'
+        )
+    except Exception as e:
+        if not _conditional_check_failed(e):
+            raise
+        return []
+    return list(response['Attributes'].get('followers', []))
+
+
+def settle_followers(table, key, job_id, result=None, pointer=None, error=None):
+    """
+    Gives the leader's outcome to its followers: its result (the saved pointer
+    is shared, so the result is stored once) or, with error, its failure.
+    Called by the worker once the leader is COMPLETE or FAILED for good.
+    """
+    if not key:
+        return []
+    # The leader's own outcome is already saved; a problem here must not change it
+    try:
+        followers = release(table, key, job_id)
+    except Exception as e:
+        print(f"Could not release coalesced jobs of {job_id}: {e}")
+        return []
+    for follower in followers:
+        try:
+            if error is not None:
+                fail_job(table, follower, f"{error} (shared run of job {job_id})")
+            else:
+                complete_job(table, follower, result, pointer=pointer)
+        except Exception as e:
+            print(f"Could not settle coalesced job {follower} of {job_id}: {e}")
+    if followers:
+        print(f"Job ID {job_id} settled {len(followers)} coalesced job(s)")
+    return followers
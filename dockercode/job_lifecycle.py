@@ -0,0 +1,245 @@
+# job_lifecycle.py
+# Keeps the job table's hot set small. A job item goes through three stages:
+#
+# - live: written by the start lambdas with its owner, creation time and a
+#   short query preview, which the per-user index ('user-jobs-index',
+#   userId / createdAtMs) projects for list_jobs_lambda;
+# - finished: complete_job / fail_job stamp finishedAt, a TTL (expiresAt) and
+#   archiveDay, which puts the job on the sparse 'archive-queue-index';
+# - archived: once finished for JOB_ARCHIVE_AFTER_DAYS, the periodic compaction
+#   pass (a {"jobCompaction": true} event to the standard worker) moves the
+#   bulky attributes (query, inline result, trace, streamed chunks) into one
+#   compressed archive object and leaves a pointer. The listing fields stay.
+#
+# DynamoDB deletes the item at expiresAt. The chunk items it owns (result and
+# checkpoint parts) are written with their own expiresAt, so they go too,
+# whether or not the job is ever archived.
+import json
+import os
+import time
+import zlib
+
+from result_store import DynamoChunkStore, LocalFileStore, S3ObjectStore
+
+# Finished jobs are deleted from the table this long after they finish (0: kept)
+JOB_TTL_DAYS = float(os.environ.get('JOB_TTL_DAYS', '30'))
+# Finished jobs are compacted this long after they finish (0: never)
+JOB_ARCHIVE_AFTER_DAYS = float(os.environ.get('JOB_ARCHIVE_AFTER_DAYS', '1'))
+# Where archives go: 'dynamodb' (compressed chunk items in the job table), 's3' or 'local'
+ARCHIVE_STORE = os.environ.get('ARCHIVE_STORE', 'dynamodb')
+ARCHIVE_BUCKET = os.environ.get('ARCHIVE_BUCKET')
+ARCHIVE_PREFIX = os.environ.get('ARCHIVE_PREFIX', 'archive/')
+ARCHIVE_LOCAL_DIR = os.environ.get('ARCHIVE_LOCAL_DIR', '/tmp/agent-archive')
+# Jobs read from the archive index per query
+ARCHIVE_BATCH_SIZE = int(os.environ.get('ARCHIVE_BATCH_SIZE', '100'))
+# How far back compaction looks when jobs never expire
+ARCHIVE_LOOKBACK_DAYS = 365
+# A compaction pass stops this long before its invocation would time out
+ARCHIVE_RESERVE_SECONDS = 30
+# Ids of jobs that could not be archived, listed in compact()'s stats
+ARCHIVE_FAILURES_LISTED = 20
+
+USER_JOBS_INDEX = 'user-jobs-index'
+ARCHIVE_INDEX = 'archive-queue-index'
+# Characters of the query kept on the item (and in the listing) after it is archived
+QUERY_PREVIEW_CHARS = 120
+# Moved into the archive object, in this order
+ARCHIVED_FIELDS = ('query', 'result', 'trace', 'chunks')
+# Coalesced jobs share their leader's result parts and finish moments after it
+SHARED_PARTS_GRACE_SECONDS = 86400
+
+_DAY = 86400
+
+
+def is_compaction_event(event):
+    return isinstance(event, dict) and event.get('jobCompaction') is True
+
+
+def listing_fields(owner, query, now=None):
+    """
+    Attributes of a new job item that the per-user index lists. (The job's
+    workload is only set by the scheduler: the workers read it as "this job
+    holds a scheduler slot".)
+    """
+    now = time.time() if now is None else now
+    return {'userId': owner, 'createdAtMs': int(now * 1000), 'queryPreview': query[:QUERY_PREVIEW_CHARS]}
+
+
+def finish_fields(now=None):
+    """Attributes set on a job when it becomes COMPLETE or FAILED: its TTL and place in the archive queue."""
+    now = int(time.time() if now is None else now)
+    fields = {'finishedAt': now}
+    if JOB_TTL_DAYS > 0:
+        fields['expiresAt'] = now + int(JOB_TTL_DAYS * _DAY)
+    if JOB_ARCHIVE_AFTER_DAYS > 0:
+        fields['archiveDay'] = _day(now)
+    return fields
+
+
+def parts_expire_at(fields):
+    """
+    TTL for the result parts of a job finishing with finish_fields() `fields`,
+    written with the parts: a little after the job itself, for the jobs
+    coalesced onto it. None if finished jobs are kept.
+    """
+    if 'expiresAt' not in fields:
+        return None
+    return int(fields['expiresAt']) + SHARED_PARTS_GRACE_SECONDS
+
+
+def checkpoint_expires_at(now=None):
+    """
+    TTL for checkpoint parts, written with the parts. A checkpoint is only read
+    while its job runs, which is far shorter than JOB_TTL_DAYS, so the parts go
+    no later than the job would if it finished now. None if jobs are kept.
+    """
+    if JOB_TTL_DAYS <= 0:
+        return None
+    return int(time.time() if now is None else now) + int(JOB_TTL_DAYS * _DAY)
+
+
+def _day(timestamp):
+    return time.strftime('%Y-%m-%d', time.gmtime(timestamp))
+
+
+def build_archive(table, backend=ARCHIVE_STORE):
+    """The object store named by ARCHIVE_STORE; 'dynamodb' reuses the job table."""
+    if backend == 's3':
+        return S3ObjectStore(ARCHIVE_BUCKET, prefix=ARCHIVE_PREFIX)
+    if backend == 'local':
+        return LocalFileStore(ARCHIVE_LOCAL_DIR)
+    return DynamoChunkStore(table)
+
+
+def load_archive(table, item):
+    """The attributes archive_job moved off a job item ({} if it was not archived)."""
+    ref = item.get('archiveRef')
+    if not ref:
+        return {}
+    backend = build_archive(table, ref.get('backend', 'dynamodb'))
+    return json.loads(zlib.decompress(backend.get(ref)).decode('utf-8'))
+
+
+def _part_keys(ref):
+    return [f"{ref['key']}#part#{i}" for i in range(int(ref['parts']))]
+
+
+def _expire_parts(table, ref, expires_at):
+    """Gives the chunk items of a 'dynamodb' ref a TTL; other backends expire objects their own way."""
+    if not ref or ref.get('backend', 'dynamodb') != 'dynamodb' or not expires_at:
+        return
+    for key in _part_keys(ref):
+        table.update_item(Key={'jobId': key}, UpdateExpression="set expiresAt = :exp",
+                          ExpressionAttributeValues={':exp': int(expires_at)})
+
+
+def archive_job(table, archive, job_id, now=None):
+    """
+    Moves a finished job's bulky attributes into one compressed archive
+    object and drops its checkpoint. Returns the bytes taken off the item,
+    or None if the job is not (or no longer) waiting to be archived.
+    """
+    now = int(time.time() if now is None else now)
+    item = table.get_item(Key={'jobId': job_id}, ConsistentRead=True).get('Item')
+    if not item or 'archiveDay' not in item or item.get('status') not in ('COMPLETE', 'FAILED'):
+        return None
+    archived = {name: item[name] for name in ARCHIVED_FIELDS if name in item}
+    before = len(json.dumps(item, default=str))
+    expires_at = item.get('expiresAt')
+
+    names, values = {'#v': 'version'}, {':day': item['archiveDay'], ':now': now, ':one': 1}
+    sets, removes = ["archivedAt = :now"], ["archiveDay", "checkpointRef"]
+    if archived:
+        ref = archive.put(f"{job_id}#archive", zlib.compress(json.dumps(archived, default=str).encode('utf-8')),
+                          expires_at=expires_at)
+        sets.append("archiveRef = :ref")
+        values[':ref'] = ref
+        for i, name in enumerate(archived):
+            names[f"#a{i}"] = name
+            removes.append(f"#a{i}")
+        if 'query' in archived and 'queryPreview' not in item:
+            sets.append("queryPreview = :preview")
+            values[':preview'] = str(archived['query'])[:QUERY_PREVIEW_CHARS]
+
+    # Conditional on archiveDay, so a job archived (or re-run) meanwhile is left alone
+    try:
+        response = table.update_item(
+            Key={'jobId': job_id},
+            UpdateExpression=f"set {', '.join(sets)} remove {', '.join(removes)} add #v :one",
+            ConditionExpression="archiveDay = :day",
+            ExpressionAttributeNames=names,
+            ExpressionAttributeValues=values,
+            ReturnValues='ALL_NEW'
+        )
+    except Exception as e:
+        if getattr(e, 'response', {}).get('Error', {}).get('Code') == 'ConditionalCheckFailedException':
+            return None
+        raise
+    after = len(json.dumps(response.get('Attributes', {}), default=str))
+
+    # A finished job's checkpoint is never read again
+    checkpoint = item.get('checkpointRef')
+    if checkpoint and checkpoint.get('backend', 'dynamodb') == 'dynamodb':
+        for key in _part_keys(checkpoint):
+            table.delete_item(Key={'jobId': key})
+    # Result parts written before they carried their own TTL expire with the job
+    # (a little later, for the jobs coalesced onto it)
+    result_ref = item.get('resultRef')
+    if result_ref and result_ref.get('key') == f"{job_id}#result" and expires_at:
+        _expire_parts(table, result_ref, int(expires_at) + SHARED_PARTS_GRACE_SECONDS)
+    return max(before - after, 0)
+
+
+def compact(table, archive, now=None, context=None):
+    """
+    Archives every job that finished at least JOB_ARCHIVE_AFTER_DAYS ago,
+    oldest day first, until none are left or the invocation is about to run
+    out of time. A job that can't be archived is counted, listed (up to
+    ARCHIVE_FAILURES_LISTED of them) and passed over; the next run tries it
+    again. Returns counts for the log.
+    """
+    now = int(time.time() if now is None else now)
+    remaining = getattr(context, 'get_remaining_time_in_millis', None)
+    deadline = time.time() + remaining() / 1000.0 - ARCHIVE_RESERVE_SECONDS if remaining else None
+    stats = {'archived': 0, 'skipped': 0, 'failed': 0, 'failedJobs': [], 'bytesSaved': 0, 'complete': True}
+    if JOB_ARCHIVE_AFTER_DAYS <= 0:
+        return stats
+
+    cutoff = now - int(JOB_ARCHIVE_AFTER_DAYS * _DAY)
+    first = now - int((JOB_TTL_DAYS or ARCHIVE_LOOKBACK_DAYS) * _DAY)
+    for day_start in range(first - first % _DAY, cutoff + 1, _DAY):
+        request = {
+            'IndexName': ARCHIVE_INDEX,
+            'KeyConditionExpression': "archiveDay = :day",
+            'ExpressionAttributeValues': {':day': _day(day_start)},
+            'Limit': ARCHIVE_BATCH_SIZE,
+            'ScanIndexForward': True,
+        }
+        while True:
+            # Archived jobs leave the index; paging on past the page also passes over the failed ones
+            response = table.query(**request)
+            for job in response.get('Items', []):
+                if int(job['finishedAt']) > cutoff:
+                    # Sorted by finishedAt: the rest of this day is too recent as well
+                    return stats
+                if deadline is not None and time.time() > deadline:
+                    stats['complete'] = False
+                    return stats
+                try:
+                    saved = archive_job(table, archive, job['jobId'], now)
+                except Exception as e:
+                    # Left on the index; the next run tries it again
+                    print(f"Could not archive job {job['jobId']}: {e}")
+                    stats['failed'] += 1
+                    if len(stats['failedJobs']) < ARCHIVE_FAILURES_LISTED:
+                        stats['failedJobs'].append(job['jobId'])
+                    continue
+                if saved is None:
+                    stats['skipped'] += 1
+                else:
+                    stats['archived'] += 1
+                    stats['bytesSaved'] += saved
+            if not response.get('LastEvaluatedKey'):
+                break
+            request['ExclusiveStartKey'] = response['LastEvaluatedKey']
+    return stats
@@ -0,0 +1,347 @@
+# job_scheduler.py
+# Admission control between the start lambdas and the workers. Submitted jobs
+# wait as QUEUED items and are dispatched when their workload (standard or
+# interleaved) has a free slot: highest priority class first, then in
+# fair-share order across users, skipping users who already hold their quota
+# of running jobs. A worker frees its job's slot when the job finishes and
+# admits the next ones; a periodic {"schedulerPump": true} event catches
+# anything missed (e.g. a slot freed only by its lease running out).
+#
+# State lives in the job table:
+# - 'sched#<workload>' holds the running slots ({jobId: {userId, priority,
+#   expiresAt}}), replaced with an optimistic check on 'ver', the number of
+#   queued jobs and the fair-share clock;
+# - 'sched#<workload>#user#<id>' holds the last fair-share tag given to a user;
+# - QUEUED job items carry schedQueue/schedRank, the keys of the sparse
+#   scheduler queue index, so the queue is read in admission order.
+import os
+import time
+from collections import namedtuple
+
+from job_store import JOB_LEASE_SECONDS
+
+SCHEDULER_ENABLED = os.environ.get('SCHEDULER_ENABLED', 'true').lower() == 'true'
+SCHEDULER_QUEUE_INDEX = os.environ.get('SCHEDULER_QUEUE_INDEX', 'scheduler-queue-index')
+
+# Highest first. A request may ask for a lower class than its default, never a higher one
+PRIORITY_CLASSES = ('interactive', 'standard', 'batch')
+DEFAULT_PRIORITY = {'standard': 'interactive', 'interleaved': 'standard'}
+BATCH_PRIORITY = 'batch'
+
+
+def _parse_mapping(spec, cast):
+    """'standard=20,interleaved=4' -> {'standard': 20, 'interleaved': 4}"""
+    return {name.strip(): cast(value) for name, value in (part.split('=') for part in spec.split(',') if part)}
+
+
+# Jobs of each workload running at once
+WORKLOAD_CAPS = _parse_mapping(os.environ.get('SCHEDULER_WORKLOAD_CAPS', 'standard=20,interleaved=4'), int)
+# Share of a workload's cap each class may fill; the rest is kept for higher classes
+PRIORITY_SHARES = _parse_mapping(
+    os.environ.get('SCHEDULER_PRIORITY_SHARES', 'interactive=1.0,standard=0.8,batch=0.5'), float)
+# Jobs one user may have running per workload
+USER_MAX_RUNNING = int(os.environ.get('SCHEDULER_USER_MAX_RUNNING', '2'))
+# A slot whose job never reports back (crashed worker, lost dispatch) is reclaimed after this
+SCHEDULER_SLOT_SECONDS = JOB_LEASE_SECONDS + int(os.environ.get('SCHEDULER_DISPATCH_GRACE_SECONDS', '300'))
+# Queued jobs read per page of the queue index; an admission round reads on
+# until the workload is full or the queue is exhausted
+SCHEDULER_SCAN_LIMIT = int(os.environ.get('SCHEDULER_SCAN_LIMIT', '50'))
+# Optimistic writes of the slot map retried this many times under contention
+SCHEDULER_WRITE_ATTEMPTS = 5
+
+SCHEDULER_KEY_PREFIX = 'sched#'
+ANONYMOUS_USER = 'anonymous'
+
+# Where and how a submission is scheduled; None when the scheduler is off
+Submission = namedtuple('Submission', ['workload', 'user', 'priority'])
+
+
+def _conditional_check_failed(error):
+    return getattr(error, 'response', {}).get('Error', {}).get('Code') == 'ConditionalCheckFailedException'
+
+
+def principal(event):
+    """
+    The authenticated caller: 'sub:<sub>' from the claims of the route's JWT or
+    Cognito authorizer, or None. Only this may decide whose jobs a request sees.
+    """
+    request = (event or {}).get('requestContext') or {}
+    authorizer = request.get('authorizer') or {}
+    claims = (authorizer.get('jwt') or {}).get('claims') or authorizer.get('claims') or {}
+    return f"sub:{claims['sub']}" if claims.get('sub') else None
+
+
+def user_id(event):
+    """
+    The caller, for fair share: principal(event), or ANONYMOUS_USER. Not the
+    source IP: behind the Express proxy every user has the same one, and its
+    quota would cap everybody's jobs together.
+    """
+    return principal(event) or ANONYMOUS_USER
+
+
+def priority_class(workload, requested=None, batch=False):
+    """
+    The class a submission runs in: the workload's default, or 'batch' for
+    batch submissions. Raises ValueError for an unknown class.
+    """
+    default = BATCH_PRIORITY if batch else DEFAULT_PRIORITY.get(workload, 'standard')
+    if requested is None:
+        return default
+    if requested not in PRIORITY_CLASSES:
+        raise ValueError(f'"priority" must be one of {", ".join(PRIORITY_CLASSES)}.')
+    return max(requested, default, key=PRIORITY_CLASSES.index)
+
+
+def submission_of(event, workload, body, batch=False):
+    """The Submission for an API Gateway request, or None when the scheduler is disabled."""
+    if not SCHEDULER_ENABLED:
+        return None
+    return Submission(workload, user_id(event), priority_class(workload, body.get('priority'), batch))
+
+
+def is_pump_event(event):
+    return isinstance(event, dict) and event.get('schedulerPump') is True
+
+
+def _state_key(workload):
+    return f"{SCHEDULER_KEY_PREFIX}{workload}"
+
+
+def _read_state(table, workload):
+    return table.get_item(Key={'jobId': _state_key(workload)}, ConsistentRead=True).get('Item') or {}
+
+
+def _write_slots(table, workload, slots, state, clock=None):
+    """Replaces the slot map unless someone changed it since `state` was read. Returns False if they did."""
+    ver = int(state.get('ver', 0))
+    values = {':slots': slots, ':next': ver + 1, ':ver': ver}
+    update = "set #slots = :slots, #ver = :next"
+    if clock is not None:
+        update += ", fairClock = :clock"
+        values[':clock'] = clock
+    try:
+        table.update_item(
+            Key={'jobId': _state_key(workload)},
+            UpdateExpression=update,
+            ConditionExpression="attribute_not_exists(#ver) OR #ver = :ver",
+            ExpressionAttributeNames={'#slots': 'slots', '#ver': 'ver'},
+            ExpressionAttributeValues=values
+        )
+        return True
+    except Exception as e:
+        if _conditional_check_failed(e):
+            return False
+        raise
+
+
+def _live(slots, now):
+    return {job_id: slot for job_id, slot in (slots or {}).items() if slot['expiresAt'] > now}
+
+
+def _fits(running, workload, priority, user):
+    """Whether one more job of this class and user may start next to `running`."""
+    cap = WORKLOAD_CAPS.get(workload, max(WORKLOAD_CAPS.values()))
+    if len(running) >= max(1, int(cap * PRIORITY_SHARES.get(priority, 1.0))):
+        return False
+    # Without an authenticated identity there is nothing to share fairly between
+    if user == ANONYMOUS_USER:
+        return True
+    return sum(1 for slot in running.values() if slot['userId'] == user) < USER_MAX_RUNNING
+
+
+def _fair_tags(table, workload, user, count, clock):
+    """
+    Start-time fair queueing: a user's jobs are numbered on from their last
+    tag, or from the workload's clock (the tag of the last admitted job) if
+    they have been idle. Within a class, queued jobs run in tag order, so a
+    user with many jobs waiting takes turns with everyone else instead of
+    going first. Returns the first of `count` consecutive tags.
+    """
+    key = {'jobId': f"{_state_key(workload)}#user#{user}"}
+    for _ in range(SCHEDULER_WRITE_ATTEMPTS):
+        last = table.get_item(Key=key, ConsistentRead=True).get('Item', {}).get('lastTag')
+        first = max(int(last or 0), clock) + 1
+        try:
+            table.update_item(
+                Key=key,
+                UpdateExpression="set lastTag = :tag, expiresAt = :expires",
+                ConditionExpression="attribute_not_exists(lastTag) OR lastTag = :last",
+                ExpressionAttributeValues={':tag': first + count - 1, ':last': last,
+                                           ':expires': int(time.time()) + 86400}
+            )
+            return first
+        except Exception as e:
+            if not _conditional_check_failed(e):
+                raise
+    # Tags are only an ordering; under heavy contention the user's jobs join at the clock
+    return clock + 1
+
+
+def enqueue(table, jobs, submission, now=None):
+    """
+    Moves PENDING {'jobId', 'query'} jobs (already written by register_jobs)
+    to QUEUED, recording who submitted them, their class, when, and how many
+    jobs of the workload were waiting with them. Returns the queue entries to
+    pass to admit() as candidates.
+    """
+    if not jobs:
+        return []
+    now = time.time() if now is None else now
+    state = table.update_item(
+        Key={'jobId': _state_key(submission.workload)},
+        UpdateExpression="add queuedJobs :n",
+        ExpressionAttributeValues={':n': len(jobs)},
+        ReturnValues='ALL_NEW'
+    )['Attributes']
+    depth = int(state['queuedJobs'])
+    first_tag = _fair_tags(table, submission.workload, submission.user, len(jobs), int(state.get('fairClock', 0)))
+    rank = PRIORITY_CLASSES.index(submission.priority)
+    queued_at = int(now * 1000)
+
+    entries = []
+    for position, job in enumerate(jobs):
+        entry = {
+            'jobId': job['jobId'],
+            'query': job['query'],
+            'userId': submission.user,
+            'priority': submission.priority,
+            'fairTag': first_tag + position,
+            # Class first, then fair-share tag, then submission order
+            'schedRank': f"{rank}#{first_tag + position:012d}#{queued_at:015d}#{job['jobId']}",
+            'queuedAtMs': queued_at,
+            'queueDepth': depth - len(jobs) + position + 1,
+        }
+        table.update_item(
+            Key={'jobId': job['jobId']},
+            UpdateExpression="set #s = :queued, workload = :workload, userId = :user, #p = :priority, "
+                             "queuedAtMs = :at, queueDepth = :depth, schedQueue = :workload, schedRank = :rank, "
+                             "fairTag = :tag add #v :one",
+            ConditionExpression="#s = :pending",
+            ExpressionAttributeNames={'#s': 'status', '#p': 'priority', '#v': 'version'},
+            ExpressionAttributeValues={
+                ':queued': 'QUEUED', ':pending': 'PENDING', ':workload': submission.workload,
+                ':user': submission.user, ':priority': submission.priority, ':at': queued_at,
+                ':depth': entry['queueDepth'], ':rank': entry['schedRank'], ':tag': entry['fairTag'], ':one': 1,
+            }
+        )
+        entries.append(entry)
+    return entries
+
+
+def _queued(table, workload, limit):
+    """
+    The queued jobs of workload in admission order, read `limit` at a time
+    (the index is eventually consistent). Yields one page at a time.
+    """
+    start = None
+    while True:
+        kwargs = {'ExclusiveStartKey': start} if start else {}
+        response = table.query(
+            IndexName=SCHEDULER_QUEUE_INDEX,
+            KeyConditionExpression="schedQueue = :workload",
+            ExpressionAttributeValues={':workload': workload},
+            Limit=limit,
+            **kwargs
+        )
+        yield response.get('Items', [])
+        start = response.get('LastEvaluatedKey')
+        if not start:
+            return
+
+
+def _mark_dispatched(table, job, now, running):
+    """QUEUED -> PENDING, with the wait-time metrics. False if another admission already took the job."""
+    dispatched_at = int(now * 1000)
+    try:
+        table.update_item(
+            Key={'jobId': job['jobId']},
+            UpdateExpression="set #s = :pending, dispatchedAtMs = :at, waitMs = :wait, runningAtDispatch = :running "
+                             "remove schedQueue, schedRank add #v :one",
+            ConditionExpression="#s = :queued",
+            ExpressionAttributeNames={'#s': 'status', '#v': 'version'},
+            ExpressionAttributeValues={
+                ':pending': 'PENDING', ':queued': 'QUEUED', ':at': dispatched_at,
+                ':wait': max(0, dispatched_at - int(job['queuedAtMs'])), ':running': running, ':one': 1,
+            }
+        )
+        return True
+    except Exception as e:
+        if _conditional_check_failed(e):
+            return False
+        raise
+
+
+def admit(table, workload, candidates=(), now=None, limit=SCHEDULER_SCAN_LIMIT):
+    """
+    Gives the free slots of workload to queued jobs, in admission order, as
+    far as the priority shares and user quotas allow. The queue is read page
+    by page until the workload is full or the queue is exhausted, so jobs that
+    can't start yet (e.g. their user is at quota) don't hide the ones behind
+    them. `candidates` are entries the caller has just queued, considered even
+    before the index shows them. Returns the admitted entries, now PENDING,
+    for the caller to dispatch.
+    """
+    now = time.time() if now is None else now
+    for _ in range(SCHEDULER_WRITE_ATTEMPTS):
+        state = _read_state(table, workload)
+        running = _live(state.get('slots'), now)
+        if not _fits(running, workload, PRIORITY_CLASSES[0], ANONYMOUS_USER):
+            return []
+        picked, seen = [], set()
+        unseen = sorted(candidates, key=lambda job: job['schedRank'])
+
+        def consider(jobs):
+            for job in sorted(jobs, key=lambda job: job['schedRank']):
+                if job['jobId'] in seen:
+                    continue
+                seen.add(job['jobId'])
+                if job['jobId'] not in running and _fits(running, workload, job['priority'], job['userId']):
+                    running[job['jobId']] = {'userId': job['userId'], 'priority': job['priority'],
+                                             'expiresAt': int(now) + SCHEDULER_SLOT_SECONDS}
+                    picked.append(job)
+
+        for page in _queued(table, workload, limit):
+            # Candidates are taken in rank order along with the page they fall into
+            last_rank = page[-1]['schedRank'] if page else ''
+            consider(page + [job for job in unseen if job['schedRank'] <= last_rank])
+            unseen = [job for job in unseen if job['schedRank'] > last_rank]
+            if not _fits(running, workload, PRIORITY_CLASSES[0], ANONYMOUS_USER):
+                break
+        else:
+            consider(unseen)
+        if not picked:
+            return []
+        clock = max([int(state.get('fairClock', 0))] + [int(job['fairTag']) for job in picked])
+        if _write_slots(table, workload, running, state, clock):
+            break
+    else:
+        print(f"Scheduler: gave up admitting {workload} jobs under contention")
+        return []
+
+    admitted, taken = [], []
+    for job in picked:
+        (admitted if _mark_dispatched(table, job, now, len(running)) else taken).append(job)
+    if taken:
+        release(table, workload, [job['jobId'] for job in taken], now)
+    if admitted:
+        table.update_item(
+            Key={'jobId': _state_key(workload)},
+            UpdateExpression="add queuedJobs :n",
+            ExpressionAttributeValues={':n': -len(admitted)}
+        )
+        print(f"Scheduler: admitted {len(admitted)} {workload} job(s), {len(running) - len(taken)} running")
+    return admitted
+
+
+def release(table, workload, job_ids, now=None):
+    """Frees the slots of finished jobs (and of any whose slot expired)."""
+    now = time.time() if now is None else now
+    job_ids = set(job_ids)
+    for _ in range(SCHEDULER_WRITE_ATTEMPTS):
+        state = _read_state(table, workload)
+        slots = state.get('slots') or {}
+        remaining = {job_id: slot for job_id, slot in _live(slots, now).items() if job_id not in job_ids}
+        if len(remaining) == len(slots) or _write_slots(table, workload, remaining, state):
+            return
+    print(f"Scheduler: could not free the slots of {sorted(job_ids)}; they expire on their own")
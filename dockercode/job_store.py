@@ -0,0 +1,220 @@
+# job_store.py
+# Writes to the job table shared by the worker lambdas.
+# Every write bumps the item's 'version', which get_status uses as its ETag.
+import os
+import time
+import uuid
+
+from job_lifecycle import finish_fields, parts_expire_at
+
+# How long a claimed job belongs to its worker. Longer than the worker timeout
+# (900s), so a lease only expires once the invocation that holds it is gone.
+JOB_LEASE_SECONDS = int(os.environ.get('JOB_LEASE_SECONDS', '930'))
+# Recorded as the lease owner; the log stream names the container in CloudWatch
+WORKER_ID = os.environ.get('AWS_LAMBDA_LOG_STREAM_NAME') or str(uuid.uuid4())
+# Running jobs are listed per worker function on the sparse lease index, so each
+# worker's scheduler pump finds its own jobs whose invocation died (see reclaim_expired)
+LEASE_QUEUE = os.environ.get('AWS_LAMBDA_FUNCTION_NAME') or 'local'
+LEASE_INDEX = os.environ.get('LEASE_INDEX', 'lease-expiry-index')
+# Expired leases looked at per page of the lease index
+LEASE_SCAN_LIMIT = int(os.environ.get('LEASE_SCAN_LIMIT', '25'))
+
+
+def _trace_update(trace):
+    """Extra 'set' clause, names and values that store a job's trace summary (tracing.Trace.summary)."""
+    if trace is None:
+        return "", {}, {}
+    return ", #trace = :trace", {'#trace': 'trace'}, {':trace': trace}
+
+
+def _finish_update(fields=None):
+    """Extra 'set' clause and values for a job that is now COMPLETE or FAILED: its TTL and archive day."""
+    fields = finish_fields() if fields is None else fields
+    return "".join(f", {name} = :{name}" for name in fields), {f":{name}": value for name, value in fields.items()}
+
+
+def claim_job(table, job_id, worker_id=WORKER_ID, lease_seconds=JOB_LEASE_SECONDS, queue=LEASE_QUEUE):
+    """
+    Moves a PENDING or RETRYING job (or one whose lease has expired) to RUNNING
+    with a conditional write, so only one delivery of a job ever runs it.
+    Returns the claimed item, or None if another delivery already has the job.
+    """
+    now = int(time.time())
+    try:
+        response = table.update_item(
+            Key={'jobId': job_id},
+            UpdateExpression="set #s = :running, leaseOwner = :owner, leaseExpiresAt = :expires, "
+                             "leaseQueue = :queue add #v :one",
+            ConditionExpression="#s IN (:pending, :retrying) OR (#s = :running AND leaseExpiresAt < :now)",
+            ExpressionAttributeNames={'#s': 'status', '#v': 'version'},
+            ExpressionAttributeValues={
+                ':running': 'RUNNING', ':pending': 'PENDING', ':retrying': 'RETRYING',
+                ':owner': worker_id, ':expires': now + lease_seconds, ':queue': queue, ':now': now, ':one': 1,
+            },
+            ReturnValues='ALL_NEW'
+        )
+    except Exception as e:
+        if getattr(e, 'response', {}).get('Error', {}).get('Code') == 'ConditionalCheckFailedException':
+            return None
+        raise
+    return response.get('Attributes', {})
+
+
+def complete_job(table, job_id, result, result_store=None, trace=None, pointer=None):
+    """
+    Marks the job COMPLETE (with a TTL, see job_lifecycle). With a result_store, the result is written there
+    (compressed) and the item only keeps a pointer, its size and checksum.
+    A pointer returned by an earlier call is shared instead of saving the
+    result again. Returns the pointer, or None if the result was stored inline.
+    """
+    trace_set, trace_names, trace_values = _trace_update(trace)
+    fields = finish_fields()
+    finish_set, finish_values = _finish_update(fields)
+    if result_store is None and pointer is None:
+        table.update_item(
+            Key={'jobId': job_id},
+            UpdateExpression=f"set #s = :s, #r = :r{trace_set}{finish_set} remove leaseQueue add #v :one",
+            ExpressionAttributeNames={'#s': 'status', '#r': 'result', '#v': 'version', **trace_names},
+            ExpressionAttributeValues={':s': 'COMPLETE', ':r': str(result), ':one': 1, **trace_values,
+                                       **finish_values}
+        )
+        return None
+
+    if pointer is None:
+        # The parts get their TTL now, so they expire even if the job is never archived
+        pointer = result_store.save(job_id, result, expires_at=parts_expire_at(fields))
+    table.update_item(
+        Key={'jobId': job_id},
+        # The streamed chunks duplicate the result, so they are dropped as well
+        UpdateExpression=f"set #s = :s, resultRef = :ref, resultSize = :size, resultSha256 = :sha{trace_set}"
+                         f"{finish_set} remove #r, chunks, chunkBase, leaseQueue add #v :one",
+        ExpressionAttributeNames={'#s': 'status', '#r': 'result', '#v': 'version', **trace_names},
+        ExpressionAttributeValues={
+            ':s': 'COMPLETE',
+            ':one': 1,
+            ':ref': pointer['resultRef'],
+            ':size': pointer['resultSize'],
+            ':sha': pointer['resultSha256'],
+            **trace_values,
+            **finish_values,
+        }
+    )
+    return pointer
+
+
+def retry_job(table, job_id, error, max_attempts, trace=None):
+    """
+    Records a temporary failure (e.g. the model was throttled) as status RETRYING
+    and counts the attempt. Returns True if the job may run again, or False if it
+    has used up max_attempts, in which case it is marked FAILED.
+    """
+    trace_set, trace_names, trace_values = _trace_update(trace)
+    response = table.update_item(
+        Key={'jobId': job_id},
+        UpdateExpression=f"set #s = :s, #r = :r{trace_set} remove leaseQueue add attempts :one, #v :one",
+        ExpressionAttributeNames={'#s': 'status', '#r': 'result', '#v': 'version', **trace_names},
+        ExpressionAttributeValues={':s': 'RETRYING', ':r': str(error), ':one': 1, **trace_values},
+        ReturnValues='UPDATED_NEW'
+    )
+    attempts = int(response.get('Attributes', {}).get('attempts', 1))
+    if attempts >= max_attempts:
+        fail_job(table, job_id, f"{error} (gave up after {attempts} attempts)", trace)
+        return False
+    return True
+
+
+def suspend_job(table, job_id, max_suspensions, trace=None):
+    """
+    Hands back a job that stopped because its invocation was running out of
+    time, as RETRYING, without counting an attempt: it resumes from its
+    checkpoint (see workflow_checkpoint). Returns True if the job may run
+    again, or False once it has been suspended max_suspensions times, in
+    which case it is marked FAILED.
+    """
+    trace_set, trace_names, trace_values = _trace_update(trace)
+    response = table.update_item(
+        Key={'jobId': job_id},
+        UpdateExpression=f"set #s = :s{trace_set} remove leaseOwner, leaseExpiresAt, leaseQueue "
+                         "add suspensions :one, #v :one",
+        ExpressionAttributeNames={'#s': 'status', '#v': 'version', **trace_names},
+        ExpressionAttributeValues={':s': 'RETRYING', ':one': 1, **trace_values},
+        ReturnValues='UPDATED_NEW'
+    )
+    suspensions = int(response.get('Attributes', {}).get('suspensions', 1))
+    if suspensions >= max_suspensions:
+        fail_job(table, job_id, f"Did not finish within {suspensions} invocations", trace)
+        return False
+    return True
+
+
+def fail_job(table, job_id, error, trace=None):
+    """Marks the job FAILED and stores the error message as the result."""
+    trace_set, trace_names, trace_values = _trace_update(trace)
+    finish_set, finish_values = _finish_update()
+    table.update_item(
+        Key={'jobId': job_id},
+        UpdateExpression=f"set #s = :s, #r = :r{trace_set}{finish_set} remove leaseQueue add #v :one",
+        ExpressionAttributeNames={'#s': 'status', '#r': 'result', '#v': 'version', **trace_names},
+        ExpressionAttributeValues={':s': 'FAILED', ':r': str(error), ':one': 1, **trace_values, **finish_values}
+    )
+
+
+def reclaim_expired(table, max_attempts, queue=LEASE_QUEUE, now=None, limit=LEASE_SCAN_LIMIT):
+    """
+    Finds the RUNNING jobs of queue whose lease has run out: their invocation
+    died (timeout, crash, OOM) without recording an outcome, and the redeliveries
+    Lambda or SQS made meanwhile were dropped as duplicates. Each one goes back
+    to RETRYING as a failed attempt, or to FAILED once it has used up
+    max_attempts. A conditional write on the lease it had keeps two pumps from
+    reclaiming the same job. Returns the reclaimed jobs as {'jobId', 'query',
+    'coalesceKey'}, plus 'error' for those that failed instead of going back.
+    """
+    now = int(time.time() if now is None else now)
+    reclaimed, start_key = [], None
+    while True:
+        request = {
+            'IndexName': LEASE_INDEX,
+            'KeyConditionExpression': "leaseQueue = :queue",
+            'ExpressionAttributeValues': {':queue': queue},
+            'ScanIndexForward': True,
+            'Limit': limit,
+        }
+        if start_key:
+            request['ExclusiveStartKey'] = start_key
+        response = table.query(**request)
+        # Oldest lease first: the page ends the search at the first live one
+        for lease in response.get('Items', []):
+            if lease['leaseExpiresAt'] >= now:
+                return reclaimed
+            job = _reclaim(table, lease['jobId'], lease['leaseExpiresAt'], max_attempts)
+            if job is not None:
+                reclaimed.append(job)
+        start_key = response.get('LastEvaluatedKey')
+        if not start_key:
+            return reclaimed
+
+
+def _reclaim(table, job_id, lease_expires_at, max_attempts):
+    error = "The invocation running the job stopped before it finished"
+    try:
+        response = table.update_item(
+            Key={'jobId': job_id},
+            UpdateExpression="set #s = :retrying, #r = :r remove leaseOwner, leaseExpiresAt, leaseQueue "
+                             "add attempts :one, #v :one",
+            ConditionExpression="#s = :running AND leaseExpiresAt = :expired",
+            ExpressionAttributeNames={'#s': 'status', '#r': 'result', '#v': 'version'},
+            ExpressionAttributeValues={':retrying': 'RETRYING', ':running': 'RUNNING', ':r': error,
+                                       ':expired': lease_expires_at, ':one': 1},
+            ReturnValues='ALL_NEW'
+        )
+    except Exception as e:
+        if getattr(e, 'response', {}).get('Error', {}).get('Code') == 'ConditionalCheckFailedException':
+            return None
+        raise
+    item = response.get('Attributes', {})
+    job = {'jobId': job_id, 'query': item.get('query'), 'coalesceKey': item.get('coalesceKey')}
+    attempts = int(item.get('attempts', 1))
+    if attempts >= max_attempts:
+        job['error'] = f"{error} (gave up after {attempts} attempts)"
+        fail_job(table, job_id, job['error'])
+    return job
@@ -0,0 +1,375 @@
+# job_submission.py
+# The submission flow shared by start_job_lambda and start_interleaved_job_lambda:
+# admission, job records, coalescing, scheduling and dispatch to the worker.
+import json
+import os
+import uuid
+
+from admission import AdmissionError, charge_caller, estimate, screen_query
+from job_lifecycle import listing_fields
+from job_coalescing import COALESCE_WINDOW_SECONDS, coalesce_key, settle_followers, try_follow, try_lead
+from job_scheduler import admit, enqueue, principal, release, submission_of
+from job_store import fail_job, reclaim_expired
+
+MAX_BATCH_QUERIES = int(os.environ.get('MAX_BATCH_QUERIES', '1000'))
+# Jobs handed to one worker invocation
+DISPATCH_GROUP_SIZE = int(os.environ.get('DISPATCH_GROUP_SIZE', '10'))
+# Async invoke payloads are limited to 256 KB; leave headroom
+MAX_DISPATCH_BYTES = 200000
+# When set, jobs go to this SQS queue (drained by the workers' queue-consumer mode)
+JOB_QUEUE_URL = os.environ.get('JOB_QUEUE_URL')
+# send_message_batch accepts at most 10 entries
+SQS_BATCH_LIMIT = 10
+
+
+class LambdaDispatcher:
+    """Hands each group of jobs to one asynchronous worker invocation."""
+
+    def __init__(self, lambda_client, function_name):
+        self.lambda_client = lambda_client
+        self.function_name = function_name
+
+    def dispatch(self, jobs):
+        """Returns {jobId: error} for jobs that could not be handed over."""
+        try:
+            self.lambda_client.invoke(
+                FunctionName=self.function_name,
+                InvocationType='Event',  # This makes the call asynchronous
+                Payload=json.dumps({'jobs': jobs})
+            )
+            return {}
+        except Exception as e:
+            return {job['jobId']: str(e) for job in jobs}
+
+
+class QueueDispatcher:
+    """Sends one message per job; the worker's SQS event source drains them in batches."""
+
+    def __init__(self, sqs_client, queue_url):
+        self.sqs_client = sqs_client
+        self.queue_url = queue_url
+
+    def dispatch(self, jobs):
+        failures = {}
+        for start in range(0, len(jobs), SQS_BATCH_LIMIT):
+            chunk = jobs[start:start + SQS_BATCH_LIMIT]
+            entries = [{'Id': str(i), 'MessageBody': json.dumps(job)} for i, job in enumerate(chunk)]
+            try:
+                response = self.sqs_client.send_message_batch(QueueUrl=self.queue_url, Entries=entries)
+            except Exception as e:
+                failures.update({job['jobId']: str(e) for job in chunk})
+                continue
+            for failed in response.get('Failed', []):
+                failures[chunk[int(failed['Id'])]['jobId']] = failed.get('Message', failed.get('Code'))
+        return failures
+
+
+def build_dispatcher(lambda_client, function_name):
+    if JOB_QUEUE_URL:
+        import boto3
+        return QueueDispatcher(boto3.client('sqs'), JOB_QUEUE_URL)
+    return LambdaDispatcher(lambda_client, function_name)
+
+
+def new_job_item(job_id, query, coalesce_key=None, fingerprint=None, owner=None):
+    item = {'jobId': job_id, 'status': 'PENDING', 'query': query, 'version': 1}
+    if owner:
+        # Lists the job under its submitter (see job_lifecycle)
+        item.update(listing_fields(owner, query))
+    if fingerprint:
+        # Normalized-content hash from admission, for finding repeats of a query
+        item['queryFingerprint'] = fingerprint
+    if coalesce_key:
+        # The worker settles the jobs that joined this one (see job_coalescing)
+        item['coalesceKey'] = coalesce_key
+    return item
+
+
+def register_jobs(table, jobs, scope=None, owner=None):
+    """
+    Writes a PENDING item for each {'jobId', 'query'} job (plus the query's
+    admission 'fingerprint', if it has one), owned by owner when given. With a scope (the
+    worker the jobs go to) and coalescing on, a job whose query is already
+    running joins that run instead. Returns {jobId: leader jobId} for those
+    jobs; they must not be dispatched.
+    """
+    leader_keys, follow_keys = {}, {}
+    if scope and COALESCE_WINDOW_SECONDS > 0:
+        for job in jobs:
+            key = coalesce_key(scope, job['query'])
+            if try_lead(table, key, job['jobId']):
+                leader_keys[job['jobId']] = key
+            else:
+                follow_keys[job['jobId']] = key
+
+    # batch_writer groups the puts 25 at a time
+    with table.batch_writer() as batch:
+        for job in jobs:
+            batch.put_item(Item=new_job_item(job['jobId'], job['query'], leader_keys.get(job['jobId']),
+                                              job.get('fingerprint'), owner))
+
+    # Followers join only once their own item exists, so the leader can always settle them
+    coalesced = {}
+    for job_id, key in follow_keys.items():
+        leader = try_follow(table, key, job_id)
+        if leader:
+            coalesced[job_id] = leader
+    return coalesced
+
+
+def _dispatch_groups(jobs, group_size=DISPATCH_GROUP_SIZE, max_bytes=MAX_DISPATCH_BYTES):
+    """Splits jobs into worker payloads by count and by serialized size."""
+    group, size = [], 0
+    for job in jobs:
+        job_size = len(json.dumps(job))
+        if group and (len(group) >= group_size or size + job_size > max_bytes):
+            yield group
+            group, size = [], 0
+        group.append(job)
+        size += job_size
+    if group:
+        yield group
+
+
+def dispatch_jobs(dispatcher, jobs):
+    """Dispatches {'jobId', 'query'} jobs in groups. Returns {jobId: error} for those not handed over."""
+    failures = {}
+    for group in _dispatch_groups(jobs):
+        failures.update(dispatcher.dispatch(group))
+    return failures
+
+
+def _dispatch_admitted(table, dispatcher, workload, admitted):
+    failures = dispatch_jobs(dispatcher, [{'jobId': job['jobId'], 'query': job['query']} for job in admitted])
+    if failures:
+        # Their slots would otherwise stay taken until they expire
+        release(table, workload, list(failures))
+    return failures
+
+
+def schedule_jobs(table, dispatcher, jobs, submission):
+    """
+    Queues PENDING jobs with the scheduler (see job_scheduler) and dispatches
+    those that can start right away; the rest are dispatched by the workers
+    as slots free up. Returns {jobId: error} for admitted jobs whose dispatch
+    failed.
+    """
+    queued = enqueue(table, jobs, submission)
+    return _dispatch_admitted(table, dispatcher, submission.workload,
+                              admit(table, submission.workload, candidates=queued))
+
+
+def dispatch_queued(table, dispatcher, workload, finished=None):
+    """
+    Worker side of the scheduler: frees the slot of the finished job, if
+    any, and dispatches the queued jobs that now fit. Never raises; the
+    periodic scheduler pump retries whatever is left. Returns the number of
+    jobs dispatched.
+    """
+    try:
+        if finished:
+            release(table, workload, [finished])
+        admitted = admit(table, workload)
+        failures = _dispatch_admitted(table, dispatcher, workload, admitted)
+        for job in admitted:
+            if job['jobId'] in failures:
+                error = f"Dispatch failed: {failures[job['jobId']]}"
+                fail_job(table, job['jobId'], error)
+                settle_followers(table, job.get('coalesceKey'), job['jobId'], error=error)
+        return len(admitted) - len(failures)
+    except Exception as e:
+        print(f"Could not dispatch queued {workload} jobs: {e}")
+        return 0
+
+
+def redeliver_expired(table, dispatcher, max_attempts):
+    """
+    Pump side of job leases: dispatches again the running jobs of this worker
+    whose invocation died (see job_store.reclaim_expired), and settles the
+    jobs that joined the ones that gave up. Never raises. Returns the number
+    of jobs dispatched.
+    """
+    try:
+        reclaimed = reclaim_expired(table, max_attempts)
+        redeliver = [{'jobId': job['jobId'], 'query': job['query']} for job in reclaimed if 'error' not in job]
+        failures = dispatcher.dispatch(redeliver) if redeliver else {}
+        for job in reclaimed:
+            error = job.get('error')
+            if job['jobId'] in failures:
+                # Without a lease the next pump won't find it: fail it like any lost dispatch
+                error = f"Dispatch failed: {failures[job['jobId']]}"
+                fail_job(table, job['jobId'], error)
+            if error:
+                settle_followers(table, job['coalesceKey'], job['jobId'], error=error)
+        if reclaimed:
+            print(f"Reclaimed {len(reclaimed)} job(s) whose lease expired; "
+                  f"redelivered {len(redeliver) - len(failures)}")
+        return len(redeliver) - len(failures)
+    except Exception as e:
+        print(f"Could not reclaim jobs whose lease expired: {e}")
+        return 0
+
+
+def submit_batch(table, dispatcher, queries, scope=None, submission=None, workload=None, owner=None,
+                 caller=None):
+    """
+    Screens each query (see admission.screen_query), charges caller (or,
+    without one, only the shared budget) for the accepted ones only, creates
+    a PENDING job per accepted one and dispatches them to the worker in groups
+    (or to the job queue, one message per job, when JOB_QUEUE_URL is set).
+    Repeated queries are coalesced onto one run (see register_jobs). With a
+    submission, the jobs go through the scheduler instead and only those it
+    admits are dispatched now.
+
+    Returns (jobs, errors, estimate): jobs is a list of {'index', 'jobId',
+    'fingerprint'} for accepted queries (plus 'coalescedWith' for jobs sharing
+    another job's run, 'truncated' for queries cut to the size limit), errors
+    a list of {'index', 'status', 'error'} for rejected ones, where index is
+    the query's position in the request, and estimate the expected cost of
+    the runs started (see admission.estimate). Raises AdmissionError (429)
+    if the accepted queries would take caller over its budget; no job is
+    created then.
+    """
+    jobs, errors, screened = [], [], {}
+    for index, query in enumerate(queries):
+        try:
+            screened[index] = screen_query(query)
+        except AdmissionError as e:
+            errors.append({'index': index, 'status': e.status_code, 'error': e.message})
+            continue
+        job = {'index': index, 'jobId': str(uuid.uuid4()), 'query': screened[index].query,
+               'fingerprint': screened[index].fingerprint}
+        if screened[index].truncated:
+            job['truncated'] = True
+        jobs.append(job)
+
+    # Rejected queries don't count against the caller's budget
+    if jobs:
+        charge_caller(table, caller, [job['query'] for job in jobs])
+
+    # 1. Bulk-write the placeholder records
+    coalesced = register_jobs(table, jobs, scope, owner)
+
+    # 2. Dispatch workers, several jobs per invocation
+    to_dispatch = [{'jobId': j['jobId'], 'query': j['query']} for j in jobs if j['jobId'] not in coalesced]
+    if submission:
+        failures = schedule_jobs(table, dispatcher, to_dispatch, submission)
+    else:
+        failures = dispatch_jobs(dispatcher, to_dispatch)
+
+    dispatched = []
+    for job in jobs:
+        if job['jobId'] in coalesced:
+            dispatched.append(dict(job, coalescedWith=coalesced[job['jobId']]))
+        elif job['jobId'] in failures:
+            print(f"Dispatch failed for Job ID {job['jobId']}: {failures[job['jobId']]}")
+            errors.append({'index': job['index'], 'jobId': job['jobId'], 'status': 500,
+                           'error': f"Dispatch failed: {failures[job['jobId']]}"})
+            fail_job(table, job['jobId'], f"Dispatch failed: {failures[job['jobId']]}")
+            if scope:
+                # Jobs that joined this one would otherwise wait for a run that never happens
+                settle_followers(table, coalesce_key(scope, job['query']), job['jobId'],
+                                 error=f"Dispatch failed: {failures[job['jobId']]}")
+        else:
+            dispatched.append(job)
+
+    errors.sort(key=lambda error: error['index'])
+    accepted = [{k: j[k] for k in ('index', 'jobId', 'fingerprint', 'coalescedWith', 'truncated') if k in j}
+                for j in dispatched]
+    # Jobs that joined another run cost nothing extra
+    runs = [screened[j['index']] for j in dispatched if 'coalescedWith' not in j]
+    return accepted, errors, estimate(runs, workload)
+
+
+def batch_response(table, dispatcher, queries, scope=None, submission=None, caller=None, workload=None, owner=None):
+    """API Gateway response for a {'queries': [...]} request body, charged to caller and owned by owner."""
+    if not isinstance(queries, list) or not queries:
+        return {'statusCode': 400, 'body': json.dumps({'error': '"queries" must be a non-empty list.'})}
+    if len(queries) > MAX_BATCH_QUERIES:
+        return {'statusCode': 413, 'body': json.dumps({'error': f'At most {MAX_BATCH_QUERIES} queries per request.'})}
+
+    try:
+        jobs, errors, cost = submit_batch(table, dispatcher, queries, scope, submission, workload, owner=owner,
+                                          caller=caller)
+    except AdmissionError as e:
+        return e.response()
+    if jobs:
+        status_code = 202
+    else:
+        # All rejected: the status they share (413, 422), or a plain 400 if they differ
+        statuses = {error.get('status', 400) for error in errors}
+        status_code = statuses.pop() if len(statuses) == 1 else 400
+    return {'statusCode': status_code, 'body': json.dumps({'jobs': jobs, 'errors': errors, 'estimate': cost})}
+
+
+def submit_one(table, dispatcher, query, scope=None, submission=None, caller=None, workload=None, owner=None):
+    """
+    API Gateway response for a single {'query': ...} request: screens the
+    query, charges caller for it, writes its PENDING job (owned by owner)
+    and dispatches it, unless it joins a run of the same query. A job whose
+    dispatch fails is marked FAILED (so it expires like any finished job),
+    along with the jobs that joined it.
+    """
+    try:
+        screened = screen_query(query)
+        charge_caller(table, caller, [screened.query])
+    except AdmissionError as e:
+        return e.response()
+    # What the client gets back with the jobId: the query's fingerprint and what the run should cost
+    accepted = {'fingerprint': screened.fingerprint, 'estimate': estimate([screened], workload)}
+    if screened.truncated:
+        accepted['truncated'] = True
+
+    job_id = str(uuid.uuid4())
+    print(f"Generated Job ID for the {workload} worker: {job_id}")
+    # A query identical to one already running joins that run instead of starting another
+    coalesced = register_jobs(table, [{'jobId': job_id, 'query': screened.query, 'fingerprint': screened.fingerprint}],
+                              scope=scope, owner=owner)
+    if job_id in coalesced:
+        return {'statusCode': 202,
+                'body': json.dumps({'jobId': job_id, 'coalescedWith': coalesced[job_id], **accepted})}
+
+    payload = {'jobId': job_id, 'query': screened.query}
+    if submission:
+        # Queued behind higher-priority work or the caller's own running jobs if there's no free slot
+        failures = schedule_jobs(table, dispatcher, [payload], submission)
+    else:
+        failures = dispatcher.dispatch([payload])
+    if failures:
+        error = f"Dispatch failed: {failures[job_id]}"
+        print(f"{error} for Job ID {job_id}")
+        fail_job(table, job_id, error)
+        if scope:
+            settle_followers(table, coalesce_key(scope, screened.query), job_id, error=error)
+        return {'statusCode': 500, 'body': json.dumps({'jobId': job_id, 'error': error})}
+
+    # 202 Accepted: the worker runs the job asynchronously
+    return {'statusCode': 202, 'body': json.dumps({'jobId': job_id, **accepted})}
+
+
+def start_response(event, table, dispatcher, scope, workload):
+    """
+    Handles a start lambda's API Gateway event: {"query": ...} starts one job,
+    {"queries": [...]} a batch. scope is the worker function the jobs go to.
+    """
+    try:
+        body = json.loads(event.get('body') or '{}')
+        batch = 'queries' in body
+
+        # Who submitted the job and its priority class; None when the scheduler is off
+        try:
+            submission = submission_of(event, workload, body, batch=batch)
+        except ValueError as e:
+            return {'statusCode': 400, 'body': json.dumps({'error': str(e)})}
+
+        # The authenticated caller (None without one) owns the jobs and is charged for them
+        caller = principal(event)
+        if batch:
+            return batch_response(table, dispatcher, body['queries'], scope=scope, submission=submission,
+                                  caller=caller, workload=workload, owner=caller)
+        return submit_one(table, dispatcher, body.get('query'), scope=scope, submission=submission,
+                          caller=caller, workload=workload, owner=caller)
+
+    except Exception as e:
+        print(f"Error: {e}")
+        return {'statusCode': 500, 'body': json.dumps({'error': str(e)})}
@@ -1,49 +1,70 @@
 # lambda_function_interleaved.py
+import time
+_IMPORT_STARTED = time.perf_counter()
+
 import os
-from strands import Agent, tool, BedrockModel
+import startup
+import tracing
+from agent_pool import shared_pool
+from context_store import HANDLE_GUIDANCE, compacting, read_artifact, workflow_context
+from model_calls import ModelUnavailableError, call_agent
+from model_tiers import orchestrator_config, run_tiered
+from response_stream import buffered_sse_response, sse_event, stream_events, wants_stream
+from tool_runtime import orchestrator_kwargs, tool_runner
 
 # --- Tool Agent Definitions ---
 # These are the specialist agents that the main orchestrator will call.
+# The agents themselves are pooled per container (see agent_pool.py).
+RESEARCHER_PROMPT = "You are a research specialist. Gather factual information and cite sources when possible. Keep responses under 200 words."
+DATA_ANALYST_PROMPT = "You are a data analyst. Extract key insights, identify patterns, and provide analytical conclusions."
+FACT_CHECKER_PROMPT = "You are a fact checker. Verify claims, assess credibility, and provide confidence levels."
+REPORT_WRITER_PROMPT = "You are a professional report writer. Create clear, well-structured reports with executive summaries."
 
-@tool
+@compacting
 def researcher(query: str) -> str:
     """Research specialist that gathers factual information."""
-    agent = Agent(
-        system_prompt="You are a research specialist. Gather factual information and cite sources when possible. Keep responses under 200 words.",
-        callback_handler=None
-    )
-    return str(agent(f"Research: {query}"))
+    return tool_runner.call('researcher', run_tiered, 'researcher', RESEARCHER_PROMPT, f"Research: {query}", cache=True, callback_handler=None)
 
-@tool
+@compacting
 def data_analyst(data: str) -> str:
     """Data analyst that processes and analyzes information."""
-    agent = Agent(
-        system_prompt="You are a data analyst. Extract key insights, identify patterns, and provide analytical conclusions.",
-        callback_handler=None
-    )
-    return str(agent(f"Analyze this data and provide insights: {data}"))
+    return tool_runner.call('data_analyst', run_tiered, 'data_analyst', DATA_ANALYST_PROMPT, f"Analyze this data and provide insights: {data}", callback_handler=None)
 
-@tool
+@compacting
 def fact_checker(information: str) -> str:
     """Fact checker that verifies information accuracy."""
-    agent = Agent(
-        system_prompt="You are a fact checker. Verify claims, assess credibility, and provide confidence levels.",
-        callback_handler=None
-    )
-    return str(agent(f"Fact-check this information: {information}"))
+    return tool_runner.call('fact_checker', run_tiered, 'fact_checker', FACT_CHECKER_PROMPT, f"Fact-check this information: {information}", callback_handler=None)
 
-@tool
+@compacting
 def report_writer(analysis: str) -> str:
     """Report writer that creates polished final documents."""
-    agent = Agent(
-        system_prompt="You are a professional report writer. Create clear, well-structured reports with executive summaries.",
-        callback_handler=None
-    )
-    return str(agent(f"Create a professional report based on: {analysis}"))
+    return tool_runner.call('report_writer', run_tiered, 'report_writer', REPORT_WRITER_PROMPT, f"Create a professional report based on: {analysis}", callback_handler=None)
 
 # --- Orchestrator Class ---
 # This class sets up and runs the main workflow.
 
+# BedrockModel configuration, keyed by enable_interleaved_thinking.
+# ORCHESTRATOR_MODEL_CONFIG (JSON) in the environment overrides either (see model_tiers.py).
+ORCHESTRATOR_MODEL_CONFIGS = {
+    True: orchestrator_config({
+        'model_id': "anthropic.claude-3-sonnet-20240229-v1:0", # Updated model ID for general availability
+        'max_tokens': 4096,
+        'temperature': 1.0,
+        'additional_request_fields': {
+            "anthropic_version": "bedrock-2023-05-31", # Use a stable version string
+            "top_k": 250,
+            # NOTE: Interleaved thinking might have different beta headers or be standard now.
+            # This configuration is based on the notebook; check current AWS docs if it fails.
+            # "anthropic_beta": ["interleaved-thinking-2025-05-14"],
+        },
+    }),
+    False: orchestrator_config({
+        'model_id': "anthropic.claude-3-sonnet-20240229-v1:0",
+        'max_tokens': 4096,
+        'temperature': 1.0,
+    }),
+}
+
 class StrandsInterleavedWorkflowOrchestrator:
     def __init__(self):
         self.system_prompt = """You are an intelligent workflow orchestrator with access to specialist agents:
@@ -53,42 +74,33 @@ class StrandsInterleavedWorkflowOrchestrator:
         - report_writer: Creates polished final reports
         Your role is to intelligently coordinate a workflow using these agents.
         Think step-by-step and use the tools in a logical sequence to fulfill the user's task.
-        """
-
-    def run_workflow(self, task: str, enable_interleaved_thinking: bool = True) -> str:
-        if enable_interleaved_thinking:
-            claude4_model = BedrockModel(
-                model_id="anthropic.claude-3-sonnet-20240229-v1:0", # Updated model ID for general availability
-                max_tokens=4096,
-                temperature=1.0,
-                additional_request_fields={
-                    "anthropic_version": "bedrock-2023-05-31", # Use a stable version string
-                    "top_k": 250,
-                    # NOTE: Interleaved thinking might have different beta headers or be standard now.
-                    # This configuration is based on the notebook; check current AWS docs if it fails.
-                    # "anthropic_beta": ["interleaved-thinking-2025-05-14"],
-                }
-            )
-        else:
-            claude4_model = BedrockModel(
-                model_id="anthropic.claude-3-sonnet-20240229-v1:0",
-                max_tokens=4096,
-                temperature=1.0
-            )
-
-        orchestrator = Agent(
-            model=claude4_model,
-            system_prompt=self.system_prompt,
-            tools=[researcher, data_analyst, fact_checker, report_writer]
-        )
-        
+        When sub-questions are independent of each other, request all of those tool calls in the same turn so they run in parallel.
+        """ + HANDLE_GUIDANCE
+        # Wrapped with @tool on first use, so importing this module doesn't import strands
+        self.tools = startup.Lazy('orchestrator_tools', lambda: startup.as_tools(
+            researcher, data_analyst, fact_checker, report_writer, read_artifact))
+
+    def acquire(self, enable_interleaved_thinking: bool = True):
+        """Checks out a pooled orchestrator Agent with a fresh conversation."""
+        model_config = ORCHESTRATOR_MODEL_CONFIGS[bool(enable_interleaved_thinking)]
+        return shared_pool.acquire(self.system_prompt, model_config=model_config, tools=self.tools.get(),
+                                   **orchestrator_kwargs())
+
+    def run_workflow(self, task: str, enable_interleaved_thinking: bool = True, callback_handler=None) -> str:
+        # Model and orchestrator Agent are built once per configuration and reused
+        # across warm invocations; only the conversation is fresh for each request.
         prompt = f"Complete this task using intelligent workflow coordination: {task}"
-        
-        try:
-            result = orchestrator(prompt)
-            return str(result)
-        except Exception as e:
-            return f"Workflow failed: {e}"
+
+        # Errors propagate to the handler, which turns them into a 5xx response
+        # Specialist outputs are kept out of the orchestrator's transcript (see context_store.py)
+        with self.acquire(enable_interleaved_thinking) as orchestrator, workflow_context() as context:
+            # A per-call callback_handler (e.g. the response stream) overrides the agent's own
+            kwargs = {'callback_handler': callback_handler} if callback_handler else {}
+            result = str(call_agent('orchestrator', orchestrator, prompt, max_attempts=1, **kwargs))
+            if context is None:
+                return result
+            tracing.annotate(**context.usage())
+            return context.expand(result, charge=False)
 
 # --- Lambda Handler ---
 import json
@@ -96,9 +108,37 @@ import json
 # Instantiate the orchestrator once
 workflow_orchestrator = StrandsInterleavedWorkflowOrchestrator()
 
+@startup.warmer('orchestrator')
+def _warm_orchestrator():
+    # Builds the model, its Bedrock client and one pooled orchestrator, without calling the model
+    with workflow_orchestrator.acquire():
+        pass
+
+def run_task(task, enable_thinking, trace_id, callback_handler=None):
+    with tracing.start_trace(trace_id, name='request'):
+        return workflow_orchestrator.run_workflow(task, enable_thinking, callback_handler)
+
+def stream_request(body, trace_id=None):
+    """SSE mode: yields token and tool events as they are produced, then 'done' (see response_stream.py)."""
+    task = body.get('task')
+    if not task:
+        yield sse_event('error', {'status': 400, 'error': 'Error: "task" not found in request body.'})
+        return
+    enable_thinking = body.get('enable_interleaved_thinking', True)
+    print(f"Starting streamed workflow for task: '{task}' with interleaved thinking: {enable_thinking}")
+    trace_id = trace_id or tracing.request_trace_id(None)
+    yield from stream_events(lambda callback: run_task(task, enable_thinking, trace_id, callback))
+
 def lambda_handler(event, context):
+    # A {"warmup": true} event only initializes the container
+    cold = startup.begin_invocation()
+    if startup.is_warmup_event(event):
+        return startup.handle_warmup(cold)
     try:
         body = json.loads(event.get('body', '{}'))
+        if wants_stream(event):
+            # This runtime can't stream, so the event stream is returned in one piece
+            return buffered_sse_response(stream_request(body, tracing.request_trace_id(context)))
         task = body.get('task')
         enable_thinking = body.get('enable_interleaved_thinking', True)
 
@@ -106,16 +146,27 @@ def lambda_handler(event, context):
             return {'statusCode': 400, 'body': json.dumps('Error: "task" not found in request body.')}
 
         print(f"Starting workflow for task: '{task}' with interleaved thinking: {enable_thinking}")
-        result = workflow_orchestrator.run_workflow(task, enable_thinking)
+        result = run_task(task, enable_thinking, tracing.request_trace_id(context))
         print("Workflow finished.")
         
         return {
             'statusCode': 200,
             'body': json.dumps({'response': result})
         }
+    except ModelUnavailableError as e:
+        # Throttled or circuit open: tell the caller to come back later
+        print(f"Model unavailable: {e}")
+        return {
+            'statusCode': 503,
+            'headers': {'Retry-After': '30'},
+            'body': json.dumps(f'Model temporarily unavailable: {str(e)}')
+        }
     except Exception as e:
         print(f"An error occurred: {e}")
         return {
             'statusCode': 500,
             'body': json.dumps(f'Server error: {str(e)}')
         }
+
+
+startup.record('import:lambda_function_interleaved', _IMPORT_STARTED)
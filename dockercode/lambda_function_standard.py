@@ -1,6 +1,16 @@
 # lambda_function_standard.py
+import time
+_IMPORT_STARTED = time.perf_counter()
+
+import functools
 import os
-from strands import Agent, tool
+import startup
+import tracing
+from agent_pool import shared_pool
+from model_calls import ModelUnavailableError, call_agent
+from model_tiers import run_tiered
+from pre_router import pre_router
+from response_stream import buffered_sse_response, sse_event, stream_events, wants_stream
 
 # --- Tool Definitions (Copied from the notebook) ---
 
@@ -8,7 +18,12 @@ RESEARCH_ASSISTANT_PROMPT = """You are a specialized research assistant. Focus o
 factual, well-sourced information in response to research questions.
 Always cite your sources when possible."""
 
-@tool
+PRODUCT_ASSISTANT_PROMPT = """You are a specialized product recommendation assistant.
+Provide personalized product suggestions based on user preferences. Always cite your sources."""
+
+TRAVEL_ASSISTANT_PROMPT = """You are a specialized travel planning assistant.
+Create detailed travel itineraries based on user preferences."""
+
 def research_assistant(query: str) -> str:
     """
     Process and respond to research-related queries.
@@ -18,13 +33,12 @@ def research_assistant(query: str) -> str:
         A detailed research answer with citations
     """
     try:
-        research_agent = Agent(system_prompt=RESEARCH_ASSISTANT_PROMPT)
-        response = research_agent(query)
-        return str(response)
+        return run_tiered('research_assistant', RESEARCH_ASSISTANT_PROMPT, query, cache=True)
+    except ModelUnavailableError:
+        raise
     except Exception as e:
         return f"Error in research assistant: {str(e)}"
 
-@tool
 def product_recommendation_assistant(query: str) -> str:
     """
     Handle product recommendation queries by suggesting appropriate products.
@@ -34,16 +48,12 @@ def product_recommendation_assistant(query: str) -> str:
         Personalized product recommendations with reasoning
     """
     try:
-        product_agent = Agent(
-            system_prompt="""You are a specialized product recommendation assistant.
-            Provide personalized product suggestions based on user preferences. Always cite your sources."""
-        )
-        response = product_agent(query)
-        return str(response)
+        return run_tiered('product_recommendation_assistant', PRODUCT_ASSISTANT_PROMPT, query)
+    except ModelUnavailableError:
+        raise
     except Exception as e:
         return f"Error in product recommendation: {str(e)}"
 
-@tool
 def trip_planning_assistant(query: str) -> str:
     """
     Create travel itineraries and provide travel advice.
@@ -53,12 +63,9 @@ def trip_planning_assistant(query: str) -> str:
         A detailed travel itinerary or travel advice
     """
     try:
-        travel_agent = Agent(
-            system_prompt="""You are a specialized travel planning assistant.
-            Create detailed travel itineraries based on user preferences."""
-        )
-        response = travel_agent(query)
-        return str(response)
+        return run_tiered('trip_planning_assistant', TRAVEL_ASSISTANT_PROMPT, query)
+    except ModelUnavailableError:
+        raise
     except Exception as e:
         return f"Error in trip planning: {str(e)}"
 
@@ -73,15 +80,61 @@ You are an assistant that routes queries to specialized agents:
 Always select the most appropriate tool based on the user's query.
 """
 
-# Instantiate the orchestrator globally to reuse it across invocations (improves performance)
-orchestrator = Agent(
-    system_prompt=MAIN_SYSTEM_PROMPT,
-    tools=[
-        research_assistant,
-        product_recommendation_assistant,
-        trip_planning_assistant,
-    ],
-)
+# Wrapped with @tool on first use, so importing this module doesn't import strands.
+# The orchestrator itself comes from the shared pool and is reused across invocations.
+ORCHESTRATOR_TOOLS = startup.Lazy('orchestrator_tools', lambda: startup.as_tools(
+    research_assistant,
+    product_recommendation_assistant,
+    trip_planning_assistant,
+))
+
+
+@startup.warmer('orchestrator')
+def _warm_orchestrator():
+    # Builds the model, its Bedrock client and one pooled orchestrator, without calling the model
+    with shared_pool.acquire(MAIN_SYSTEM_PROMPT, tools=ORCHESTRATOR_TOOLS.get()):
+        pass
+
+# Specialists the pre-router can answer with directly, skipping the orchestrator's
+# routing hop. Unlike the @tool wrappers, errors here propagate and fail the job.
+FAST_PATH_SPECIALISTS = {
+    'research_assistant': lambda query, **kw: run_tiered('research_assistant', RESEARCH_ASSISTANT_PROMPT, query, cache=True, **kw),
+    'product_recommendation_assistant': lambda query, **kw: run_tiered('product_recommendation_assistant', PRODUCT_ASSISTANT_PROMPT, query, **kw),
+    'trip_planning_assistant': lambda query, **kw: run_tiered('trip_planning_assistant', TRAVEL_ASSISTANT_PROMPT, query, **kw),
+}
+
+
+def run_orchestrator(query, callback_handler=None):
+    with shared_pool.acquire(MAIN_SYSTEM_PROMPT, tools=ORCHESTRATOR_TOOLS.get()) as orchestrator:
+        # A per-call callback_handler (e.g. the response stream) overrides the agent's own
+        kwargs = {'callback_handler': callback_handler} if callback_handler else {}
+        return call_agent('orchestrator', orchestrator, query, max_attempts=1, **kwargs)
+
+
+def answer(query, trace_id, callback_handler=None):
+    """
+    Obvious queries go straight to their specialist; otherwise the orchestrator
+    determines which agent to use. callback_handler receives the tokens as they
+    are generated.
+    """
+    specialists, orchestrate = FAST_PATH_SPECIALISTS, run_orchestrator
+    if callback_handler is not None:
+        specialists = {label: functools.partial(fn, stream_to=callback_handler)
+                       for label, fn in FAST_PATH_SPECIALISTS.items()}
+        orchestrate = functools.partial(run_orchestrator, callback_handler=callback_handler)
+    with tracing.start_trace(trace_id, name='request'):
+        return pre_router.dispatch(query, specialists, orchestrate, MAIN_SYSTEM_PROMPT)
+
+
+def stream_request(body, trace_id=None):
+    """SSE mode: yields token and tool events as they are produced, then 'done' (see response_stream.py)."""
+    customer_query = body.get('query')
+    if not customer_query:
+        yield sse_event('error', {'status': 400, 'error': 'Error: "query" not found in request body.'})
+        return
+    print(f"Received query (streaming): {customer_query}")
+    trace_id = trace_id or tracing.request_trace_id(None)
+    yield from stream_events(lambda callback: answer(customer_query, trace_id, callback))
 
 # --- Lambda Handler ---
 import json
@@ -89,10 +142,18 @@ import json
 def lambda_handler(event, context):
     """
     The entry point for the AWS Lambda function.
+    A {"warmup": true} event only initializes the container.
     """
+    cold = startup.begin_invocation()
+    if startup.is_warmup_event(event):
+        return startup.handle_warmup(cold)
+
     # Extract the user's query from the API Gateway event
     try:
         body = json.loads(event.get('body', '{}'))
+        if wants_stream(event):
+            # This runtime can't stream, so the event stream is returned in one piece
+            return buffered_sse_response(stream_request(body, tracing.request_trace_id(context)))
         customer_query = body.get('query')
 
         if not customer_query:
@@ -101,9 +162,8 @@ def lambda_handler(event, context):
                 'body': json.dumps('Error: "query" not found in request body.')
             }
 
-        # The orchestrator automatically determines which agent to use
         print(f"Received query: {customer_query}")
-        response = orchestrator(customer_query)
+        response = answer(customer_query, tracing.request_trace_id(context))
         print(f"Orchestrator response: {response}")
 
         # Return the successful response
@@ -113,9 +173,20 @@ def lambda_handler(event, context):
             'body': json.dumps({'response': str(response)})
         }
 
+    except ModelUnavailableError as e:
+        # Throttled or circuit open: tell the caller to come back later
+        print(f"Model unavailable: {e}")
+        return {
+            'statusCode': 503,
+            'headers': {'Retry-After': '30'},
+            'body': json.dumps(f'Model temporarily unavailable: {str(e)}')
+        }
     except Exception as e:
         print(f"An error occurred: {e}")
         return {
             'statusCode': 500,
             'body': json.dumps(f'Server error: {str(e)}')
         }
+
+
+startup.record('import:lambda_function_standard', _IMPORT_STARTED)
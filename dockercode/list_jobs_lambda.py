@@ -0,0 +1,100 @@
+# list_jobs_lambda.py
+import base64
+import json
+import boto3
+import os
+from decimal import Decimal
+
+from job_lifecycle import USER_JOBS_INDEX
+from job_scheduler import principal
+
+TABLE_NAME = os.environ.get('TABLE_NAME')
+if not TABLE_NAME:
+    raise Exception("Error: TABLE_NAME environment variable not set.")
+
+dynamodb = boto3.resource('dynamodb')
+table = dynamodb.Table(TABLE_NAME)
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = int(os.environ.get('LIST_JOBS_MAX_PAGE_SIZE', '100'))
+
+# Only attributes the user-jobs-index projects, so a page never reads the table itself
+LIST_PROJECTION = ("jobId, createdAtMs, #s, version, queryPreview, queryFingerprint, workload, #p, "
+                   "finishedAt, resultSize, waitMs, archivedAt")
+LIST_NAMES = {'#s': 'status', '#p': 'priority'}
+STATUSES = ('QUEUED', 'PENDING', 'RUNNING', 'RETRYING', 'COMPLETE', 'FAILED')
+
+def _json_default(value):
+    # DynamoDB returns numbers as Decimal
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def _response(status_code, body):
+    return {'statusCode': status_code, 'body': json.dumps(body, default=_json_default)}
+
+def _encode_token(key):
+    return base64.urlsafe_b64encode(json.dumps(key, default=_json_default).encode('utf-8')).decode('ascii')
+
+def _decode_token(token, owner):
+    """The ExclusiveStartKey in a nextToken, or None if it isn't one of owner's."""
+    try:
+        key = json.loads(base64.urlsafe_b64decode(token.encode('ascii')))
+    except Exception:
+        return None
+    if not isinstance(key, dict) or key.get('userId') != owner or set(key) != {'jobId', 'userId', 'createdAtMs'}:
+        return None
+    return key
+
+def lambda_handler(event, context):
+    """
+    Lists the caller's jobs, newest first, from the per-user index. The route
+    needs the Cognito JWT authorizer; without its claims the answer is 401.
+
+    Query string parameters:
+      limit       jobs per page (default 20, at most LIST_JOBS_MAX_PAGE_SIZE)
+      nextToken   the nextToken of the previous page
+      status      only jobs with this status (a page may then hold fewer than limit jobs)
+    Each job carries summary fields only; get-job-status returns the result.
+    """
+    try:
+        params = event.get('queryStringParameters') or {}
+        # Never the source IP: behind the Express proxy every user shares one
+        owner = principal(event)
+        if owner is None:
+            return _response(401, {'error': 'Not authenticated.'})
+
+        limit = str(params.get('limit', DEFAULT_PAGE_SIZE))
+        if not limit.isdigit() or not 1 <= int(limit) <= MAX_PAGE_SIZE:
+            return _response(400, {'error': f'limit must be between 1 and {MAX_PAGE_SIZE}.'})
+
+        request = {
+            'IndexName': USER_JOBS_INDEX,
+            'KeyConditionExpression': "userId = :owner",
+            'ExpressionAttributeValues': {':owner': owner},
+            'ProjectionExpression': LIST_PROJECTION,
+            'ExpressionAttributeNames': dict(LIST_NAMES),
+            'ScanIndexForward': False,
+            'Limit': int(limit),
+        }
+        if params.get('nextToken'):
+            start_key = _decode_token(params['nextToken'], owner)
+            if start_key is None:
+                return _response(400, {'error': 'Invalid nextToken.'})
+            request['ExclusiveStartKey'] = start_key
+        status = params.get('status')
+        if status:
+            if status not in STATUSES:
+                return _response(400, {'error': f'status must be one of {", ".join(STATUSES)}.'})
+            request['FilterExpression'] = "#s = :status"
+            request['ExpressionAttributeValues'][':status'] = status
+
+        response = table.query(**request)
+        body = {'jobs': response.get('Items', [])}
+        if response.get('LastEvaluatedKey'):
+            body['nextToken'] = _encode_token(response['LastEvaluatedKey'])
+        return _response(200, body)
+
+    except Exception as e:
+        print(f"Error: {e}")
+        return _response(500, {'error': str(e)})
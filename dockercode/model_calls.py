@@ -0,0 +1,345 @@
+# model_calls.py
+# Shared guard around Bedrock model calls: client-side rate limiting (per
+# container, and optionally across containers), a circuit breaker, and
+# jittered exponential-backoff retries for whole specialist calls.
+import contextvars
+import os
+import random
+import threading
+import time
+
+import startup
+import tracing
+
+MODEL_MAX_ATTEMPTS = int(os.environ.get('MODEL_MAX_ATTEMPTS', '4'))
+MODEL_BACKOFF_BASE_SECONDS = float(os.environ.get('MODEL_BACKOFF_BASE_SECONDS', '0.5'))
+MODEL_BACKOFF_MAX_SECONDS = float(os.environ.get('MODEL_BACKOFF_MAX_SECONDS', '20'))
+# Per-container token bucket for Bedrock requests (0 disables it)
+MODEL_RATE_PER_SECOND = float(os.environ.get('MODEL_RATE_PER_SECOND', '10'))
+MODEL_RATE_BURST = int(os.environ.get('MODEL_RATE_BURST', '20'))
+# How long a request may wait for rate-limit capacity before it counts as throttled
+MODEL_RATE_WAIT_SECONDS = float(os.environ.get('MODEL_RATE_WAIT_SECONDS', '30'))
+# Cross-container limit, coordinated through a DynamoDB table (unset: per-container only)
+MODEL_RATE_LIMIT_TABLE = os.environ.get('MODEL_RATE_LIMIT_TABLE')
+MODEL_GLOBAL_RATE_PER_SECOND = int(os.environ.get('MODEL_GLOBAL_RATE_PER_SECOND', '20'))
+CIRCUIT_FAILURE_THRESHOLD = int(os.environ.get('CIRCUIT_FAILURE_THRESHOLD', '5'))
+CIRCUIT_RESET_SECONDS = float(os.environ.get('CIRCUIT_RESET_SECONDS', '30'))
+
+RATE_LIMIT_KEY_PREFIX = 'ratelimit#'
+
+# Errors worth retrying: throttling, capacity and transient service/network failures
+RETRYABLE_ERROR_CODES = {
+    'ThrottlingException', 'TooManyRequestsException', 'ServiceUnavailableException',
+    'ModelNotReadyException', 'InternalServerException', 'ModelTimeoutException',
+}
+RETRYABLE_ERROR_TYPES = {
+    'ModelThrottledException', 'EventStreamError', 'EndpointConnectionError',
+    'ConnectTimeoutError', 'ReadTimeoutError', 'ConnectionClosedError',
+}
+
+
+# Set by tool_runtime to an Event that is set once nobody waits for the call any more;
+# call() then makes no further attempts
+abandoned = contextvars.ContextVar('model_call_abandoned', default=None)
+# ModelUnavailableErrors raised inside the tools of the call_agent() in progress. strands
+# hands a tool's exception to the model as an error result, so call_agent() re-raises
+# them itself, and before_request() refuses the agent's further requests
+_tool_failures = contextvars.ContextVar('model_tool_failures', default=None)
+
+
+class ModelUnavailableError(Exception):
+    """The model could not be reached in time. The job should be retried later, not failed."""
+
+
+class CircuitOpenError(ModelUnavailableError):
+    pass
+
+
+def _error_code(error):
+    """The AWS error code of a botocore ClientError, or None."""
+    response = getattr(error, 'response', None)
+    return response.get('Error', {}).get('Code') if isinstance(response, dict) else None
+
+
+def _causes(error):
+    """
+    error, then the errors it wraps. strands' event loop re-raises model errors as
+    EventLoopException(original_exception); other wrappers chain them as __cause__.
+    """
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        yield error
+        error = getattr(error, 'original_exception', None) or error.__cause__
+
+
+def unavailable_cause(error):
+    """The ModelUnavailableError that error is or wraps, or None."""
+    return next((e for e in _causes(error) if isinstance(e, ModelUnavailableError)), None)
+
+
+def is_retryable(error):
+    if unavailable_cause(error) is not None:
+        return False  # already decided further down; don't retry twice
+    for cause in _causes(error):
+        if _error_code(cause) in RETRYABLE_ERROR_CODES:
+            return True
+        # Matched by name so strands and botocore don't have to be imported here
+        if any(cls.__name__ in RETRYABLE_ERROR_TYPES for cls in type(cause).__mro__):
+            return True
+    return False
+
+
+def backoff_seconds(attempt, base=MODEL_BACKOFF_BASE_SECONDS, cap=MODEL_BACKOFF_MAX_SECONDS):
+    """'Full jitter' backoff: uniform between 0 and base * 2**attempt, capped."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class TokenBucket:
+    """Per-container limiter. acquire() waits for a token, up to `timeout` seconds."""
+
+    def __init__(self, rate_per_second, burst):
+        self.rate = float(rate_per_second)
+        self.capacity = float(max(burst, 1))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _take(self):
+        """Takes a token if one is available; otherwise returns the wait until the next one."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+    def acquire(self, timeout):
+        deadline = time.monotonic() + timeout
+        while True:
+            wait = self._take()
+            if wait == 0:
+                return True
+            if time.monotonic() + wait > deadline:
+                return False
+            time.sleep(wait)
+
+
+class DynamoDBRateLimiter:
+    """
+    Cross-container limiter: a fixed one-second window per item
+    ('ratelimit#<name>#<epoch second>'), incremented with a conditional write.
+    Window items expire through the table's 'expiresAt' TTL. get_table is
+    called on first use, so the DynamoDB client isn't built at import time.
+    """
+
+    def __init__(self, get_table, limit_per_second, name='bedrock'):
+        self.get_table = get_table
+        self.limit = limit_per_second
+        self.name = name
+
+    def acquire(self, timeout):
+        deadline = time.monotonic() + timeout
+        while True:
+            second = int(time.time())
+            try:
+                self.get_table().update_item(
+                    Key={'jobId': f"{RATE_LIMIT_KEY_PREFIX}{self.name}#{second}"},
+                    UpdateExpression="set expiresAt = :exp add #c :one",
+                    ConditionExpression="attribute_not_exists(#c) OR #c < :limit",
+                    ExpressionAttributeNames={'#c': 'count'},
+                    ExpressionAttributeValues={':one': 1, ':limit': self.limit, ':exp': second + 120},
+                )
+                return True
+            except Exception as e:
+                if _error_code(e) != 'ConditionalCheckFailedException':
+                    # The limiter must never take the workers down with it
+                    print(f"Rate limiter unavailable, continuing without it: {e}")
+                    return True
+            # This window is full; try the next one
+            wait = (second + 1) - time.time() + random.uniform(0, 0.05)
+            if time.monotonic() + wait > deadline:
+                return False
+            time.sleep(max(wait, 0))
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive retryable failures and rejects
+    calls for `reset_seconds`. Then one trial call is let through (half-open):
+    success closes the circuit, failure opens it again.
+    """
+
+    def __init__(self, failure_threshold=CIRCUIT_FAILURE_THRESHOLD, reset_seconds=CIRCUIT_RESET_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state()
+
+    def _state(self):
+        if self._opened_at is None:
+            return 'closed'
+        if time.monotonic() - self._opened_at >= self.reset_seconds:
+            return 'half-open'
+        return 'open'
+
+    def check(self):
+        """Raises CircuitOpenError unless a call may go ahead."""
+        with self._lock:
+            state = self._state()
+            if state == 'closed':
+                return
+            if state == 'half-open' and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return
+        raise CircuitOpenError("Model circuit is open after repeated throttling; retry the job later.")
+
+    def retry_after(self):
+        """Seconds until an open circuit lets a trial call through (0 unless it is open)."""
+        with self._lock:
+            if self._state() != 'open':
+                return 0.0
+            return self.reset_seconds - (time.monotonic() - self._opened_at)
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._failures >= self.failure_threshold or self._opened_at is not None:
+                self._opened_at = time.monotonic()
+
+
+class ModelCallLayer:
+    """
+    Used in two places:
+    - before_request()/after_request() run on every Bedrock request, as botocore
+      hooks on the shared client (see model_registry), so orchestrator and
+      specialist requests alike are rate limited and stopped by an open circuit;
+    - call() wraps a whole specialist call with jittered backoff retries.
+    """
+
+    def __init__(self, limiters=(), breaker=None, max_attempts=MODEL_MAX_ATTEMPTS,
+                 rate_wait_seconds=MODEL_RATE_WAIT_SECONDS, sleep=time.sleep):
+        self.limiters = list(limiters)
+        self.breaker = breaker or CircuitBreaker()
+        self.max_attempts = max_attempts
+        self.rate_wait_seconds = rate_wait_seconds
+        self._sleep = sleep
+
+    def before_request(self, **kwargs):
+        failures = _tool_failures.get()
+        if failures:
+            raise failures[0]
+        self.breaker.check()
+        for limiter in self.limiters:
+            if not limiter.acquire(self.rate_wait_seconds):
+                raise ModelUnavailableError("Timed out waiting for model rate-limit capacity.")
+
+    def after_request(self, http_response=None, **kwargs):
+        # Any answer other than throttling or a server error shows the model is reachable;
+        # failures themselves are recorded by call(), once per failed attempt
+        status = getattr(http_response, 'status_code', None)
+        if status is not None and status != 429 and status < 500:
+            self.breaker.record_success()
+
+    def call(self, fn, name='model', max_attempts=None):
+        """
+        Runs fn(), retrying retryable errors with full-jitter exponential backoff.
+        Raises ModelUnavailableError once attempts run out or the circuit opens,
+        also when fn raised it wrapped (strands wraps errors from the Bedrock hooks);
+        other errors propagate unchanged. max_attempts=1 only classifies errors.
+        """
+        attempts = max_attempts or self.max_attempts
+        for attempt in range(attempts):
+            given_up = abandoned.get()
+            if attempt and given_up is not None and given_up.is_set():
+                raise ModelUnavailableError(f"{name} abandoned by its caller after {attempt} attempt(s)")
+            try:
+                result = fn()
+            except Exception as e:
+                unavailable = unavailable_cause(e)
+                if unavailable is not None and unavailable is not e:
+                    # Surface it unwrapped, so callers' `except ModelUnavailableError` sees it
+                    raise unavailable
+                if not is_retryable(e):
+                    raise
+                self.breaker.record_failure()
+                if attempt + 1 >= attempts:
+                    raise ModelUnavailableError(f"{name} unavailable after {attempts} attempt(s): {e}") from e
+                tracing.count('retries')
+                delay = backoff_seconds(attempt)
+                print(f"{name} attempt {attempt + 1} failed ({e}); retrying in {delay:.2f}s")
+                self._sleep(delay)
+                continue
+            self.breaker.record_success()
+            return result
+
+
+def build_model_layer():
+    """Builds the container-wide layer from the MODEL_* and CIRCUIT_* environment variables."""
+    limiters = []
+    if MODEL_RATE_PER_SECOND > 0:
+        limiters.append(TokenBucket(MODEL_RATE_PER_SECOND, MODEL_RATE_BURST))
+    if MODEL_RATE_LIMIT_TABLE:
+        table = startup.Lazy('rate_limit_table', _build_rate_limit_table, phase=startup.INVOKE)
+        limiters.append(DynamoDBRateLimiter(table.get, MODEL_GLOBAL_RATE_PER_SECOND))
+    return ModelCallLayer(limiters=limiters)
+
+
+def _build_rate_limit_table():
+    import boto3
+    return boto3.resource('dynamodb').Table(MODEL_RATE_LIMIT_TABLE)
+
+
+def call_agent(name, agent, prompt, max_attempts=None, **kwargs):
+    """
+    Calls a strands Agent through the shared layer, traced (see tracing.call_agent).
+    The conversation is cleared before each retry so a failed attempt leaves no trace.
+    A ModelUnavailableError raised by a nested call (a specialist behind one of the
+    agent's tools) is raised from here too, even though strands let the agent go on.
+    """
+    def attempt():
+        agent.messages = []
+        return tracing.call_agent(name, agent, prompt, **kwargs)
+    outer = _tool_failures.get()
+    failures = []
+    token = _tool_failures.set(failures)
+    try:
+        result = model_layer.call(attempt, name=name, max_attempts=max_attempts)
+        if failures:
+            raise failures[0]
+        return result
+    except ModelUnavailableError as e:
+        if outer is not None:
+            outer.append(e)
+        raise
+    finally:
+        _tool_failures.reset(token)
+
+
+model_layer = build_model_layer()
+
+
+def model_available():
+    """False while the circuit is open; workers use it to stop starting new jobs."""
+    return model_layer.breaker.state != 'open'
+
+
+def model_retry_after():
+    """Seconds the circuit stays open; workers hand jobs back for at least this long."""
+    return model_layer.breaker.retry_after()
@@ -0,0 +1,100 @@
+# model_registry.py
+import os
+import threading
+
+import tracing
+from model_calls import model_layer
+
+# Bedrock runtime connection pool, shared by every model in the container
+BEDROCK_MAX_POOL_CONNECTIONS = int(os.environ.get('BEDROCK_MAX_POOL_CONNECTIONS', '50'))
+BEDROCK_READ_TIMEOUT = int(os.environ.get('BEDROCK_READ_TIMEOUT', '300'))
+BEDROCK_CONNECT_TIMEOUT = int(os.environ.get('BEDROCK_CONNECT_TIMEOUT', '5'))
+# Quick SDK-level retries per request; longer jittered backoff is model_calls' job
+BEDROCK_SDK_MAX_ATTEMPTS = int(os.environ.get('BEDROCK_SDK_MAX_ATTEMPTS', '2'))
+
+_lock = threading.Lock()
+_models = {}
+_clients = {}
+_sessions = {}
+_config = None
+
+
+def freeze_config(value):
+    """Turns a (possibly nested) config dict/list into something hashable."""
+    if isinstance(value, dict):
+        return tuple(sorted((k, freeze_config(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze_config(v) for v in value)
+    return value
+
+
+def _client_config():
+    global _config
+    if _config is None:
+        from botocore.config import Config
+        _config = Config(
+            max_pool_connections=BEDROCK_MAX_POOL_CONNECTIONS,
+            connect_timeout=BEDROCK_CONNECT_TIMEOUT,
+            read_timeout=BEDROCK_READ_TIMEOUT,
+            tcp_keepalive=True,
+            retries={'max_attempts': BEDROCK_SDK_MAX_ATTEMPTS, 'mode': 'standard'},
+        )
+    return _config
+
+
+def _session(region):
+    """One boto3 session per region (None: the default one), so its loaded service models are reused."""
+    session = _sessions.get(region)
+    if session is None:
+        import boto3
+        session = _sessions[region] = boto3.Session(region_name=region)
+    return session
+
+
+def _build_model(model_config):
+    from strands.models import BedrockModel
+    model_config = dict(model_config)
+    # BedrockModel takes either a region or a session; the region picks the shared session
+    session = _session(model_config.pop('region_name', None))
+    model = BedrockModel(boto_session=session, boto_client_config=_client_config(), **model_config)
+    # Every model in the same region talks through one bedrock-runtime client,
+    # so its connection pool stays warm no matter which config is asked for.
+    # BedrockModel still creates its own client, but from the warm session that is cheap.
+    region = model.client.meta.region_name
+    shared = _clients.setdefault(region, model.client)
+    if shared is model.client:
+        # Every request passes the shared rate limiters and circuit breaker first
+        shared.meta.events.register('before-call.bedrock-runtime', model_layer.before_request)
+        shared.meta.events.register('after-call.bedrock-runtime', model_layer.after_request)
+        shared.meta.events.register('after-call.bedrock-runtime', _on_model_call)
+    model.client = shared
+    return model
+
+
+def _on_model_call(parsed=None, **kwargs):
+    """botocore hook: counts each Bedrock API call, and its retries, on the current trace span."""
+    tracing.count('modelCalls')
+    retries = ((parsed or {}).get('ResponseMetadata') or {}).get('RetryAttempts', 0)
+    if retries:
+        tracing.count('retries', retries)
+
+
+def get_model(**model_config):
+    """
+    Returns the container-wide BedrockModel for this config, building it on first use.
+    An empty config gives the same defaults as a bare strands.Agent().
+    """
+    key = freeze_config(model_config)
+    with _lock:
+        model = _models.get(key)
+        if model is None:
+            model = _build_model(model_config)
+            _models[key] = model
+    return model
+
+
+def clear():
+    with _lock:
+        _models.clear()
+        _clients.clear()
+        _sessions.clear()
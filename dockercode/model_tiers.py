@@ -0,0 +1,187 @@
+# model_tiers.py
+# Model tiers for the specialists. Each specialist has a profile listing the
+# tiers (model configs) it may use, cheapest first. Every tier but the last is
+# asked to end its answer with a self-reported confidence; an answer that is
+# missing it, under the profile's threshold, empty or a refusal is escalated
+# to the next tier, as is an error. The last tier's answer is always used.
+#
+# Tiers, profiles and the orchestrator's model are read from the environment
+# (JSON), so they can be tuned by updating the function's configuration,
+# without a new image. Per-tier calls, latency, tokens and escalations are
+# counted container-wide (tier_metrics), on the job trace ('tier' spans and
+# the 'escalations' counter) and in one log line per tier attempt.
+import json
+import os
+import re
+import threading
+import time
+
+import tracing
+from agent_pool import run_specialist
+from model_calls import ModelUnavailableError
+from pre_router import estimate_tokens
+
+MODEL_TIERING_ENABLED = os.environ.get('MODEL_TIERING_ENABLED', 'true').lower() == 'true'
+# Lowest self-reported confidence (0-100) a lower tier's answer is accepted with
+TIER_MIN_CONFIDENCE = int(os.environ.get('TIER_MIN_CONFIDENCE', '70'))
+# Shorter answers from a lower tier are escalated
+TIER_MIN_ANSWER_CHARS = 20
+
+# Tier name -> BedrockModel config. An empty config is the default model, as for a bare Agent.
+DEFAULT_MODEL_TIERS = {
+    'fast': {'model_id': 'anthropic.claude-3-haiku-20240307-v1:0', 'max_tokens': 2048, 'temperature': 0.2},
+    'standard': {},
+}
+# Specialist -> {'tiers': [...], 'maxPromptTokens': longer prompts skip straight to the
+# last tier, 'minConfidence': overrides TIER_MIN_CONFIDENCE}. Others use DEFAULT_TIER only.
+DEFAULT_SPECIALIST_PROFILES = {
+    # Short claims are checked well by the small model; long ones go to the default model
+    'fact_checker': {'tiers': ['fast', 'standard'], 'maxPromptTokens': 1500},
+    # A quick formatting pass over a short analysis
+    'report_writer': {'tiers': ['fast', 'standard'], 'maxPromptTokens': 3000},
+}
+DEFAULT_TIER = 'standard'
+
+CONFIDENCE_INSTRUCTION = ("\n\nEnd your answer with a final line 'Confidence: N', where N (0-100) is how "
+                          "sure you are that the answer is complete and correct.")
+
+_CONFIDENCE = re.compile(r'\**confidence\**\s*[:=]\s*(\d{1,3})\s*(?:%|/\s*100)?\s*\.?\s*$', re.IGNORECASE)
+_DECLINED = re.compile(r"^\s*(i('m| am) (not sure|unable)|i can(not|'t)|i don't know|sorry\b)", re.IGNORECASE)
+
+
+def _json_env(name, default):
+    value = os.environ.get(name)
+    return json.loads(value) if value else default
+
+
+MODEL_TIERS = _json_env('MODEL_TIERS', DEFAULT_MODEL_TIERS)
+SPECIALIST_PROFILES = _json_env('SPECIALIST_MODEL_PROFILES', DEFAULT_SPECIALIST_PROFILES)
+
+
+def orchestrator_config(defaults):
+    """An orchestrator's model config: defaults, with ORCHESTRATOR_MODEL_CONFIG (JSON) layered on top."""
+    return {**defaults, **_json_env('ORCHESTRATOR_MODEL_CONFIG', {})}
+
+
+class TierMetrics:
+    """Container-wide counters per tier: attempts, escalations, latency and tokens."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.tiers = {}
+
+    def record(self, tier, elapsed_ms, input_tokens, output_tokens, escalated):
+        with self._lock:
+            counts = self.tiers.setdefault(tier, {'calls': 0, 'escalations': 0, 'ms': 0.0,
+                                                  'inputTokens': 0, 'outputTokens': 0})
+            counts['calls'] += 1
+            counts['escalations'] += int(escalated)
+            counts['ms'] += elapsed_ms
+            counts['inputTokens'] += input_tokens
+            counts['outputTokens'] += output_tokens
+
+    def as_dict(self):
+        with self._lock:
+            tiers = {tier: dict(counts) for tier, counts in self.tiers.items()}
+        for counts in tiers.values():
+            counts['escalation_rate'] = round(counts['escalations'] / counts['calls'], 4)
+            counts['avg_ms'] = round(counts.pop('ms') / counts['calls'], 1)
+        return tiers
+
+
+# One per container, shared by every job the worker runs
+tier_metrics = TierMetrics()
+
+
+def tiers_for(specialist, prompt, streamed=False):
+    """The tiers a call goes through, cheapest first."""
+    profile = SPECIALIST_PROFILES.get(specialist) or {}
+    tiers = list(profile.get('tiers') or [DEFAULT_TIER])
+    if not MODEL_TIERING_ENABLED or streamed:
+        # A streamed answer can't be taken back, so it comes from the last tier
+        return tiers[-1:]
+    max_tokens = profile.get('maxPromptTokens')
+    if max_tokens and estimate_tokens(prompt) > max_tokens:
+        return tiers[-1:]
+    return tiers
+
+
+def check_answer(text, min_confidence=TIER_MIN_CONFIDENCE):
+    """
+    Splits the confidence line off a lower tier's answer. Returns (answer,
+    confidence, reason), where reason says why the answer must be escalated,
+    or is None if it can be used.
+    """
+    text = str(text).strip()
+    match = _CONFIDENCE.search(text)
+    if not match:
+        return text, None, 'no_confidence'
+    answer = text[:match.start()].rstrip()
+    confidence = min(int(match.group(1)), 100)
+    if len(answer) < TIER_MIN_ANSWER_CHARS:
+        return answer, confidence, 'empty'
+    if _DECLINED.match(answer):
+        return answer, confidence, 'declined'
+    if confidence < min_confidence:
+        return answer, confidence, 'low_confidence'
+    return answer, confidence, None
+
+
+def _span_tokens(span):
+    """Tokens used by the model calls under span (0 outside a trace)."""
+    if span is None:
+        return 0, 0
+    with span.trace.lock:
+        spans = list(span.trace.spans)
+    input_tokens = output_tokens = 0
+    for candidate in spans:
+        parent = candidate.parent
+        while parent is not None and parent is not span:
+            parent = parent.parent
+        if parent is span:
+            input_tokens += int(candidate.attrs.get('inputTokens', 0))
+            output_tokens += int(candidate.attrs.get('outputTokens', 0))
+    return input_tokens, output_tokens
+
+
+def run_tiered(specialist, system_prompt, prompt, cache=False, stream_to=None, **agent_kwargs):
+    """
+    run_specialist through the specialist's tiers (see tiers_for): returns the
+    first answer that passes check_answer, or the last tier's answer.
+    Throttling (ModelUnavailableError) is never escalated: it propagates.
+    """
+    profile = SPECIALIST_PROFILES.get(specialist) or {}
+    min_confidence = int(profile.get('minConfidence', TIER_MIN_CONFIDENCE))
+    tiers = tiers_for(specialist, prompt, streamed=stream_to is not None)
+    for position, tier in enumerate(tiers):
+        final = position == len(tiers) - 1
+        config = MODEL_TIERS.get(tier) or {}
+        started = time.perf_counter()
+        reason = confidence = None
+        with tracing.span(f"{specialist}:{tier}", 'tier', modelTier=tier, modelId=config.get('model_id')) as span:
+            try:
+                # An empty config shares the pooled agents and cache entries of untiered calls
+                output = run_specialist(system_prompt if final else system_prompt + CONFIDENCE_INSTRUCTION, prompt,
+                                        cache=cache, model_config=config or None,
+                                        stream_to=stream_to if final else None, **agent_kwargs)
+            except ModelUnavailableError:
+                raise
+            except Exception as e:
+                if final:
+                    raise
+                output, reason = None, 'error'
+                print(f"{specialist} failed on the {tier} tier, escalating: {e}")
+            if not final and reason is None:
+                output, confidence, reason = check_answer(output, min_confidence)
+            escalated = not final and reason is not None
+            if span is not None:
+                span.set(confidence=confidence, escalated=reason if escalated else None)
+            input_tokens, output_tokens = _span_tokens(span)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        tier_metrics.record(tier, elapsed_ms, input_tokens, output_tokens, escalated)
+        print(json.dumps({'event': 'model_tier', 'specialist': specialist, 'tier': tier, 'ms': int(elapsed_ms),
+                          'inputTokens': input_tokens, 'outputTokens': output_tokens, 'confidence': confidence,
+                          'escalated': reason if escalated else None}))
+        if not escalated:
+            return output
+        tracing.count('escalations')
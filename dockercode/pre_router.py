@@ -0,0 +1,228 @@
+# pre_router.py
+# Local routing stage in front of the orchestrator: obvious queries go straight
+# to a specialist, ambiguous ones still get the orchestrator's LLM routing hop.
+import json
+import math
+import os
+import re
+import threading
+import time
+from collections import namedtuple
+
+import tracing
+from response_cache import normalize_text
+
+PRE_ROUTER_ENABLED = os.environ.get('PRE_ROUTER_ENABLED', 'true').lower() == 'true'
+# Minimum confidence (0-1) for a query to skip the orchestrator
+PRE_ROUTER_THRESHOLD = float(os.environ.get('PRE_ROUTER_THRESHOLD', '0.6'))
+# Minimum keyword score of the winning label: 2 is two keywords or one phrase. A lone
+# keyword is too often incidental ("write a poem about a phone", "what factors ...").
+# Raise either only if benchmarks/eval_pre_router.py still passes its precision gate.
+PRE_ROUTER_MIN_SCORE = float(os.environ.get('PRE_ROUTER_MIN_SCORE', '2'))
+
+# Label for queries the pre-router leaves to the orchestrator
+ORCHESTRATOR = 'orchestrator'
+
+# Keywords per specialist tool. Multi-word phrases count double; a trailing '*'
+# matches any word starting with the stem.
+SPECIALIST_KEYWORDS = {
+    'research_assistant': [
+        'research', 'explain*', 'history', 'historical', 'scien*', 'study', 'studies',
+        'evidence', 'cite', 'citation*', 'sources', 'fact*', 'theory', 'discover*',
+        'invent*', 'cause*', 'define', 'definition', 'how does', 'why do', 'why does',
+        'who was', 'who invented', 'when did',
+    ],
+    'product_recommendation_assistant': [
+        'recommend*', 'buy', 'buying', 'purchas*', 'product*', 'shopping', 'shop',
+        'price*', 'budget', 'cheap*', 'afford*', 'brand*', 'review*', 'laptop*',
+        'phone*', 'smartphone*', 'headphone*', 'earbuds', 'camera*', 'monitor*',
+        'keyboard*', 'tv', 'gift*', 'deal*', 'worth buying', 'should i get',
+        'under $',
+    ],
+    'trip_planning_assistant': [
+        'trip*', 'travel*', 'itinerar*', 'vacation*', 'holiday*', 'flight*', 'hotel*',
+        'hostel*', 'destination*', 'sightseeing', 'tour*', 'visit*', 'getaway',
+        'backpack*', 'honeymoon', 'road trip', 'days in', 'weekend in', 'where to stay',
+        'things to do',
+    ],
+}
+
+RouteDecision = namedtuple('RouteDecision', ['label', 'confidence', 'routed', 'scores', 'classify_ms'])
+
+
+def estimate_tokens(text):
+    """Rough token count (about four characters per token), good enough for savings estimates."""
+    return int(math.ceil(len(text or '') / 4.0))
+
+
+class KeywordClassifier:
+    """
+    Scores a query against keyword lists. Confidence is the winning label's
+    share of the evidence: top / (top + runner-up + prior), so a lone weak
+    match or a close call between two labels stays below the threshold.
+    """
+
+    def __init__(self, keywords, prior=0.5):
+        self.prior = prior
+        self._words = {}
+        self._stems = []
+        self._phrases = []
+        for label, entries in keywords.items():
+            for entry in entries:
+                entry = normalize_text(entry)
+                if ' ' in entry or not re.fullmatch(r'\w+\*?', entry):
+                    self._phrases.append((entry, label))
+                elif entry.endswith('*'):
+                    self._stems.append((entry[:-1], label))
+                else:
+                    self._words.setdefault(entry, []).append(label)
+        self.labels = list(keywords)
+
+    def scores(self, query):
+        text = normalize_text(query)
+        scores = dict.fromkeys(self.labels, 0.0)
+        for word in re.findall(r'\w+', text):
+            matched = set(self._words.get(word, ()))
+            matched.update(label for stem, label in self._stems if word.startswith(stem))
+            for label in matched:
+                scores[label] += 1.0
+        padded = f" {text} "
+        for phrase, label in self._phrases:
+            if f" {phrase}" in padded:
+                scores[label] += 2.0
+        return scores
+
+    def classify(self, query):
+        """Returns (label, confidence, scores); label is None when nothing matched."""
+        scores = self.scores(query)
+        ranked = sorted(scores.values(), reverse=True)
+        top = ranked[0] if ranked else 0.0
+        if top <= 0:
+            return None, 0.0, scores
+        runner_up = ranked[1] if len(ranked) > 1 else 0.0
+        label = max(scores, key=scores.get)
+        return label, top / (top + runner_up + self.prior), scores
+
+
+class RouterMetrics:
+    """
+    Container-wide routing counters. Latency saved is estimated as the average
+    orchestrated job time minus the average fast-path job time, for every job
+    that took the fast path. Agreement compares the pre-router's best guess
+    with the specialist the orchestrator actually called, on fallbacks.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = {
+            'decisions': 0, 'routed': 0, 'fallbacks': 0,
+            'shadow_compared': 0, 'shadow_agreed': 0, 'tokens_saved_estimate': 0,
+        }
+        self.routed_by_label = {}
+        self._ms = {'classify': 0.0, 'fast_path': 0.0, 'orchestrated': 0.0}
+        self._timed = {'fast_path': 0, 'orchestrated': 0}
+
+    def record_decision(self, decision):
+        with self._lock:
+            self.counts['decisions'] += 1
+            self._ms['classify'] += decision.classify_ms
+            if decision.routed:
+                self.counts['routed'] += 1
+                self.routed_by_label[decision.label] = self.routed_by_label.get(decision.label, 0) + 1
+            else:
+                self.counts['fallbacks'] += 1
+
+    def record_fast_path(self, elapsed_ms, tokens_saved):
+        with self._lock:
+            self._ms['fast_path'] += elapsed_ms
+            self._timed['fast_path'] += 1
+            self.counts['tokens_saved_estimate'] += tokens_saved
+
+    def record_orchestrated(self, decision, elapsed_ms, tools_used):
+        with self._lock:
+            self._ms['orchestrated'] += elapsed_ms
+            self._timed['orchestrated'] += 1
+            # Only single-specialist answers say which route would have been right
+            if decision.label is not None and len(tools_used) == 1:
+                self.counts['shadow_compared'] += 1
+                if decision.label in tools_used:
+                    self.counts['shadow_agreed'] += 1
+
+    def as_dict(self):
+        with self._lock:
+            counts = dict(self.counts)
+            ms, timed = dict(self._ms), dict(self._timed)
+            counts['routed_by_label'] = dict(self.routed_by_label)
+        decisions = counts['decisions']
+        avg_fast = ms['fast_path'] / timed['fast_path'] if timed['fast_path'] else None
+        avg_orchestrated = ms['orchestrated'] / timed['orchestrated'] if timed['orchestrated'] else None
+        counts['routed_rate'] = round(counts['routed'] / decisions, 4) if decisions else 0.0
+        counts['avg_classify_ms'] = round(ms['classify'] / decisions, 3) if decisions else 0.0
+        counts['shadow_agreement'] = (round(counts['shadow_agreed'] / counts['shadow_compared'], 4)
+                                      if counts['shadow_compared'] else None)
+        counts['latency_saved_ms_estimate'] = (
+            round((avg_orchestrated - avg_fast) * timed['fast_path'], 1)
+            if avg_fast is not None and avg_orchestrated is not None else None)
+        return counts
+
+
+class PreRouter:
+    """
+    Decides, without a model call, whether a query can go straight to one
+    specialist. route() never raises; anything it is unsure about is left to
+    the orchestrator.
+    """
+
+    def __init__(self, classifier=None, threshold=PRE_ROUTER_THRESHOLD, enabled=PRE_ROUTER_ENABLED,
+                 min_score=PRE_ROUTER_MIN_SCORE):
+        self.classifier = classifier or KeywordClassifier(SPECIALIST_KEYWORDS)
+        self.threshold = threshold
+        self.min_score = min_score
+        self.enabled = enabled
+        self.metrics = RouterMetrics()
+
+    def would_route(self, label, confidence, scores):
+        """Whether a classify() result is confident enough to skip the orchestrator."""
+        return (self.enabled and label is not None and confidence >= self.threshold
+                and scores.get(label, 0.0) >= self.min_score)
+
+    def route(self, query):
+        started = time.perf_counter()
+        label, confidence, scores = self.classifier.classify(query or '')
+        routed = self.would_route(label, confidence, scores)
+        decision = RouteDecision(label, round(confidence, 4), routed, scores,
+                                 (time.perf_counter() - started) * 1000)
+        self.metrics.record_decision(decision)
+        return decision
+
+    def dispatch(self, query, specialists, run_orchestrator, orchestrator_prompt=''):
+        """
+        Answers the query with specialists[label](query) when the route is
+        confident, otherwise with run_orchestrator(query). Returns the result.
+        """
+        decision = self.route(query)
+        print(json.dumps({'event': 'pre_route', 'label': decision.label or ORCHESTRATOR,
+                          'confidence': decision.confidence, 'routed': decision.routed}))
+        tracing.annotate(route=decision.label if decision.routed else ORCHESTRATOR)
+        started = time.perf_counter()
+        if decision.routed and decision.label in specialists:
+            with tracing.span(decision.label, 'tool'):
+                result = specialists[decision.label](query)
+            # The orchestrator would have read its prompt and the query twice
+            # (before and after the tool call) and the specialist's answer once.
+            tokens_saved = 2 * estimate_tokens(orchestrator_prompt + query) + estimate_tokens(str(result))
+            self.metrics.record_fast_path((time.perf_counter() - started) * 1000, tokens_saved)
+            return result
+        result = run_orchestrator(query)
+        self.metrics.record_orchestrated(decision, (time.perf_counter() - started) * 1000, tools_used(result))
+        return result
+
+
+def tools_used(result):
+    """Names of the tools an orchestrator run called, from the strands AgentResult metrics."""
+    tool_metrics = getattr(getattr(result, 'metrics', None), 'tool_metrics', None) or {}
+    return set(tool_metrics)
+
+
+# One per container, shared by every job the worker runs
+pre_router = PreRouter()
@@ -0,0 +1,137 @@
+# progress_stream.py
+import os
+import threading
+import time
+
+STREAM_PROGRESS = os.environ.get('STREAM_PROGRESS', 'true').lower() == 'true'
+STREAM_FLUSH_BYTES = int(os.environ.get('STREAM_FLUSH_BYTES', '1024'))
+STREAM_FLUSH_SECONDS = float(os.environ.get('STREAM_FLUSH_SECONDS', '2'))
+# Keeps the streamed copy well under DynamoDB's 400 KB item limit
+STREAM_MAX_BYTES = int(os.environ.get('STREAM_MAX_BYTES', '200000'))
+
+
+class ProgressStreamer:
+    """
+    Strands callback handler that streams partial output to the job item.
+
+    Text tokens and tool starts are buffered and appended to the item's
+    'chunks' list in batches, at most every STREAM_FLUSH_SECONDS or once
+    STREAM_FLUSH_BYTES have built up. 'progressSeq' is the number of chunks
+    written so far and never goes back, so clients' sinceSeq cursors stay valid.
+
+    A retried or redelivered job starts its output over: restart() replaces the
+    earlier attempt's chunks with a 'reset' chunk, and 'chunkBase' records the
+    sequence number the new list starts after (see chunks_since).
+    """
+
+    def __init__(self, table, job_id, flush_bytes=STREAM_FLUSH_BYTES,
+                 flush_seconds=STREAM_FLUSH_SECONDS, max_bytes=STREAM_MAX_BYTES):
+        self.table = table
+        self.job_id = job_id
+        self.flush_bytes = flush_bytes
+        self.flush_seconds = flush_seconds
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._pending = []
+        self._pending_bytes = 0
+        self._streamed_bytes = 0
+        self._truncated = False
+        self._seen_tools = set()
+        self._last_flush = time.monotonic()
+        # Set by restart() until the earlier attempt's chunks have been replaced
+        self._base = None
+        self.flushes = 0
+
+    def __call__(self, **kwargs):
+        text = kwargs.get('data')
+        tool_use = kwargs.get('current_tool_use') or {}
+        with self._lock:
+            if text:
+                self._add_text(text)
+            tool_id = tool_use.get('toolUseId')
+            if tool_id and tool_id not in self._seen_tools:
+                self._seen_tools.add(tool_id)
+                self._pending.append({'type': 'tool', 'tool': tool_use.get('name', '')})
+            if self._due():
+                self._flush()
+
+    def _add_text(self, text):
+        if self._truncated:
+            return
+        if self._streamed_bytes + len(text) > self.max_bytes:
+            self._truncated = True
+            self._pending.append({'type': 'truncated'})
+            return
+        self._streamed_bytes += len(text)
+        self._pending_bytes += len(text)
+        # Merge consecutive tokens into one chunk
+        if self._pending and self._pending[-1]['type'] == 'text':
+            self._pending[-1]['text'] += text
+        else:
+            self._pending.append({'type': 'text', 'text': text})
+
+    def _due(self):
+        if not self._pending:
+            return False
+        return (self._pending_bytes >= self.flush_bytes
+                or time.monotonic() - self._last_flush >= self.flush_seconds)
+
+    def restart(self, seq):
+        """Drops the chunks an earlier attempt streamed; seq is the job's progressSeq when it was claimed."""
+        with self._lock:
+            self._base = seq
+            self._flush()
+
+    def _flush(self):
+        chunks, self._pending, self._pending_bytes = self._pending, [], 0
+        self._last_flush = time.monotonic()
+        names = {'#c': 'chunks', '#q': 'progressSeq', '#v': 'version'}
+        try:
+            if self._base is None:
+                self.table.update_item(
+                    Key={'jobId': self.job_id},
+                    UpdateExpression="set #c = list_append(if_not_exists(#c, :empty), :chunks) add #q :n, #v :one",
+                    ExpressionAttributeNames=names,
+                    ExpressionAttributeValues={':empty': [], ':chunks': chunks, ':n': len(chunks), ':one': 1}
+                )
+            else:
+                chunks = [{'type': 'reset'}] + chunks
+                self.table.update_item(
+                    Key={'jobId': self.job_id},
+                    UpdateExpression="set #c = :chunks, chunkBase = :base add #q :n, #v :one",
+                    ExpressionAttributeNames=names,
+                    ExpressionAttributeValues={':chunks': chunks, ':base': self._base, ':n': len(chunks), ':one': 1}
+                )
+                self._base = None
+            self.flushes += 1
+        except Exception as e:
+            # Progress is best effort; the final result is still written by the worker
+            print(f"Progress flush failed for Job ID {self.job_id}: {e}")
+
+    def close(self):
+        with self._lock:
+            if self._pending:
+                self._flush()
+
+
+def make_streamer(table, job_id, claimed=None):
+    """claimed is the item claim_job returned; if an earlier attempt streamed output, it is reset."""
+    if not STREAM_PROGRESS:
+        return None
+    streamer = ProgressStreamer(table, job_id)
+    seq = int((claimed or {}).get('progressSeq', 0))
+    if seq:
+        streamer.restart(seq)
+    return streamer
+
+
+def chunks_since(item, since_seq):
+    """
+    Returns the chunks after since_seq, each tagged with its sequence number.
+    The stored list starts after 'chunkBase', so a client behind a restart gets
+    its 'reset' chunk first and knows to drop the output it has shown.
+    """
+    chunks = item.get('chunks') or []
+    base = int(item.get('chunkBase', 0))
+    start = max(0, min(int(since_seq) - base, len(chunks)))
+    return [dict(chunk, seq=base + start + i + 1) for i, chunk in enumerate(chunks[start:])]
@@ -0,0 +1,258 @@
+# response_cache.py
+import abc
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+import startup
+
+RESPONSE_CACHE_ENABLED = os.environ.get('RESPONSE_CACHE_ENABLED', 'true').lower() == 'true'
+RESPONSE_CACHE_SIZE = int(os.environ.get('RESPONSE_CACHE_SIZE', '256'))
+RESPONSE_CACHE_TTL_SECONDS = int(os.environ.get('RESPONSE_CACHE_TTL_SECONDS', '3600'))
+# Persistent tier: set RESPONSE_CACHE_TABLE to a sibling table, or to the job table itself
+RESPONSE_CACHE_TABLE = os.environ.get('RESPONSE_CACHE_TABLE')
+# Near-duplicate matching is off unless a similarity threshold (0-1) is configured
+RESPONSE_CACHE_SIMILARITY = float(os.environ.get('RESPONSE_CACHE_SIMILARITY', '0'))
+
+CACHE_KEY_PREFIX = 'cache#'
+
+
+def normalize_text(text):
+    """Case, unicode form and whitespace differences should not cause a cache miss."""
+    text = unicodedata.normalize('NFKC', text or '').lower()
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+def cache_key(system_prompt, query, model_config=None):
+    payload = json.dumps(
+        [normalize_text(system_prompt), normalize_text(query), model_config or {}],
+        sort_keys=True, default=str,
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def scope_key(system_prompt, model_config=None):
+    """Near-duplicate lookups only compare queries asked of the same agent configuration."""
+    return cache_key(system_prompt, '', model_config)
+
+
+class CacheStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = {'memory_hits': 0, 'persistent_hits': 0, 'near_hits': 0, 'misses': 0, 'stores': 0}
+
+    def incr(self, name):
+        with self._lock:
+            self.counts[name] += 1
+
+    def as_dict(self):
+        with self._lock:
+            counts = dict(self.counts)
+        hits = counts['memory_hits'] + counts['persistent_hits'] + counts['near_hits']
+        lookups = hits + counts['misses']
+        counts['hit_rate'] = round(hits / lookups, 4) if lookups else 0.0
+        return counts
+
+
+class LRUCache:
+    """In-process tier: bounded LRU with a per-entry TTL."""
+
+    def __init__(self, max_entries=RESPONSE_CACHE_SIZE, ttl_seconds=RESPONSE_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.time() + self.ttl_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class DynamoDBCacheTier:
+    """
+    Persistent tier. Entries live next to the jobs (or in a sibling table) under
+    'cache#<key>' with an 'expiresAt' attribute that DynamoDB TTL cleans up.
+    get_table is called on each use, so the table can be built lazily.
+    """
+
+    def __init__(self, get_table, ttl_seconds=RESPONSE_CACHE_TTL_SECONDS):
+        self.get_table = get_table
+        self.ttl_seconds = ttl_seconds
+
+    def get(self, key):
+        item = self.get_table().get_item(Key={'jobId': CACHE_KEY_PREFIX + key}).get('Item')
+        # TTL deletes lazily, so expired items can still be returned for a while
+        if not item or int(item.get('expiresAt', 0)) < time.time():
+            return None
+        return item.get('response')
+
+    def put(self, key, value):
+        self.get_table().put_item(Item={
+            'jobId': CACHE_KEY_PREFIX + key,
+            'response': value,
+            'expiresAt': int(time.time()) + self.ttl_seconds,
+        })
+
+
+class NearDuplicateMatcher(abc.ABC):
+    """
+    Interface for pluggable near-duplicate lookup. find() returns a cache key or None.
+    The index is per container: it holds the queries this container stored or
+    found in the persistent tier, while the responses themselves may come from
+    either tier.
+    """
+
+    @abc.abstractmethod
+    def add(self, scope, query, key):
+        """Records that query (asked in scope) is cached under key."""
+
+    @abc.abstractmethod
+    def find(self, scope, query):
+        """The key of a cached query close enough to query, or None."""
+
+
+class TokenJaccardMatcher(NearDuplicateMatcher):
+    """Word-set Jaccard similarity over the most recent queries of each scope."""
+
+    def __init__(self, threshold=0.9, max_per_scope=512):
+        self.threshold = threshold
+        self.max_per_scope = max_per_scope
+        self._lock = threading.Lock()
+        self._index = {}
+
+    @staticmethod
+    def _tokens(query):
+        return frozenset(re.findall(r'\w+', normalize_text(query)))
+
+    def add(self, scope, query, key):
+        with self._lock:
+            entries = self._index.setdefault(scope, OrderedDict())
+            entries[key] = self._tokens(query)
+            while len(entries) > self.max_per_scope:
+                entries.popitem(last=False)
+
+    def find(self, scope, query):
+        tokens = self._tokens(query)
+        if not tokens:
+            return None
+        best_key, best_score = None, 0.0
+        with self._lock:
+            for key, other in self._index.get(scope, {}).items():
+                score = len(tokens & other) / len(tokens | other)
+                if score > best_score:
+                    best_key, best_score = key, score
+        return best_key if best_score >= self.threshold else None
+
+
+class ResponseCache:
+    """
+    Three-tier cache for specialist responses: in-process LRU, optional
+    persistent tier, optional near-duplicate matcher. Only successful
+    responses are stored; if compute() raises, nothing is cached.
+    """
+
+    def __init__(self, memory=None, persistent=None, matcher=None):
+        self.memory = memory or LRUCache()
+        self.persistent = persistent
+        self.matcher = matcher
+        self.stats = CacheStats()
+
+    def lookup(self, system_prompt, query, model_config=None):
+        key = cache_key(system_prompt, query, model_config)
+        value = self.memory.get(key)
+        if value is not None:
+            self.stats.incr('memory_hits')
+            return value
+        if self.persistent is not None:
+            try:
+                value = self.persistent.get(key)
+            except Exception as e:
+                print(f"Response cache read failed: {e}")
+            if value is not None:
+                self.stats.incr('persistent_hits')
+                self._remember(key, system_prompt, query, value, model_config)
+                return value
+        if self.matcher is not None:
+            near_key = self.matcher.find(scope_key(system_prompt, model_config), query)
+            value = self._get(near_key) if near_key else None
+            if value is not None:
+                self.stats.incr('near_hits')
+                self.memory.put(key, value)
+                return value
+        self.stats.incr('misses')
+        return None
+
+    def _get(self, key):
+        """A near-duplicate's response: from memory, or from the persistent tier once evicted."""
+        value = self.memory.get(key)
+        if value is None and self.persistent is not None:
+            try:
+                value = self.persistent.get(key)
+            except Exception as e:
+                print(f"Response cache read failed: {e}")
+        return value
+
+    def _remember(self, key, system_prompt, query, value, model_config):
+        self.memory.put(key, value)
+        if self.matcher is not None:
+            self.matcher.add(scope_key(system_prompt, model_config), query, key)
+
+    def store(self, system_prompt, query, value, model_config=None):
+        key = cache_key(system_prompt, query, model_config)
+        self._remember(key, system_prompt, query, value, model_config)
+        if self.persistent is not None:
+            try:
+                self.persistent.put(key, value)
+            except Exception as e:
+                print(f"Response cache write failed: {e}")
+        self.stats.incr('stores')
+
+    def get_or_compute(self, system_prompt, query, compute, model_config=None):
+        value = self.lookup(system_prompt, query, model_config)
+        if value is None:
+            value = compute()
+            self.store(system_prompt, query, value, model_config)
+        return value
+
+
+def build_response_cache():
+    """Builds the container-wide cache from the RESPONSE_CACHE_* environment variables."""
+    if not RESPONSE_CACHE_ENABLED:
+        return None
+    persistent = None
+    if RESPONSE_CACHE_TABLE:
+        table = startup.Lazy('response_cache_table', _build_cache_table, phase=startup.INVOKE)
+        persistent = DynamoDBCacheTier(table.get)
+    matcher = TokenJaccardMatcher(RESPONSE_CACHE_SIMILARITY) if RESPONSE_CACHE_SIMILARITY > 0 else None
+    return ResponseCache(persistent=persistent, matcher=matcher)
+
+
+def _build_cache_table():
+    import boto3
+    return boto3.resource('dynamodb').Table(RESPONSE_CACHE_TABLE)
+
+
+response_cache = build_response_cache()
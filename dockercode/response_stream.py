@@ -0,0 +1,188 @@
+# response_stream.py
+# Server-sent-event mode for the synchronous handlers. The answer is produced
+# on a background thread; its tokens and tool starts are yielded as SSE events
+# as soon as the model emits them, ending with a 'done' (or 'error') event.
+#
+# The managed Python Lambda runtime can only return a response once it is
+# complete, so lambda_handler falls back to returning the buffered event
+# stream in one body. Real streaming comes from running this module as an HTTP
+# server that flushes each event as it is produced. Dockerfile.stream runs it
+# behind the Lambda Web Adapter with AWS_LWA_INVOKE_MODE=response_stream, and
+# terraform (streaming.tf) serves those functions through function URLs with
+# invoke_mode RESPONSE_STREAM. Locally:
+#
+#     python response_stream.py lambda_function_standard --port 8080
+#     curl -N -d '{"query": "..."}' localhost:8080/
+#
+# Either way the HTTP status is that of the first event: a request that fails
+# before anything was streamed (bad body, model unavailable) gets the error's
+# status. Once events have been sent the status is 200 and a failure ends the
+# stream with an 'error' event.
+import contextvars
+import json
+import os
+import queue
+import threading
+
+from model_calls import ModelUnavailableError
+
+# A comment line is sent after this many quiet seconds so proxies keep the connection open
+STREAM_HEARTBEAT_SECONDS = float(os.environ.get('STREAM_HEARTBEAT_SECONDS', '10'))
+
+_DONE = object()
+
+
+def sse_event(event, data):
+    """One server-sent event; data is sent as JSON."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def status_of(chunk):
+    """The HTTP status for a stream whose first (or, when buffered, last) event is chunk."""
+    if chunk and chunk.startswith('event: error\n'):
+        return int(json.loads(chunk.split('data: ', 1)[1]).get('status', 500))
+    return 200
+
+
+def _error_headers(status):
+    # Same hint as the JSON mode's 503
+    return {'Retry-After': '30'} if status == 503 else {}
+
+
+def wants_stream(event):
+    """True when an API Gateway request asks for SSE (Accept header or ?stream=true)."""
+    headers = {k.lower(): v for k, v in (event.get('headers') or {}).items()}
+    params = event.get('queryStringParameters') or {}
+    return ('text/event-stream' in headers.get('accept', '')
+            or str(params.get('stream', 'false')).lower() == 'true')
+
+
+class EventQueueCallback:
+    """Strands callback handler that turns tokens and tool starts into queued events."""
+
+    def __init__(self, events):
+        self.events = events
+        self._seen_tools = set()
+
+    def __call__(self, **kwargs):
+        text = kwargs.get('data')
+        if text:
+            self.events.put(('token', {'text': text}))
+        tool_use = kwargs.get('current_tool_use') or {}
+        tool_id = tool_use.get('toolUseId')
+        if tool_id and tool_id not in self._seen_tools:
+            self._seen_tools.add(tool_id)
+            self.events.put(('tool', {'tool': tool_use.get('name', '')}))
+
+
+def stream_events(run, heartbeat_seconds=STREAM_HEARTBEAT_SECONDS):
+    """
+    Calls run(callback_handler) on a background thread (with the caller's
+    context, so tracing follows) and yields its events as SSE strings.
+    The last event is 'done' with the full response, or 'error' with the
+    HTTP status the buffered mode would have answered with.
+    """
+    events = queue.Queue()
+    callback = EventQueueCallback(events)
+    context = contextvars.copy_context()
+
+    def produce():
+        try:
+            events.put(('done', {'response': str(context.run(run, callback))}))
+        except ModelUnavailableError as e:
+            events.put(('error', {'status': 503, 'error': f'Model temporarily unavailable: {e}'}))
+        except Exception as e:
+            print(f"An error occurred: {e}")
+            events.put(('error', {'status': 500, 'error': f'Server error: {e}'}))
+        events.put((_DONE, None))
+
+    threading.Thread(target=produce, name='response-stream', daemon=True).start()
+    while True:
+        try:
+            event, data = events.get(timeout=heartbeat_seconds)
+        except queue.Empty:
+            yield ": keep-alive\n\n"
+            continue
+        if event is _DONE:
+            return
+        yield sse_event(event, data)
+
+
+def buffered_sse_response(events):
+    """
+    Fallback for runtimes that can't stream: the whole event stream as one API
+    Gateway response. Nothing has been sent yet, so a stream that ends in an
+    'error' event is answered with that error's status.
+    """
+    events = list(events)
+    status = status_of(events[-1] if events else None)
+    return {
+        'statusCode': status,
+        'headers': {'Content-Type': 'text/event-stream', 'Cache-Control': 'no-cache', **_error_headers(status)},
+        'body': ''.join(events),
+    }
+
+
+def make_server(stream_request, port=8080):
+    """
+    Minimal HTTP server for streaming: POST a JSON body and the events of
+    stream_request(body) are written with chunked transfer encoding as they
+    are produced, under the status of the first one (see status_of). GET
+    answers 200 (the Lambda Web Adapter's readiness check).
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length') or 0)
+            try:
+                body = json.loads(self.rfile.read(length) or b'{}')
+            except ValueError:
+                body = {}
+            chunks = iter(stream_request(body))
+            # The status line waits for the first event (or keep-alive), so early errors keep their status
+            first = next(chunks, None)
+            status = status_of(first)
+            self.send_response(status)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Cache-Control', 'no-cache')
+            for name, value in _error_headers(status).items():
+                self.send_header(name, value)
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+            if first is not None:
+                self._write_chunk(first)
+            for chunk in chunks:
+                self._write_chunk(chunk)
+            self.wfile.write(b"0\r\n\r\n")
+
+        def _write_chunk(self, chunk):
+            data = chunk.encode('utf-8')
+            self.wfile.write(f"{len(data):x}\r\n".encode('ascii') + data + b"\r\n")
+            self.wfile.flush()
+
+    return ThreadingHTTPServer(('0.0.0.0', port), Handler)
+
+
+def serve(stream_request, port=8080):
+    server = make_server(stream_request, port)
+    print(f"Streaming on port {port}")
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    import argparse
+    import importlib
+
+    parser = argparse.ArgumentParser(description='Serve a handler module\'s stream_request() as SSE.')
+    parser.add_argument('module', help='lambda_function_standard or lambda_function_interleaved')
+    parser.add_argument('--port', type=int, default=int(os.environ.get('PORT', '8080')))
+    args = parser.parse_args()
+    serve(importlib.import_module(args.module).stream_request, args.port)
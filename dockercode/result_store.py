@@ -0,0 +1,137 @@
+# result_store.py
+import hashlib
+import os
+import zlib
+
+# Where completed results live: 'dynamodb' (chunk items in the job table), 's3' or 'local'
+RESULT_STORE = os.environ.get('RESULT_STORE', 'dynamodb')
+RESULT_BUCKET = os.environ.get('RESULT_BUCKET')
+RESULT_PREFIX = os.environ.get('RESULT_PREFIX', 'results/')
+RESULT_LOCAL_DIR = os.environ.get('RESULT_LOCAL_DIR', '/tmp/agent-results')
+# Each chunk item stays comfortably below DynamoDB's 400 KB item limit
+RESULT_CHUNK_BYTES = int(os.environ.get('RESULT_CHUNK_BYTES', '350000'))
+
+ENCODING = 'zlib'
+
+
+class ResultIntegrityError(Exception):
+    pass
+
+
+def _unwrap(data):
+    # boto3 hands DynamoDB binary attributes back as boto3.dynamodb.types.Binary
+    return data.value if hasattr(data, 'value') else bytes(data)
+
+
+class DynamoChunkStore:
+    """
+    Splits a payload into '<key>#part#<n>' items in the job table. Given
+    expires_at, the parts carry it as their TTL ('expiresAt').
+    """
+
+    backend = 'dynamodb'
+
+    def __init__(self, table, chunk_bytes=RESULT_CHUNK_BYTES):
+        self.table = table
+        self.chunk_bytes = chunk_bytes
+
+    def put(self, key, data, expires_at=None):
+        parts = [data[i:i + self.chunk_bytes] for i in range(0, len(data), self.chunk_bytes)] or [b'']
+        for i, part in enumerate(parts):
+            item = {'jobId': f"{key}#part#{i}", 'data': part}
+            if expires_at:
+                item['expiresAt'] = int(expires_at)
+            self.table.put_item(Item=item)
+        return {'backend': self.backend, 'key': key, 'parts': len(parts)}
+
+    def get(self, ref):
+        parts = []
+        for i in range(int(ref['parts'])):
+            item = self.table.get_item(Key={'jobId': f"{ref['key']}#part#{i}"}).get('Item')
+            if not item:
+                raise ResultIntegrityError(f"Missing result part {i} for {ref['key']}")
+            parts.append(_unwrap(item['data']))
+        return b''.join(parts)
+
+
+class S3ObjectStore:
+    backend = 's3'
+
+    def __init__(self, bucket, prefix=RESULT_PREFIX, client=None):
+        if client is None:
+            import boto3
+            client = boto3.client('s3')
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix
+
+    def put(self, key, data, expires_at=None):
+        # Objects expire through the bucket's lifecycle rules
+        object_key = f"{self.prefix}{key}.{ENCODING}"
+        self.client.put_object(Bucket=self.bucket, Key=object_key, Body=data)
+        return {'backend': self.backend, 'bucket': self.bucket, 'key': object_key}
+
+    def get(self, ref):
+        return self.client.get_object(Bucket=ref['bucket'], Key=ref['key'])['Body'].read()
+
+
+class LocalFileStore:
+    """Filesystem object store, for local runs and tests."""
+
+    backend = 'local'
+
+    def __init__(self, root=RESULT_LOCAL_DIR):
+        self.root = root
+
+    def put(self, key, data, expires_at=None):
+        os.makedirs(self.root, exist_ok=True)
+        path = os.path.join(self.root, f"{key}.{ENCODING}")
+        with open(path, 'wb') as f:
+            f.write(data)
+        return {'backend': self.backend, 'key': path}
+
+    def get(self, ref):
+        with open(ref['key'], 'rb') as f:
+            return f.read()
+
+
+class ResultStore:
+    """
+    Compresses a result, writes it to a backend, and returns the pointer fields
+    that go on the job item instead of the result itself.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    def save(self, job_id, text, expires_at=None):
+        raw = str(text).encode('utf-8')
+        ref = self.backend.put(f"{job_id}#result", zlib.compress(raw), expires_at=expires_at)
+        ref['encoding'] = ENCODING
+        return {
+            'resultRef': ref,
+            'resultSize': len(raw),
+            'resultSha256': hashlib.sha256(raw).hexdigest(),
+        }
+
+    def load(self, item):
+        """Reads the full result for a job item written by save()."""
+        raw = zlib.decompress(self.backend.get(item['resultRef']))
+        if hashlib.sha256(raw).hexdigest() != item.get('resultSha256'):
+            raise ResultIntegrityError(f"Checksum mismatch for job {item.get('jobId')}")
+        return raw.decode('utf-8')
+
+
+def build_result_store(table, backend=RESULT_STORE):
+    """Builds the store named by RESULT_STORE; 'dynamodb' reuses the job table."""
+    if backend == 's3':
+        return ResultStore(S3ObjectStore(RESULT_BUCKET))
+    if backend == 'local':
+        return ResultStore(LocalFileStore())
+    return ResultStore(DynamoChunkStore(table))
+
+
+def load_result(table, item):
+    """Reads a result by its pointer, whichever backend wrote it."""
+    backend = item['resultRef'].get('backend', 'dynamodb')
+    return build_result_store(table, backend).load(item)
@@ -1,11 +1,11 @@
 # start_interleaved_job_lambda.py
-import json
-import uuid
 import boto3
 import os
 
+from job_submission import build_dispatcher, start_response
+
 # This will point to our Interleaved Agent Worker function
-AGENT_FUNCTION_NAME = os.environ.get('AGENT_FUNCTION_NAME') 
+AGENT_FUNCTION_NAME = os.environ.get('AGENT_FUNCTION_NAME')
 TABLE_NAME = os.environ.get('TABLE_NAME')
 
 if not AGENT_FUNCTION_NAME or not TABLE_NAME:
@@ -14,29 +14,10 @@ if not AGENT_FUNCTION_NAME or not TABLE_NAME:
 lambda_client = boto3.client('lambda')
 dynamodb = boto3.resource('dynamodb')
 table = dynamodb.Table(TABLE_NAME)
+dispatcher = build_dispatcher(lambda_client, AGENT_FUNCTION_NAME)
+# Scheduler caps and priority defaults are per workload (see job_scheduler)
+WORKLOAD = 'interleaved'
 
 def lambda_handler(event, context):
-    try:
-        body = json.loads(event.get('body', '{}'))
-        query = body.get('query') # The 'task' from the form will be passed as 'query'
-
-        if not query:
-            return {'statusCode': 400, 'body': json.dumps({'error': 'Query not provided.'})}
-
-        job_id = str(uuid.uuid4())
-        print(f"Generated Job ID for interleaved agent: {job_id}")
-
-        table.put_item(Item={'jobId': job_id, 'status': 'PENDING', 'query': query})
-
-        payload = {'jobId': job_id, 'query': query}
-
-        lambda_client.invoke(
-            FunctionName=AGENT_FUNCTION_NAME,
-            InvocationType='Event',
-            Payload=json.dumps(payload)
-        )
-
-        return {'statusCode': 202, 'body': json.dumps({'jobId': job_id})}
-    except Exception as e:
-        print(f"Error: {e}")
-        return {'statusCode': 500, 'body': json.dumps({'error': str(e)})}
+    # The 'task' from the form is passed as 'query' (or 'queries' for a batch)
+    return start_response(event, table, dispatcher, scope=AGENT_FUNCTION_NAME, workload=WORKLOAD)
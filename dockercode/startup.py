@@ -0,0 +1,137 @@
+# startup.py
+# Cold-start helpers shared by the container workers: lazily built resources,
+# the two initialization phases, warm-up events and startup timings.
+import json
+import threading
+import time
+
+import tracing
+
+# Phases a resource can be built in:
+# - SNAPSHOT: pure Python state (imports, tool wrappers, models, pooled agents).
+#   Safe to build during init and to capture in a SnapStart snapshot.
+# - INVOKE: AWS service clients that hold credentials and open connections. Built
+#   on first use inside an invocation, and rebuilt after a snapshot restore.
+SNAPSHOT = 'snapshot'
+INVOKE = 'invoke'
+
+_lock = threading.Lock()
+_resources = []
+_cold = True
+
+# name -> milliseconds, e.g. 'import:agent_worker_lambda', 'init:orchestrator_tools'
+timings = {}
+
+
+def record(name, started):
+    """Records the time since `started` (a time.perf_counter() value) under name."""
+    timings[name] = round((time.perf_counter() - started) * 1000, 1)
+
+
+class Lazy:
+    """
+    A value built by factory() on first get() and reused for the life of the
+    container. Construction is thread-safe and timed as 'init:<name>'.
+    """
+
+    def __init__(self, name, factory, phase=SNAPSHOT):
+        self.name = name
+        self.phase = phase
+        self._factory = factory
+        self._lock = threading.Lock()
+        self._value = None
+        self.loaded = False
+        with _lock:
+            _resources.append(self)
+
+    def get(self):
+        if not self.loaded:
+            with self._lock:
+                if not self.loaded:
+                    started = time.perf_counter()
+                    self._value = self._factory()
+                    self.loaded = True
+                    record(f"init:{self.name}", started)
+        return self._value
+
+    def reset(self):
+        with self._lock:
+            self._value = None
+            self.loaded = False
+
+
+def warmer(name, phase=SNAPSHOT):
+    """Registers a function to run once as part of warm()."""
+    def decorator(fn):
+        return Lazy(name, fn, phase)
+    return decorator
+
+
+def as_tools(*functions):
+    """
+    Wraps plain functions with strands' @tool, importing strands only when called.
+    Each call is timed as a 'tool' span of the current trace.
+    """
+    from strands import tool
+    return [tool(tracing.traced(fn.__name__)(fn)) for fn in functions]
+
+
+def warm(phases=(SNAPSHOT, INVOKE)):
+    """Builds every registered resource in the given phases. Returns the timings so far."""
+    for resource in list(_resources):
+        if resource.phase in phases:
+            resource.get()
+    return dict(timings)
+
+
+def reset(phases=(INVOKE,)):
+    """Drops resources in the given phases so they are rebuilt on next use."""
+    for resource in list(_resources):
+        if resource.phase in phases:
+            resource.reset()
+
+
+def is_warmup_event(event):
+    """Warm-up pings are {"warmup": true}, e.g. from a scheduled rule or a deploy hook."""
+    return isinstance(event, dict) and event.get('warmup') is True
+
+
+def handle_warmup(cold):
+    """Builds everything a job needs without running one, and reports how long it took."""
+    started = time.perf_counter()
+    warm()
+    record('warmup', started)
+    return {'warmup': True, 'cold': cold, 'timings': dict(timings)}
+
+
+def begin_invocation():
+    """
+    Call at the top of each handler. Returns True for the container's first
+    invocation and logs the startup timings once, as a single JSON line.
+    """
+    global _cold
+    with _lock:
+        cold, _cold = _cold, False
+    if cold:
+        print(json.dumps({'event': 'cold_start', 'timings': timings}))
+    return cold
+
+
+# SnapStart runtime hooks. The module only exists in the Lambda Python runtime,
+# so locally (and without SnapStart) this is a no-op.
+try:
+    from snapshot_restore_py import register_after_restore, register_before_snapshot
+except ImportError:
+    register_after_restore = register_before_snapshot = None
+
+if register_before_snapshot is not None:
+    @register_before_snapshot
+    def _before_snapshot():
+        warm(phases=(SNAPSHOT,))
+
+    @register_after_restore
+    def _after_restore():
+        global _cold
+        reset(phases=(INVOKE,))
+        with _lock:
+            _cold = True
@@ -0,0 +1,10 @@
+# tests/conftest.py
+# The handlers and their modules are flat files in dockercode/, as in the images
+import os
+import sys
+
+DOCKERCODE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCHMARKS_DIR = os.path.join(DOCKERCODE_DIR, 'benchmarks')
+for path in (DOCKERCODE_DIR, BENCHMARKS_DIR):
+    if path not in sys.path:
+        sys.path.insert(0, path)
@@ -0,0 +1,25 @@
+import pytest
+from stubs import InMemoryTable
+
+from admission import AdmissionError, charge_caller
+
+LIMITS = {'requests_per_minute': 2, 'tokens_per_minute': 0,
+          'global_requests_per_minute': 5, 'global_tokens_per_minute': 0}
+
+
+def test_callers_without_an_identity_only_share_the_global_budget():
+    table = InMemoryTable()
+    # More than one caller's budget, as many anonymous users behind the proxy would send
+    for _ in range(5):
+        charge_caller(table, None, ['query'], **LIMITS)
+    with pytest.raises(AdmissionError) as raised:
+        charge_caller(table, None, ['query'], **LIMITS)
+    assert raised.value.status_code == 429
+
+
+def test_authenticated_callers_are_held_to_their_own_budget():
+    table = InMemoryTable()
+    charge_caller(table, 'sub:alice', ['query', 'query'], **LIMITS)
+    with pytest.raises(AdmissionError):
+        charge_caller(table, 'sub:alice', ['query'], **LIMITS)
+    charge_caller(table, 'sub:bob', ['query'], **LIMITS)
@@ -0,0 +1,53 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import tracing
+from context_store import current_context, workflow_context
+
+
+class ThreadedAgent:
+    """Like strands: the synchronous call runs the event loop on a fresh thread, tools in worker threads."""
+
+    def __init__(self, tool):
+        self.tool = tool
+
+    def __call__(self, prompt, **kwargs):
+        # A plain executor thread starts from an empty context
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            return executor.submit(asyncio.run, self.invoke_async(prompt, **kwargs)).result()
+
+    async def invoke_async(self, prompt, **kwargs):
+        return await asyncio.to_thread(self.tool, prompt)
+
+
+def run_workflows(count):
+    seen, barrier = {}, threading.Barrier(count)
+
+    def tool(prompt):
+        return current_context()
+
+    def workflow(i):
+        with workflow_context() as ctx:
+            # Every workflow is in flight before any tool runs, so there's no "only one" to fall back to
+            barrier.wait()
+            seen[i] = (ctx, tracing.call_agent('orchestrator', ThreadedAgent(tool), 'query'))
+
+    threads = [threading.Thread(target=workflow, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return seen
+
+
+def test_tools_see_their_own_workflow_with_several_in_flight():
+    for ctx, seen_by_tool in run_workflows(2).values():
+        assert seen_by_tool is ctx
+
+
+def test_a_thread_that_lost_the_context_is_logged(capsys):
+    with workflow_context(), workflow_context():
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            assert executor.submit(current_context).result() is None
+    assert '"event": "context_lost"' in capsys.readouterr().out
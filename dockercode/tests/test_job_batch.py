@@ -0,0 +1,108 @@
+# tests/test_job_batch.py
+import json
+
+from stubs import FakeLambdaContext, InMemoryQueue
+
+from job_batch import (RetryLater, handle_job_list, handle_sqs_batch, process_batch,
+                       retry_delay_seconds)
+from model_calls import CircuitBreaker
+
+
+def jobs(*job_ids):
+    return [{'jobId': job_id, 'query': f"query {job_id}"} for job_id in job_ids]
+
+
+class RecordingScheduler:
+    def __init__(self):
+        self.scheduled = []
+
+    def schedule(self, function_arn, jobs, delay_seconds):
+        self.scheduled.append((jobs, delay_seconds))
+
+
+class RecordingLambda:
+    def __init__(self):
+        self.invoked = []
+
+    def invoke(self, **kwargs):
+        self.invoked.append(json.loads(kwargs['Payload'])['jobs'])
+
+
+def open_breaker(reset_seconds=120):
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=reset_seconds)
+    breaker.record_failure()
+    return breaker
+
+
+def test_retry_delay_backs_off_up_to_the_max():
+    assert retry_delay_seconds(1) == 30
+    assert retry_delay_seconds(2) == 60
+    assert retry_delay_seconds(20) == 900
+
+
+def test_open_breaker_reports_when_it_lets_a_trial_through():
+    breaker = open_breaker(reset_seconds=120)
+    assert 119 < breaker.retry_after() <= 120
+    assert CircuitBreaker().retry_after() == 0
+
+
+def test_no_job_starts_while_the_model_is_unavailable():
+    ran = []
+    completed, deferred, failed = process_batch(jobs('a', 'b'), lambda job_id, query: ran.append(job_id),
+                                                None, can_start=lambda: False)
+    # The first job of a batch is gated too: running it would only spend an attempt
+    assert ran == [] and completed == [] and failed == []
+    assert [job['jobId'] for job in deferred] == ['a', 'b']
+
+
+def test_first_job_runs_even_when_time_is_short():
+    ran = []
+    completed, deferred, _ = process_batch(jobs('a', 'b'), lambda job_id, query: ran.append(job_id),
+                                           FakeLambdaContext(timeout_ms=1000), concurrency=1,
+                                           min_remaining_ms=5000)
+    assert ran == ['a']
+    assert [job['jobId'] for job in deferred] == ['b']
+    assert deferred[0]['retryDelay'] == 0
+
+
+def test_handed_back_messages_come_back_after_the_circuit_closes():
+    queue = InMemoryQueue()
+    queue.send(json.dumps(jobs('a')[0]))
+    breaker = open_breaker(reset_seconds=120)
+
+    def run_job(job_id, query):
+        raise RetryLater("throttled")
+
+    event = queue.receive_event()
+    response = handle_sqs_batch(event, None, run_job, queue, retry_after=breaker.retry_after)
+    queue.complete(event, response)
+    assert response['batchItemFailures'] == [{'itemIdentifier': event['Records'][0]['messageId']}]
+    # Hidden for the open circuit's 120s, not the queue's 5400s visibility timeout
+    assert 119 < queue.next_visible_in() <= 120
+
+
+def test_suspended_jobs_come_back_at_once():
+    queue = InMemoryQueue()
+    queue.send(json.dumps(jobs('a')[0]))
+
+    def run_job(job_id, query):
+        raise RetryLater("suspended", delay_seconds=0)
+
+    event = queue.receive_event()
+    queue.complete(event, handle_sqs_batch(event, None, run_job, queue))
+    assert queue.next_visible_in() == 0
+
+
+def test_job_list_schedules_delayed_retries_and_redispatches_the_rest_now():
+    scheduler, lambda_client = RecordingScheduler(), RecordingLambda()
+
+    def run_job(job_id, query):
+        if job_id == 'a':
+            raise RetryLater("throttled")
+
+    result = handle_job_list(jobs('a', 'b', 'c'), FakeLambdaContext(timeout_ms=1000), run_job, lambda_client,
+                             scheduler, concurrency=1, min_remaining_ms=5000)
+    assert result == {'completed': 0, 'deferred': 3, 'failed': 0}
+    assert scheduler.scheduled == [([{'jobId': 'a', 'query': 'query a', 'deliveries': 2}], 30)]
+    assert lambda_client.invoked == [[{'jobId': 'b', 'query': 'query b', 'deliveries': 2},
+                                      {'jobId': 'c', 'query': 'query c', 'deliveries': 2}]]
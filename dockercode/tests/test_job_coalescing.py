@@ -0,0 +1,63 @@
+# tests/test_job_coalescing.py
+from stubs import InMemoryTable
+
+from job_coalescing import coalesce_key, settle_followers, try_follow, try_lead
+
+
+def new_table(*job_ids):
+    table = InMemoryTable()
+    for job_id in job_ids:
+        table.items[job_id] = {'jobId': job_id, 'status': 'PENDING', 'query': 'q', 'version': 1}
+    return table
+
+
+def test_identical_queries_share_a_key_per_scope():
+    assert coalesce_key('standard', 'What is  DNS?') == coalesce_key('standard', 'what is dns?')
+    assert coalesce_key('standard', 'what is dns?') != coalesce_key('interleaved', 'what is dns?')
+
+
+def test_followers_join_the_running_leader():
+    table = new_table('leader', 'follower')
+    key = coalesce_key('standard', 'q')
+    assert try_lead(table, key, 'leader')
+    assert not try_lead(table, key, 'follower')
+    assert try_follow(table, key, 'follower') == 'leader'
+
+
+def test_followers_get_the_leaders_result_and_pointer():
+    table = new_table('leader', 'f1', 'f2')
+    key = coalesce_key('standard', 'q')
+    try_lead(table, key, 'leader')
+    try_follow(table, key, 'f1')
+    try_follow(table, key, 'f2')
+    pointer = {'resultRef': {'backend': 'dynamodb', 'key': 'leader#result', 'parts': 1},
+               'resultSize': 6, 'resultSha256': 'abc'}
+
+    assert settle_followers(table, key, 'leader', result='answer', pointer=pointer) == ['f1', 'f2']
+    for follower in ('f1', 'f2'):
+        item = table.items[follower]
+        assert item['status'] == 'COMPLETE'
+        assert item['resultRef'] == pointer['resultRef']
+        assert 'expiresAt' in item
+
+
+def test_followers_fail_with_the_leader():
+    table = new_table('leader', 'f1')
+    key = coalesce_key('standard', 'q')
+    try_lead(table, key, 'leader')
+    try_follow(table, key, 'f1')
+    settle_followers(table, key, 'leader', error='model unavailable')
+    assert table.items['f1']['status'] == 'FAILED'
+    assert 'leader' in table.items['f1']['result']
+
+
+def test_settling_closes_the_key_once():
+    table = new_table('leader', 'f1', 'late')
+    key = coalesce_key('standard', 'q')
+    try_lead(table, key, 'leader')
+    try_follow(table, key, 'f1')
+    settle_followers(table, key, 'leader', result='answer')
+    # A second settlement (e.g. a redelivery) settles no one, and nobody joins a finished run
+    assert settle_followers(table, key, 'leader', result='answer') == []
+    assert try_follow(table, key, 'late') is None
+    assert try_lead(table, key, 'late')
@@ -0,0 +1,44 @@
+import time
+
+from stubs import InMemoryTable
+
+import job_lifecycle
+from job_lifecycle import build_archive, compact
+from job_store import claim_job, complete_job
+
+
+class FlakyArchive:
+    """Fails to store the archives of the jobs in `broken`."""
+
+    def __init__(self, archive, broken):
+        self.archive = archive
+        self.broken = set(broken)
+
+    def put(self, key, data, expires_at=None):
+        if key.split('#')[0] in self.broken:
+            raise OSError('archive unavailable')
+        return self.archive.put(key, data, expires_at=expires_at)
+
+
+def finished_jobs(table, count):
+    for i in range(count):
+        job_id = f"job-{i:02d}"
+        table.items[job_id] = {'jobId': job_id, 'status': 'PENDING', 'query': f"query {i}", 'version': 1}
+        claim_job(table, job_id)
+        complete_job(table, job_id, 'answer ' * 50)
+        # Oldest first on the archive index
+        table.items[job_id]['finishedAt'] = int(time.time()) - 100 + i
+
+
+def test_failures_are_passed_over_not_the_rest_of_the_day(monkeypatch):
+    monkeypatch.setattr(job_lifecycle, 'ARCHIVE_BATCH_SIZE', 3)
+    table = InMemoryTable()
+    finished_jobs(table, 10)
+    # More failures than a page holds, at the head of the day
+    broken = ['job-00', 'job-01', 'job-02', 'job-03']
+    stats = compact(table, FlakyArchive(build_archive(table), broken),
+                    now=time.time() + job_lifecycle.JOB_ARCHIVE_AFTER_DAYS * 86400 + 60)
+    assert stats['archived'] == 6
+    assert stats['failed'] == 4 and stats['failedJobs'] == broken
+    assert stats['complete']
+    assert all('archivedAt' in table.items[f"job-{i:02d}"] for i in range(4, 10))
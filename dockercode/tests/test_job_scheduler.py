@@ -0,0 +1,71 @@
+# tests/test_job_scheduler.py
+import pytest
+from stubs import InMemoryTable
+
+import job_scheduler
+from job_scheduler import ANONYMOUS_USER, Submission, admit, enqueue, release, user_id
+
+
+@pytest.fixture
+def table(monkeypatch):
+    monkeypatch.setattr(job_scheduler, 'WORKLOAD_CAPS', {'standard': 4})
+    monkeypatch.setattr(job_scheduler, 'PRIORITY_SHARES', {'interactive': 1.0, 'standard': 1.0, 'batch': 0.5})
+    monkeypatch.setattr(job_scheduler, 'USER_MAX_RUNNING', 2)
+    return InMemoryTable()
+
+
+def submit(table, user, count, priority='interactive', prefix=None):
+    prefix = prefix or user
+    jobs = [{'jobId': f"{prefix}-{i}", 'query': 'q'} for i in range(count)]
+    for job in jobs:
+        table.items[job['jobId']] = {'jobId': job['jobId'], 'status': 'PENDING', 'query': 'q', 'version': 1}
+    return enqueue(table, jobs, Submission('standard', user, priority))
+
+
+def admitted_ids(entries):
+    return sorted(entry['jobId'] for entry in entries)
+
+
+def test_admitted_jobs_leave_the_queue_as_pending(table):
+    entries = submit(table, 'alice', 1)
+    assert admitted_ids(admit(table, 'standard', entries)) == ['alice-0']
+    item = table.items['alice-0']
+    assert item['status'] == 'PENDING'
+    assert 'schedQueue' not in item and 'dispatchedAtMs' in item
+
+
+def test_users_are_held_to_their_quota_and_take_turns(table):
+    submit(table, 'alice', 5)
+    submit(table, 'bob', 5)
+    admitted = admit(table, 'standard')
+    assert admitted_ids(admitted) == ['alice-0', 'alice-1', 'bob-0', 'bob-1']
+    # The workload is full: nothing else starts until a slot is released
+    assert admit(table, 'standard') == []
+    release(table, 'standard', ['bob-0'])
+    assert admitted_ids(admit(table, 'standard')) == ['bob-2']
+
+
+def test_lower_classes_keep_room_for_higher_ones(table):
+    submit(table, 'alice', 3, priority='batch')
+    submit(table, 'bob', 3, priority='batch')
+    # Batch may fill half of the cap of 4
+    assert len(admit(table, 'standard')) == 2
+    submit(table, 'carol', 1, priority='interactive')
+    assert admitted_ids(admit(table, 'standard')) == ['carol-0']
+
+
+def test_jobs_behind_a_page_of_blocked_ones_are_admitted(table):
+    # alice fills her quota; the rest of her interactive jobs fill more than a page ahead of bob's
+    submit(table, 'alice', 12)
+    assert len(admit(table, 'standard', limit=5)) == 2
+    submit(table, 'bob', 1, priority='standard')
+    assert admitted_ids(admit(table, 'standard', limit=5)) == ['bob-0']
+
+
+def test_callers_without_a_principal_are_not_held_to_one_quota(table):
+    # Behind the proxy everyone has its IP; that must not become one shared quota of 2
+    proxied = {'requestContext': {'http': {'sourceIp': '10.0.0.1'}}}
+    assert user_id(proxied) == ANONYMOUS_USER
+    assert user_id({'requestContext': {'authorizer': {'jwt': {'claims': {'sub': 'alice'}}}}}) == 'sub:alice'
+    submit(table, user_id(proxied), 4)
+    assert len(admit(table, 'standard')) == 4
@@ -0,0 +1,117 @@
+# tests/test_job_store.py
+import time
+
+from stubs import InMemoryTable
+
+from job_store import claim_job, complete_job, reclaim_expired, retry_job, suspend_job
+from job_submission import redeliver_expired
+
+
+def new_table(status='PENDING', **fields):
+    table = InMemoryTable()
+    table.items['job-1'] = {'jobId': 'job-1', 'status': status, 'query': 'q', 'version': 1, **fields}
+    return table
+
+
+def test_claim_moves_a_pending_job_to_running_under_a_lease():
+    table = new_table()
+    claimed = claim_job(table, 'job-1', worker_id='worker-a', lease_seconds=60)
+    assert claimed['status'] == 'RUNNING'
+    assert claimed['leaseOwner'] == 'worker-a'
+    assert claimed['leaseExpiresAt'] > time.time()
+    assert claimed['version'] == 2
+
+
+def test_only_one_delivery_claims_a_job():
+    table = new_table()
+    assert claim_job(table, 'job-1', worker_id='worker-a') is not None
+    assert claim_job(table, 'job-1', worker_id='worker-b') is None
+    assert table.items['job-1']['leaseOwner'] == 'worker-a'
+
+
+def test_a_retrying_job_can_be_claimed_again():
+    table = new_table(status='RETRYING')
+    assert claim_job(table, 'job-1', worker_id='worker-b')['status'] == 'RUNNING'
+
+
+def test_an_expired_lease_can_be_taken_over():
+    table = new_table(status='RUNNING', leaseOwner='worker-a', leaseExpiresAt=int(time.time()) - 1)
+    assert claim_job(table, 'job-1', worker_id='worker-b')['leaseOwner'] == 'worker-b'
+
+
+def test_finished_jobs_are_not_claimed():
+    for status in ('COMPLETE', 'FAILED', 'QUEUED'):
+        assert claim_job(new_table(status=status), 'job-1') is None, status
+
+
+def test_retry_counts_attempts_then_fails_the_job():
+    table = new_table()
+    claim_job(table, 'job-1')
+    assert retry_job(table, 'job-1', 'throttled', max_attempts=2)
+    assert table.items['job-1']['status'] == 'RETRYING'
+    claim_job(table, 'job-1')
+    assert not retry_job(table, 'job-1', 'throttled', max_attempts=2)
+    item = table.items['job-1']
+    assert item['status'] == 'FAILED'
+    assert 'gave up after 2 attempts' in item['result']
+
+
+def test_suspend_hands_the_job_back_without_spending_an_attempt():
+    table = new_table()
+    claim_job(table, 'job-1', worker_id='worker-a')
+    assert suspend_job(table, 'job-1', max_suspensions=3)
+    item = table.items['job-1']
+    assert item['status'] == 'RETRYING'
+    assert 'attempts' not in item and 'leaseOwner' not in item
+    # The next delivery claims it straight away, with no lease to wait out
+    assert claim_job(table, 'job-1', worker_id='worker-b')['leaseOwner'] == 'worker-b'
+
+
+def test_too_many_suspensions_fail_the_job():
+    table = new_table()
+    for _ in range(2):
+        claim_job(table, 'job-1')
+        suspended = suspend_job(table, 'job-1', max_suspensions=2)
+    assert not suspended
+    assert table.items['job-1']['status'] == 'FAILED'
+    assert 'within 2 invocations' in table.items['job-1']['result']
+
+
+class RecordingDispatcher:
+    def __init__(self):
+        self.dispatched = []
+
+    def dispatch(self, jobs):
+        self.dispatched += jobs
+        return {}
+
+
+def test_jobs_whose_lease_ran_out_are_delivered_again():
+    table = new_table()
+    table.items['job-2'] = {'jobId': 'job-2', 'status': 'PENDING', 'query': 'q2', 'version': 1}
+    # The invocation running job-1 was killed, and Lambda's retries came while its lease held
+    claim_job(table, 'job-1', worker_id='worker-a', lease_seconds=-1)
+    claim_job(table, 'job-2', worker_id='worker-a', lease_seconds=600)
+    dispatcher = RecordingDispatcher()
+    assert redeliver_expired(table, dispatcher, max_attempts=3) == 1
+    assert dispatcher.dispatched == [{'jobId': 'job-1', 'query': 'q'}]
+    assert table.items['job-1']['status'] == 'RETRYING'
+    assert table.items['job-2']['status'] == 'RUNNING'
+    # Reclaimed once: the next pump finds nothing, and the redelivery claims the job
+    assert redeliver_expired(table, dispatcher, max_attempts=3) == 0
+    assert claim_job(table, 'job-1', worker_id='worker-b')['leaseOwner'] == 'worker-b'
+
+
+def test_finished_jobs_leave_the_lease_index():
+    table = new_table()
+    claim_job(table, 'job-1', lease_seconds=60, queue='worker')
+    complete_job(table, 'job-1', 'answer')
+    assert reclaim_expired(table, max_attempts=3, queue='worker', now=time.time() + 120) == []
+
+
+def test_a_job_that_keeps_dying_fails():
+    table = new_table(attempts=2)
+    claim_job(table, 'job-1', lease_seconds=60, queue='worker')
+    reclaimed = reclaim_expired(table, max_attempts=3, queue='worker', now=time.time() + 120)
+    assert 'gave up after 3 attempts' in reclaimed[0]['error']
+    assert table.items['job-1']['status'] == 'FAILED'
@@ -0,0 +1,76 @@
+# tests/test_list_jobs.py
+import base64
+import importlib
+import json
+import sys
+import types
+
+import pytest
+from stubs import InMemoryDynamoDB
+
+
+@pytest.fixture
+def list_jobs(monkeypatch):
+    """list_jobs_lambda on an in-memory job table holding 5 of alice's jobs and 1 of bob's."""
+    dynamodb = InMemoryDynamoDB()
+    monkeypatch.setenv('TABLE_NAME', 'jobs')
+    monkeypatch.setitem(sys.modules, 'boto3', types.SimpleNamespace(resource=lambda name: dynamodb))
+    monkeypatch.delitem(sys.modules, 'list_jobs_lambda', raising=False)
+    module = importlib.import_module('list_jobs_lambda')
+    for i in range(5):
+        module.table.items[f"a{i}"] = {'jobId': f"a{i}", 'userId': 'sub:alice', 'createdAtMs': 1000 + i,
+                                       'status': 'COMPLETE', 'version': 1}
+    module.table.items['b0'] = {'jobId': 'b0', 'userId': 'sub:bob', 'createdAtMs': 1000, 'status': 'COMPLETE',
+                                'version': 1}
+    return module
+
+
+def request(module, user='alice', **params):
+    event = {'requestContext': {'authorizer': {'claims': {'sub': user}}},
+             'queryStringParameters': {k: str(v) for k, v in params.items()}}
+    response = module.lambda_handler(event, None)
+    return response['statusCode'], json.loads(response['body'])
+
+
+def token(key):
+    return base64.urlsafe_b64encode(json.dumps(key).encode('utf-8')).decode('ascii')
+
+
+def test_pages_cover_the_callers_jobs_newest_first(list_jobs):
+    seen, params = [], {'limit': 2}
+    while True:
+        status, body = request(list_jobs, **params)
+        assert status == 200
+        seen += [job['jobId'] for job in body['jobs']]
+        if 'nextToken' not in body:
+            break
+        params = {'limit': 2, 'nextToken': body['nextToken']}
+    assert seen == ['a4', 'a3', 'a2', 'a1', 'a0']
+
+
+def test_a_token_only_pages_its_owners_jobs(list_jobs):
+    _, body = request(list_jobs, limit=2)
+    status, body = request(list_jobs, user='bob', nextToken=body['nextToken'])
+    assert status == 400
+    assert body == {'error': 'Invalid nextToken.'}
+
+
+@pytest.mark.parametrize('bad', [
+    'not-base64!',
+    token(['a1']),
+    token({'jobId': 'a1', 'userId': 'sub:alice'}),
+    token({'jobId': 'a1', 'userId': 'sub:alice', 'createdAtMs': 1001, 'status': 'COMPLETE'}),
+])
+def test_malformed_tokens_are_rejected(list_jobs, bad):
+    assert request(list_jobs, nextToken=bad)[0] == 400
+
+
+@pytest.mark.parametrize('limit', ['0', '-1', 'ten', '101'])
+def test_limit_is_validated(list_jobs, limit):
+    assert request(list_jobs, limit=limit)[0] == 400
+
+
+def test_a_source_ip_is_not_an_identity(list_jobs):
+    event = {'requestContext': {'http': {'sourceIp': '10.0.0.1'}}, 'queryStringParameters': None}
+    response = list_jobs.lambda_handler(event, None)
+    assert response['statusCode'] == 401
@@ -0,0 +1,96 @@
+import pytest
+
+from model_calls import (CircuitOpenError, ModelCallLayer, ModelUnavailableError, call_agent, is_retryable,
+                         model_layer)
+
+
+class EventLoopException(Exception):
+    """Wraps a model error the way strands' event loop does."""
+
+    def __init__(self, original_exception):
+        super().__init__(str(original_exception))
+        self.original_exception = original_exception
+
+
+class ThrottlingError(Exception):
+    def __init__(self):
+        super().__init__('Rate exceeded')
+        self.response = {'Error': {'Code': 'ThrottlingException'}}
+
+
+class RaisingAgent:
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.messages = []
+        self.calls = 0
+
+    def __call__(self, prompt, **kwargs):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return 'answer'
+
+
+def layer():
+    return ModelCallLayer(sleep=lambda seconds: None)
+
+
+def test_wrapped_throttling_is_retried():
+    assert is_retryable(EventLoopException(ThrottlingError()))
+    agent = RaisingAgent(EventLoopException(ThrottlingError()))
+    assert layer().call(lambda: agent('query'), max_attempts=2) == 'answer'
+    assert agent.calls == 2
+
+
+def test_wrapped_unavailable_error_is_reraised_unwrapped():
+    circuit_open = CircuitOpenError('circuit open')
+    agent = RaisingAgent(EventLoopException(circuit_open))
+    with pytest.raises(CircuitOpenError) as raised:
+        layer().call(lambda: agent('query'))
+    assert raised.value is circuit_open
+    assert agent.calls == 1
+
+
+def test_orchestrator_throttling_surfaces_as_unavailable():
+    agent = RaisingAgent(EventLoopException(ThrottlingError()))
+    with pytest.raises(ModelUnavailableError):
+        call_agent('orchestrator', agent, 'query', max_attempts=1)
+
+
+def test_other_wrapped_errors_propagate_unchanged():
+    error = EventLoopException(ValueError('bad tool input'))
+    assert not is_retryable(error)
+    with pytest.raises(EventLoopException):
+        layer().call(lambda: RaisingAgent(error)('query'))
+
+
+class Orchestrator:
+    """Calls one tool, then the model again; like strands, a tool's exception becomes an error result."""
+
+    def __init__(self, tool):
+        self.tool = tool
+        self.messages = []
+        self.tool_results = []
+
+    def __call__(self, prompt, **kwargs):
+        try:
+            self.tool_results.append(self.tool(prompt))
+        except Exception as e:
+            self.tool_results.append(f"Error: {e}")
+        try:
+            model_layer.before_request()
+        except Exception as e:
+            raise EventLoopException(e)
+        return 'final answer'
+
+
+def test_unavailable_specialist_behind_a_tool_fails_the_orchestrator():
+    def tool(query):
+        return call_agent('specialist', RaisingAgent(CircuitOpenError('circuit open')), query)
+
+    orchestrator = Orchestrator(tool)
+    with pytest.raises(CircuitOpenError):
+        call_agent('orchestrator', orchestrator, 'query', max_attempts=1)
+    assert orchestrator.tool_results == ['Error: circuit open']
+    # The next orchestrator runs normally
+    assert call_agent('orchestrator', Orchestrator(lambda query: 'result'), 'query', max_attempts=1) == 'final answer'
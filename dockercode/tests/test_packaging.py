@@ -0,0 +1,62 @@
+# tests/test_packaging.py
+import ast
+import os
+import re
+
+DOCKERCODE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PACKAGING_TF = os.path.join(DOCKERCODE_DIR, '..', 'terraform-infra', 'packaging.tf')
+LOCAL_MODULES = {name[:-3] for name in os.listdir(DOCKERCODE_DIR) if name.endswith('.py')}
+
+
+def import_closure(module, seen=None):
+    """module and every dockercode/ module it imports, directly or not."""
+    seen = set() if seen is None else seen
+    if module in seen:
+        return seen
+    seen.add(module)
+    with open(os.path.join(DOCKERCODE_DIR, f"{module}.py")) as f:
+        tree = ast.parse(f.read())
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names = [alias.name.split('.')[0] for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            names = [node.module.split('.')[0]]
+        else:
+            continue
+        for name in names:
+            if name in LOCAL_MODULES:
+                import_closure(name, seen)
+    return seen
+
+
+def packaged_modules():
+    """handler_modules from packaging.tf: zip name -> module names."""
+    with open(PACKAGING_TF) as f:
+        text = f.read()
+    block = text[text.index('handler_modules = {'):]
+    return {name: set(re.findall(r'"(\w+)"', modules))
+            for name, modules in re.findall(r'(\w+) = \[(.*?)\]', block, re.DOTALL)}
+
+
+def test_every_zip_holds_its_handlers_imports():
+    zips = packaged_modules()
+    assert set(zips) == {'start_job', 'start_interleaved_job', 'get_status', 'list_jobs'}
+    for name, modules in zips.items():
+        assert import_closure(f"{name}_lambda") == modules, name
+
+
+def copied_modules(dockerfile):
+    """Modules a Dockerfile in dockercode/ COPYs into its image."""
+    with open(os.path.join(DOCKERCODE_DIR, dockerfile)) as f:
+        return set(re.findall(r'^COPY (\w+)\.py ', f.read(), re.MULTILINE))
+
+
+def test_every_image_holds_its_handlers_imports():
+    images = {
+        'Dockerfile.standard': ['agent_worker_lambda'],
+        'Dockerfile.interleaved': ['interleaved_worker_lambda'],
+        'Dockerfile.stream': ['response_stream', 'lambda_function_standard', 'lambda_function_interleaved'],
+    }
+    for dockerfile, handlers in images.items():
+        needed = set().union(*(import_closure(handler) for handler in handlers))
+        assert needed <= copied_modules(dockerfile), (dockerfile, sorted(needed - copied_modules(dockerfile)))
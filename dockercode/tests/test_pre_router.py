@@ -0,0 +1,15 @@
+from eval_pre_router import DEFAULT_LABELS, MIN_PRECISION, evaluate, load_labels
+
+from pre_router import PRE_ROUTER_THRESHOLD, PreRouter
+
+
+def test_default_routing_keeps_its_precision():
+    summary, misroutes, _ = evaluate(load_labels(DEFAULT_LABELS), PRE_ROUTER_THRESHOLD, orchestrator_ms=0)
+    assert summary['precision'] >= MIN_PRECISION, misroutes
+    assert summary['routed'] > 0
+
+
+def test_a_single_incidental_keyword_is_left_to_the_orchestrator():
+    router = PreRouter(enabled=True)
+    assert not router.route("Write a poem about a phone").routed
+    assert router.route("Recommend a budget smartphone with a good camera").routed
@@ -0,0 +1,57 @@
+# tests/test_progress_stream.py
+from stubs import InMemoryTable
+
+from job_store import claim_job, retry_job
+from progress_stream import ProgressStreamer, chunks_since, make_streamer
+
+
+def new_table():
+    table = InMemoryTable()
+    table.items['job-1'] = {'jobId': 'job-1', 'status': 'PENDING', 'query': 'q', 'version': 1}
+    return table
+
+
+def stream(table, claimed, *texts):
+    streamer = make_streamer(table, 'job-1', claimed)
+    for text in texts:
+        streamer(data=text)
+    streamer.close()
+
+
+def text(chunks):
+    return ''.join(chunk.get('text', '') for chunk in chunks)
+
+
+def test_chunks_are_numbered_from_one():
+    table = new_table()
+    streamer = ProgressStreamer(table, 'job-1', flush_bytes=1)
+    streamer(data='a')
+    streamer(data='b')
+    chunks = chunks_since(table.items['job-1'], 0)
+    assert [chunk['seq'] for chunk in chunks] == [1, 2]
+    assert chunks_since(table.items['job-1'], 1) == [{'type': 'text', 'text': 'b', 'seq': 2}]
+
+
+def test_a_retried_job_replaces_the_earlier_attempts_output():
+    table = new_table()
+    stream(table, claim_job(table, 'job-1'), 'first attempt')
+    first = chunks_since(table.items['job-1'], 0)
+    retry_job(table, 'job-1', RuntimeError('throttled'), max_attempts=3)
+
+    stream(table, claim_job(table, 'job-1'), 'second attempt')
+    item = table.items['job-1']
+    assert text(item['chunks']) == 'second attempt'
+    # A client that saw the first attempt gets the reset first, then only the new output
+    since = chunks_since(item, first[-1]['seq'])
+    assert since[0]['type'] == 'reset'
+    assert text(since) == 'second attempt'
+    # Sequence numbers keep counting up across the restart
+    assert since[0]['seq'] == first[-1]['seq'] + 1
+    assert since[-1]['seq'] == item['progressSeq']
+    assert chunks_since(item, item['progressSeq']) == []
+
+
+def test_a_first_attempt_starts_without_a_reset():
+    table = new_table()
+    stream(table, claim_job(table, 'job-1'), 'output')
+    assert [chunk['type'] for chunk in table.items['job-1']['chunks']] == ['text']
@@ -0,0 +1,41 @@
+import time
+
+from stubs import InMemoryTable
+
+from job_store import claim_job
+from job_submission import redeliver_expired
+from result_store import DynamoChunkStore, ResultStore
+from workflow_checkpoint import WorkflowCheckpoint
+
+
+class RecordingDispatcher:
+    def __init__(self):
+        self.dispatched = []
+
+    def dispatch(self, jobs):
+        self.dispatched += jobs
+        return {}
+
+
+def test_a_job_killed_before_it_could_suspend_resumes_from_its_checkpoint():
+    table = InMemoryTable()
+    store = ResultStore(DynamoChunkStore(table))
+    table.items['job-1'] = {'jobId': 'job-1', 'status': 'PENDING', 'query': 'Report on tidal energy', 'version': 1}
+
+    # The first run records two hops, then its invocation is killed: no suspend_job, no outcome
+    claimed = claim_job(table, 'job-1', worker_id='worker-a', lease_seconds=600)
+    first = WorkflowCheckpoint.load(table, store, 'job-1', claimed)
+    first.record('researcher', 'k1', 'tides', 'tidal research')
+    first.record('data_analyst', 'k2', 'tidal research', 'analysis')
+    # Lambda's retry comes while the lease holds and is dropped
+    assert claim_job(table, 'job-1', worker_id='worker-b') is None
+    # Then the lease runs out, and the scheduler pump delivers the job again
+    table.items['job-1']['leaseExpiresAt'] = int(time.time()) - 1
+
+    dispatcher = RecordingDispatcher()
+    assert redeliver_expired(table, dispatcher, max_attempts=3) == 1
+    [delivery] = dispatcher.dispatched
+    claimed = claim_job(table, delivery['jobId'], worker_id='worker-c')
+    resumed = WorkflowCheckpoint.load(table, store, 'job-1', claimed)
+    assert [hop['tool'] for hop in resumed.hops] == ['researcher', 'data_analyst']
+    assert resumed.lookup('k1') == 'tidal research'
@@ -0,0 +1,142 @@
+# tool_runtime.py
+import contextvars
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+import startup
+from job_batch import WORKER_CONCURRENCY
+from model_calls import abandoned
+
+# Specialist calls one job may have in flight (an orchestrator turn's fan-out). The pool
+# holds this many threads per concurrently running job; Bedrock throttling is left to
+# the rate limiter in model_calls.
+TOOL_CONCURRENCY = int(os.environ.get('TOOL_CONCURRENCY', '4'))
+TOOL_TIMEOUT_SECONDS = float(os.environ.get('TOOL_TIMEOUT_SECONDS', '180'))
+# Optional per-tool overrides, e.g. '{"report_writer": 300}'
+TOOL_TIMEOUTS = json.loads(os.environ.get('TOOL_TIMEOUTS', '{}'))
+PARALLEL_TOOLS = os.environ.get('PARALLEL_TOOLS', 'true').lower() == 'true'
+
+
+class ToolTimeoutError(Exception):
+    pass
+
+
+class _Submitted:
+    """A call handed to the pool: its future, when a thread picked it up, and its abandon flag."""
+
+    def __init__(self):
+        self.future = None
+        self.started = threading.Event()
+        self.started_at = None
+        self.abandon = threading.Event()
+
+
+class BoundedToolRunner:
+    """
+    Runs specialist calls on a bounded thread pool with a per-tool timeout.
+
+    The pool has max_concurrency threads for each of `jobs` concurrently
+    running jobs. A call's timeout runs from when a thread picks it up, so
+    time spent queued behind other jobs' calls doesn't count against it. A
+    call that times out is abandoned, not killed: its thread is told to make
+    no further model attempts (see model_calls.abandoned) and frees its slot
+    once the attempt in progress returns.
+    """
+
+    def __init__(self, max_concurrency=TOOL_CONCURRENCY, default_timeout=TOOL_TIMEOUT_SECONDS, timeouts=None,
+                 jobs=WORKER_CONCURRENCY):
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency * max(1, jobs), thread_name_prefix='tool')
+        self.default_timeout = default_timeout
+        self.timeouts = dict(timeouts or {})
+
+    def timeout_for(self, name):
+        return float(self.timeouts.get(name, self.default_timeout))
+
+    def submit(self, fn, *args, **kwargs):
+        """Queues fn on the pool. Returns a _Submitted for wait()."""
+        submitted = _Submitted()
+        # Carry context variables (per-job state) over to the worker thread
+        ctx = contextvars.copy_context()
+
+        def run():
+            submitted.started_at = time.monotonic()
+            submitted.started.set()
+            abandoned.set(submitted.abandon)
+            return fn(*args, **kwargs)
+
+        submitted.future = self._executor.submit(ctx.run, run)
+        return submitted
+
+    def wait(self, name, submitted):
+        """fn's result, or ToolTimeoutError once it has run for longer than the tool's timeout."""
+        timeout = self.timeout_for(name)
+        future = submitted.future
+        # Queued: no clock yet (the invocation's own deadline still bounds the wait)
+        while not submitted.started.wait(timeout=1.0):
+            if future.done():
+                break
+        remaining = timeout
+        if submitted.started_at is not None:
+            remaining = max(timeout - (time.monotonic() - submitted.started_at), 0)
+        try:
+            return future.result(timeout=remaining)
+        except FutureTimeout:
+            submitted.abandon.set()
+            raise ToolTimeoutError(f"{name} timed out after {timeout:g}s")
+
+    def call(self, name, fn, *args, **kwargs):
+        """Runs fn in the pool and waits for it, raising ToolTimeoutError past the tool's timeout."""
+        return self.wait(name, self.submit(fn, *args, **kwargs))
+
+    def run_all(self, calls):
+        """
+        Fans out (name, fn, args) tuples and returns results in input order.
+        Failures come back as the exception instance instead of raising.
+        """
+        submitted = [(name, self.submit(fn, *args)) for name, fn, args in calls]
+        results = []
+        for name, call in submitted:
+            try:
+                results.append(self.wait(name, call))
+            except Exception as e:
+                results.append(e)
+        return results
+
+
+def make_tool_executor():
+    """
+    Returns a strands tool executor that runs all tool calls from one model turn
+    concurrently and hands the results back in the order the model asked for them.
+    Returns None when parallel tools are disabled or strands has no executor API.
+    """
+    if not PARALLEL_TOOLS:
+        return None
+    try:
+        from strands.tools.executors import ConcurrentToolExecutor
+    except ImportError:
+        return None
+
+    class OrderedConcurrentToolExecutor(ConcurrentToolExecutor):
+        async def _execute(self, agent, tool_uses, tool_results, *args, **kwargs):
+            async for event in super()._execute(agent, tool_uses, tool_results, *args, **kwargs):
+                yield event
+            # Results arrive in completion order; put them back in request order
+            order = {tool_use['toolUseId']: i for i, tool_use in enumerate(tool_uses)}
+            tool_results.sort(key=lambda result: order.get(result.get('toolUseId'), len(order)))
+
+    return OrderedConcurrentToolExecutor()
+
+
+# Shared per container
+tool_runner = BoundedToolRunner(timeouts=TOOL_TIMEOUTS)
+# Built on first use: it subclasses a strands class, so building it imports strands
+tool_executor = startup.Lazy('tool_executor', make_tool_executor)
+
+
+def orchestrator_kwargs():
+    """Extra Agent kwargs for orchestrators that should fan out tool calls."""
+    executor = tool_executor.get()
+    return {'tool_executor': executor} if executor is not None else {}
@@ -0,0 +1,299 @@
+# tracing.py
+# Per-job spans for orchestrator, tool and model calls: timings, token counts,
+# model ids, cache hits and retries. A finished trace is logged as JSON and
+# summarized onto the job item (see job_store.complete_job).
+import asyncio
+import contextvars
+import functools
+import json
+import os
+import resource
+import threading
+import time
+from contextlib import contextmanager
+
+TRACE_ENABLED = os.environ.get('TRACE_ENABLED', 'true').lower() == 'true'
+# One JSON log line per finished span, in addition to the per-trace summary line
+TRACE_LOG_SPANS = os.environ.get('TRACE_LOG_SPANS', 'true').lower() == 'true'
+# Opt-in: log a folded-stack (flame graph) breakdown of each trace
+TRACE_PROFILE = os.environ.get('TRACE_PROFILE', 'false').lower() == 'true'
+# Where the folded stacks are also written, one file per trace (unset: logs only)
+TRACE_PROFILE_DIR = os.environ.get('TRACE_PROFILE_DIR')
+# Spans kept in the summary stored on the job item (the slowest ones win)
+TRACE_MAX_SUMMARY_SPANS = int(os.environ.get('TRACE_MAX_SUMMARY_SPANS', '40'))
+
+# Attributes that are summed into the trace totals
+_COUNTERS = ('inputTokens', 'outputTokens', 'modelCalls', 'retries',
+             'contextTokens', 'contextTokensSaved', 'artifacts', 'hopsReplayed', 'escalations')
+
+_current = contextvars.ContextVar('trace_span', default=None)
+_active_lock = threading.Lock()
+_active = {}
+
+
+def _now_ms():
+    return time.perf_counter() * 1000
+
+
+class Span:
+    def __init__(self, trace, name, kind, parent, attrs):
+        self.trace = trace
+        self.name = name
+        self.kind = kind
+        self.parent = parent
+        self.attrs = {k: v for k, v in attrs.items() if v is not None}
+        self.start_ms = _now_ms()
+        self.end_ms = None
+
+    @property
+    def duration_ms(self):
+        end = self.end_ms if self.end_ms is not None else _now_ms()
+        return end - self.start_ms
+
+    def set(self, **attrs):
+        with self.trace.lock:
+            self.attrs.update((k, v) for k, v in attrs.items() if v is not None)
+
+    def add(self, name, amount=1):
+        with self.trace.lock:
+            self.attrs[name] = self.attrs.get(name, 0) + amount
+
+    def path(self):
+        names, span = [], self
+        while span is not None:
+            names.append(f"{span.kind}:{span.name}" if span.kind != 'job' else span.name)
+            span = span.parent
+        return list(reversed(names))
+
+    def as_record(self):
+        record = {
+            'name': self.name,
+            'kind': self.kind,
+            'parent': self.parent.name if self.parent is not None else None,
+            'startMs': int(self.start_ms - self.trace.root.start_ms),
+            'ms': int(self.duration_ms),
+        }
+        record.update(self.attrs)
+        return record
+
+
+class Trace:
+    """All spans of one job (or one synchronous request)."""
+
+    def __init__(self, trace_id):
+        self.trace_id = trace_id
+        self.lock = threading.Lock()
+        self.spans = []
+        self.open = []
+        self.root = None
+
+    def start_span(self, name, kind, parent, attrs):
+        span = Span(self, name, kind, parent, attrs)
+        with self.lock:
+            if self.root is None:
+                self.root = span
+            self.spans.append(span)
+            self.open.append(span)
+        return span
+
+    def end_span(self, span):
+        span.end_ms = _now_ms()
+        with self.lock:
+            if span in self.open:
+                self.open.remove(span)
+        if TRACE_LOG_SPANS:
+            print(json.dumps({'event': 'span', 'traceId': self.trace_id, **span.as_record()}, default=str))
+
+    def innermost_open(self):
+        with self.lock:
+            return self.open[-1] if self.open else None
+
+    def summary(self):
+        """Compact, DynamoDB-safe (ints and strings only) view of the trace."""
+        totals = dict.fromkeys(_COUNTERS, 0)
+        cache = {'hit': 0, 'miss': 0}
+        with self.lock:
+            spans = list(self.spans)
+        for span in spans:
+            for name in _COUNTERS:
+                totals[name] += int(span.attrs.get(name, 0))
+            if span.attrs.get('cache') in cache:
+                cache[span.attrs['cache']] += 1
+        slowest = sorted(spans[1:], key=lambda s: s.duration_ms, reverse=True)[:TRACE_MAX_SUMMARY_SPANS]
+        summary = {
+            'totalMs': int(self.root.duration_ms) if self.root else 0,
+            'spanCount': len(spans),
+            'cacheHits': cache['hit'],
+            'cacheMisses': cache['miss'],
+            # Process-wide peak, for sizing the function's memory
+            'maxRssMb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // 1024,
+            'spans': [span.as_record() for span in sorted(slowest, key=lambda s: s.start_ms)],
+        }
+        summary.update(totals)
+        return summary
+
+    def folded_stacks(self):
+        """Flame-graph input: one 'root;parent;span <self ms>' line per distinct stack."""
+        with self.lock:
+            spans = list(self.spans)
+        child_ms = {}
+        for span in spans:
+            if span.parent is not None:
+                child_ms[id(span.parent)] = child_ms.get(id(span.parent), 0.0) + span.duration_ms
+        folded = {}
+        for span in spans:
+            # Parallel children can add up to more than their parent; clamp at zero
+            self_ms = max(span.duration_ms - child_ms.get(id(span), 0.0), 0.0)
+            stack = ';'.join(span.path())
+            folded[stack] = folded.get(stack, 0.0) + self_ms
+        return [f"{stack} {int(ms)}" for stack, ms in sorted(folded.items())]
+
+
+def current_span():
+    """
+    The innermost span of the calling context. Threads that did not inherit the
+    job's context (e.g. a library's own executor) fall back to the innermost
+    open span of the only job in flight; with several jobs in flight there is
+    no safe guess and None is returned.
+    """
+    span = _current.get()
+    if span is not None:
+        return span
+    with _active_lock:
+        traces = list(_active.values())
+    if len(traces) > 1:
+        context_lost('trace_span', len(traces))
+    return traces[0].innermost_open() if len(traces) == 1 else None
+
+
+def context_lost(name, in_flight):
+    """
+    Logs a thread that did not inherit the job's context variable name while
+    in_flight jobs were running, so there was no telling which one it serves.
+    """
+    print(json.dumps({'event': 'context_lost', 'contextVar': name, 'inFlight': in_flight}))
+
+
+@contextmanager
+def start_trace(trace_id, name='job', **attrs):
+    """Opens the root span of a job. Yields the Trace, or None when tracing is disabled."""
+    if not TRACE_ENABLED:
+        yield None
+        return
+    trace = Trace(trace_id)
+    root = trace.start_span(name, 'job', None, attrs)
+    token = _current.set(root)
+    with _active_lock:
+        _active[trace_id] = trace
+    try:
+        yield trace
+    except Exception as e:
+        root.set(error=str(e)[:200])
+        raise
+    finally:
+        _current.reset(token)
+        with _active_lock:
+            _active.pop(trace_id, None)
+        trace.end_span(root)
+        print(json.dumps({'event': 'trace', 'traceId': trace_id, **trace.summary()}, default=str))
+        if TRACE_PROFILE:
+            dump_profile(trace)
+
+
+@contextmanager
+def span(name, kind='internal', **attrs):
+    """Times a block as a child of the current span. A no-op outside a trace."""
+    parent = current_span()
+    if parent is None:
+        yield None
+        return
+    child = parent.trace.start_span(name, kind, parent, attrs)
+    token = _current.set(child)
+    try:
+        yield child
+    except Exception as e:
+        child.set(error=str(e)[:200])
+        raise
+    finally:
+        _current.reset(token)
+        parent.trace.end_span(child)
+
+
+def annotate(**attrs):
+    """Sets attributes on the current span, if there is one."""
+    current = current_span()
+    if current is not None:
+        current.set(**attrs)
+
+
+def count(name, amount=1):
+    """Adds to a counter attribute (e.g. 'retries') on the current span, if there is one."""
+    current = current_span()
+    if current is not None:
+        current.add(name, amount)
+
+
+def traced(name, kind='tool'):
+    """Decorator form of span(); keeps the signature and docstring, which @tool reads."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name, kind):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def call_agent(name, agent, prompt, **kwargs):
+    """Calls a strands Agent inside an 'agent' span and records its model id and token usage."""
+    config = getattr(getattr(agent, 'model', None), 'config', None) or {}
+    with span(name, 'agent', modelId=config.get('model_id')) as current:
+        result = _invoke(agent, prompt, **kwargs)
+        if current is not None:
+            record_usage(current, result)
+        return result
+
+
+def _invoke(agent, prompt, **kwargs):
+    """
+    agent(prompt), run so that its tools see this thread's context variables
+    (the job's span, workflow context and checkpoint). strands' synchronous call
+    runs its event loop on a thread of its own, which depending on the version
+    starts from an empty context; invoke_async on a loop in this thread keeps
+    the context, and asyncio hands it on to the threads the tools run on.
+    """
+    invoke_async = getattr(agent, 'invoke_async', None)
+    if invoke_async is None:
+        return agent(prompt, **kwargs)
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(invoke_async(prompt, **kwargs))
+    # Called from a coroutine: this thread's loop is busy, so strands needs its own thread
+    return agent(prompt, **kwargs)
+
+
+def record_usage(target, result):
+    """Copies token counts from a strands AgentResult (result.metrics.accumulated_usage)."""
+    usage = getattr(getattr(result, 'metrics', None), 'accumulated_usage', None) or {}
+    target.set(inputTokens=usage.get('inputTokens'), outputTokens=usage.get('outputTokens'))
+
+
+def summarize(trace):
+    """The summary stored on the job item, or None when tracing is disabled."""
+    return trace.summary() if trace is not None else None
+
+
+def request_trace_id(context):
+    """Trace id for synchronous handlers, which have no job id."""
+    request_id = getattr(context, 'aws_request_id', None)
+    return request_id or f"request-{int(time.time() * 1000)}"
+
+
+def dump_profile(trace):
+    folded = trace.folded_stacks()
+    print(json.dumps({'event': 'profile', 'traceId': trace.trace_id, 'folded': folded}))
+    if TRACE_PROFILE_DIR:
+        os.makedirs(TRACE_PROFILE_DIR, exist_ok=True)
+        with open(os.path.join(TRACE_PROFILE_DIR, f"{trace.trace_id}.folded"), 'w') as f:
+            f.write('\n'.join(folded) + '\n')
@@ -0,0 +1,201 @@
+# workflow_checkpoint.py
+# Checkpoints of interleaved workflows, so a job whose invocation timed out or
+# crashed resumes where it stopped instead of re-running its specialists.
+#
+# After every tool hop the worker saves the hops so far (tool, a key of its
+# input, what the orchestrator got back) together with the workflow's stored
+# artifacts (context_store), compressed, through the result store backend
+# ('<jobId>#checkpoint' chunk items by default), and points the job item at
+# it. The next delivery of the job loads the checkpoint: the orchestrator is
+# told which calls already ran and what they returned, and a call it repeats
+# anyway is answered from the checkpoint without a model call.
+#
+# A workflow that is about to run out of invocation time stops starting
+# specialists (they answer that the run is paused) and is handed back as
+# suspended, to resume from its checkpoint in a fresh invocation.
+import contextvars
+import functools
+import hashlib
+import json
+import os
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+
+import tracing
+from context_store import current_context
+from job_lifecycle import checkpoint_expires_at
+from response_cache import normalize_text
+
+CHECKPOINTS_ENABLED = os.environ.get('CHECKPOINTS_ENABLED', 'true').lower() == 'true'
+# No specialist is started with less than this much invocation time left
+CHECKPOINT_RESERVE_SECONDS = float(os.environ.get('CHECKPOINT_RESERVE_SECONDS', '240'))
+# Invocations a workflow may be spread over before its job is failed
+CHECKPOINT_MAX_SUSPENSIONS = int(os.environ.get('CHECKPOINT_MAX_SUSPENSIONS', '5'))
+# Characters of each call's input shown to the orchestrator when it resumes
+CHECKPOINT_INPUT_PREVIEW_CHARS = 300
+
+PAUSED_MESSAGE = ("Not run: this invocation is out of time. The workflow will resume from a checkpoint "
+                  "in a new invocation; reply with just PAUSED.")
+
+_current = contextvars.ContextVar('workflow_checkpoint', default=None)
+_active_lock = threading.Lock()
+_active = []
+_deadline = None
+
+
+def start_invocation(context):
+    """Records when the current Lambda invocation ends (context may be None locally)."""
+    global _deadline
+    remaining = getattr(context, 'get_remaining_time_in_millis', None)
+    _deadline = time.time() + remaining() / 1000.0 if remaining else None
+
+
+def _input_key(tool_name, args, kwargs):
+    text = json.dumps([tool_name, [normalize_text(a) if isinstance(a, str) else a for a in args],
+                       {k: normalize_text(v) if isinstance(v, str) else v for k, v in sorted(kwargs.items())}],
+                      default=str)
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()[:32]
+
+
+class WorkflowCheckpoint:
+    """The completed hops of one job's workflow, saved after each hop."""
+
+    def __init__(self, table, backend, job_id, hops=None, artifacts=None):
+        self.table = table
+        self.backend = backend
+        self.job_id = job_id
+        self.hops = list(hops or [])
+        self.artifacts = dict(artifacts or {})
+        self.resumed_hops = len(self.hops)
+        self.replayed = 0
+        self.suspended = False
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, table, result_store, job_id, item):
+        """The checkpoint the job item points to, or an empty one for a first run."""
+        backend = result_store.backend if result_store is not None else None
+        ref = (item or {}).get('checkpointRef')
+        if not ref or backend is None:
+            return cls(table, backend, job_id)
+        try:
+            state = json.loads(zlib.decompress(backend.get(ref)).decode('utf-8'))
+        except Exception as e:
+            # A damaged checkpoint only costs the work it held
+            print(f"Could not load the checkpoint of job {job_id}, starting over: {e}")
+            return cls(table, backend, job_id)
+        print(f"Job ID {job_id} resuming from a checkpoint with {len(state['hops'])} hop(s)")
+        return cls(table, backend, job_id, state['hops'], state.get('artifacts'))
+
+    def out_of_time(self):
+        return _deadline is not None and time.time() > _deadline - CHECKPOINT_RESERVE_SECONDS
+
+    def lookup(self, key):
+        """What an earlier run of this call returned, or None."""
+        with self._lock:
+            output = next((hop['output'] for hop in self.hops if hop['key'] == key), None)
+            if output is not None:
+                self.replayed += 1
+            return output
+
+    def record(self, tool_name, key, preview, output, artifacts=None):
+        """Adds a hop and saves the checkpoint. Saving is best-effort: the workflow goes on either way."""
+        with self._lock:
+            self.hops.append({'tool': tool_name, 'key': key, 'input': preview, 'output': output})
+            if artifacts is not None:
+                self.artifacts = artifacts
+            state = {'hops': list(self.hops), 'artifacts': dict(self.artifacts)}
+        if self.backend is None:
+            return
+        try:
+            raw = json.dumps(state).encode('utf-8')
+            ref = self.backend.put(f"{self.job_id}#checkpoint", zlib.compress(raw),
+                                   expires_at=checkpoint_expires_at())
+            self.table.update_item(
+                Key={'jobId': self.job_id},
+                UpdateExpression="set checkpointRef = :ref, checkpointHops = :hops, checkpointSize = :size "
+                                 "add #v :one",
+                ExpressionAttributeNames={'#v': 'version'},
+                ExpressionAttributeValues={':ref': ref, ':hops': len(state['hops']), ':size': len(raw), ':one': 1}
+            )
+        except Exception as e:
+            print(f"Could not save the checkpoint of job {self.job_id}: {e}")
+
+    def resume_notes(self):
+        """Prompt section telling a resumed orchestrator what already ran ('' on a first run)."""
+        if not self.hops:
+            return ""
+        lines = ["\nThis task was started earlier and these specialist calls already completed. "
+                 "Do not repeat them; continue from their results:"]
+        for i, hop in enumerate(self.hops, 1):
+            lines.append(f"{i}. {hop['tool']}({hop['input']!r}) returned: {hop['output']}")
+        return '\n'.join(lines)
+
+    def usage(self):
+        return {'resumedHops': self.resumed_hops, 'hopsReplayed': self.replayed, 'checkpointHops': len(self.hops)}
+
+
+def current_checkpoint():
+    """The calling workflow's checkpoint, or the only one in flight when the thread didn't inherit the context."""
+    checkpoint = _current.get()
+    if checkpoint is not None:
+        return checkpoint
+    with _active_lock:
+        active = list(_active)
+    if len(active) > 1:
+        # The hop is neither looked up nor saved; see tracing.call_agent for how tools keep the context
+        tracing.context_lost('workflow_checkpoint', len(active))
+    return active[0] if len(active) == 1 else None
+
+
+@contextmanager
+def resuming(checkpoint, context=None):
+    """
+    Makes checkpoint the one tools record to while the workflow runs, and
+    restores its artifacts into the workflow context so saved handles resolve.
+    """
+    if checkpoint is None or not CHECKPOINTS_ENABLED:
+        yield None
+        return
+    if context is not None and checkpoint.artifacts:
+        context.restore(checkpoint.artifacts)
+    token = _current.set(checkpoint)
+    with _active_lock:
+        _active.append(checkpoint)
+    try:
+        yield checkpoint
+    finally:
+        _current.reset(token)
+        with _active_lock:
+            _active.remove(checkpoint)
+        tracing.annotate(**checkpoint.usage())
+
+
+def checkpointed(fn):
+    """
+    Decorator for specialist tools (outside @compacting, so it sees what the
+    orchestrator passed and got back): answers a call the checkpoint already
+    holds, refuses to start one when the invocation is out of time, and
+    records every completed call. Outside a checkpointed workflow the tool
+    runs unchanged.
+    """
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        checkpoint = current_checkpoint()
+        if checkpoint is None:
+            return fn(*args, **kwargs)
+        key = _input_key(fn.__name__, args, kwargs)
+        saved = checkpoint.lookup(key)
+        if saved is not None:
+            return saved
+        if checkpoint.out_of_time():
+            checkpoint.suspended = True
+            return PAUSED_MESSAGE
+        output = fn(*args, **kwargs)
+        preview = ' '.join(str(a) for a in list(args) + list(kwargs.values()))[:CHECKPOINT_INPUT_PREVIEW_CHARS]
+        context = current_context()
+        checkpoint.record(fn.__name__, key, preview, output, context.snapshot() if context is not None else None)
+        return output
+    return wrapper
@@ -3,6 +3,18 @@ import React, { useState } from 'react';
 
 // NOTE: We need to pass the base URL of our Express BFF server
 const API_BASE_URL = 'http://localhost:3000'; 
+// How long each status request may wait on the server for the job to change
+const LONG_POLL_SECONDS = 20;
+// Floor between status requests, so a server that answers immediately is not hammered
+const MIN_POLL_INTERVAL_MS = 1000;
+// Ceiling for the backoff after errors or answers that carry no change
+const MAX_POLL_INTERVAL_MS = 30000;
+// Consecutive failed requests before the client stops polling
+const MAX_POLL_FAILURES = 5;
+// Client errors that will not go away by asking again; 408 and 429 are retried
+const isRetryableStatus = (status) => status >= 500 || status === 408 || status === 429;
+
+const sleep = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
 
 const AgentInterface = ({ user }) => {
   const [standardResult, setStandardResult] = useState('');
@@ -31,27 +43,60 @@ const AgentInterface = ({ user }) => {
     }
   };
 
-  const pollForResult = (jobId, setStatus, setResult) => {
+  const pollForResult = async (jobId, setStatus, setResult) => {
     setStatus('Job submitted. Your AI agent is thinking...');
-    const intervalId = setInterval(async () => {
+    // Only ask for the progress chunks we have not seen yet
+    let sinceSeq = 0;
+    let sinceVersion = 0;
+    // Long poll: each request waits server-side until the job changes. The wait only grows
+    // when a request comes back with nothing new or fails, and resets once the job moves.
+    let delayMs = MIN_POLL_INTERVAL_MS;
+    let failures = 0;
+    while (true) {
+      const startedAt = Date.now();
+      let changed = false;
       try {
-        const response = await fetch(`${API_BASE_URL}/api/status/${jobId}`, { credentials: 'include' });
-        if (!response.ok) throw new Error(`Server responded with status ${response.status}`);
-        
-        const data = await response.json();
-        if (data.status === 'COMPLETE') {
-          clearInterval(intervalId);
-          setStatus('');
-          setResult(data.result);
-        } else if (data.status === 'FAILED') {
-          clearInterval(intervalId);
-          setStatus(`Job Failed: ${data.result}`);
+        const params = new URLSearchParams({ sinceSeq, sinceVersion, waitSeconds: LONG_POLL_SECONDS, includeResult: true });
+        const response = await fetch(`${API_BASE_URL}/api/status/${jobId}?${params}`, { credentials: 'include' });
+        if (!response.ok && !isRetryableStatus(response.status)) {
+          setStatus(`An error occurred while fetching the result: server responded with status ${response.status}`);
+          return;
+        }
+        failures = response.ok ? 0 : failures + 1;
+        if (response.ok) {
+          const data = await response.json();
+          // A retried job starts its output over; its 'reset' chunk drops what we have shown
+          const chunks = data.chunks || [];
+          const resetAt = chunks.map((c) => c.type).lastIndexOf('reset');
+          const partial = chunks.slice(resetAt + 1).filter((c) => c.type === 'text').map((c) => c.text).join('');
+          if (resetAt >= 0) setResult(partial);
+          else if (partial) setResult((prev) => prev + partial);
+          changed = (data.version ?? sinceVersion) !== sinceVersion;
+          sinceSeq = data.progressSeq ?? sinceSeq;
+          sinceVersion = data.version ?? sinceVersion;
+
+          if (data.status === 'COMPLETE') {
+            setStatus('');
+            setResult(data.result);
+            return;
+          } else if (data.status === 'FAILED') {
+            setStatus(`Job Failed: ${data.result}`);
+            return;
+          }
         }
       } catch (error) {
-        clearInterval(intervalId);
-        setStatus(`An error occurred while fetching the result: ${error.message}`);
+        // Network errors are retried like a 5xx
+        failures += 1;
+        setStatus(`Lost contact with the server, retrying: ${error.message}`);
       }
-    }, 5000);
+      if (failures >= MAX_POLL_FAILURES) {
+        setStatus(`Gave up fetching the result after ${failures} failed requests`);
+        return;
+      }
+      delayMs = changed ? MIN_POLL_INTERVAL_MS : Math.min(delayMs * 2, MAX_POLL_INTERVAL_MS);
+      // A long poll that actually waited needs no extra pause; one that returned early does
+      await sleep(Math.max(0, delayMs - (Date.now() - startedAt)));
+    }
   };
 
   return (
@@ -33,12 +33,30 @@ resource "aws_apigatewayv2_integration" "get_status_integration" {
   payload_format_version = "2.0"
 }
 
+# Validates the Cognito access token the Express proxy forwards as "Authorization: Bearer ...".
+# Routes that use it hand the caller's claims to the Lambda (requestContext.authorizer.jwt),
+# which is how jobs get an owner and how /jobs knows whose jobs to list.
+resource "aws_apigatewayv2_authorizer" "cognito_jwt" {
+  api_id           = aws_apigatewayv2_api.agent_http_api.id
+  authorizer_type  = "JWT"
+  identity_sources = ["$request.header.Authorization"]
+  name             = "cognito-jwt"
+
+  jwt_configuration {
+    audience = [aws_cognito_user_pool_client.express_app_client.id]
+    issuer   = "https://${aws_cognito_user_pool.agent_user_pool.endpoint}"
+  }
+}
+
 # --- Routes ---
 
 resource "aws_apigatewayv2_route" "start_job_route" {
   api_id    = aws_apigatewayv2_api.agent_http_api.id
   route_key = "POST /standard-agent"
   target    = "integrations/${aws_apigatewayv2_integration.start_job_integration.id}"
+
+  authorization_type = "JWT"
+  authorizer_id      = aws_apigatewayv2_authorizer.cognito_jwt.id
 }
 
 resource "aws_apigatewayv2_route" "get_status_route" {
@@ -75,6 +93,9 @@ resource "aws_apigatewayv2_route" "start_interleaved_job_route" {
   api_id    = aws_apigatewayv2_api.agent_http_api.id
   route_key = "POST /interleaved-agent"
   target    = "integrations/${aws_apigatewayv2_integration.start_interleaved_job_integration.id}"
+
+  authorization_type = "JWT"
+  authorizer_id      = aws_apigatewayv2_authorizer.cognito_jwt.id
 }
 
 resource "aws_lambda_permission" "start_interleaved_job_permission" {
@@ -83,4 +104,28 @@ resource "aws_lambda_permission" "start_interleaved_job_permission" {
   function_name = aws_lambda_function.start_interleaved_job.function_name
   principal     = "apigateway.amazonaws.com"
   source_arn    = "${aws_apigatewayv2_api.agent_http_api.execution_arn}/*/*"
-}
\ No newline at end of file
+}
+
+resource "aws_apigatewayv2_integration" "list_jobs_integration" {
+  api_id             = aws_apigatewayv2_api.agent_http_api.id
+  integration_type   = "AWS_PROXY"
+  integration_uri    = aws_lambda_function.list_jobs.invoke_arn
+  payload_format_version = "2.0"
+}
+
+resource "aws_apigatewayv2_route" "list_jobs_route" {
+  api_id    = aws_apigatewayv2_api.agent_http_api.id
+  route_key = "GET /jobs"
+  target    = "integrations/${aws_apigatewayv2_integration.list_jobs_integration.id}"
+
+  authorization_type = "JWT"
+  authorizer_id      = aws_apigatewayv2_authorizer.cognito_jwt.id
+}
+
+resource "aws_lambda_permission" "list_jobs_permission" {
+  statement_id  = "AllowAPIGatewayToInvokeListJobs"
+  action        = "lambda:InvokeFunction"
+  function_name = aws_lambda_function.list_jobs.function_name
+  principal     = "apigateway.amazonaws.com"
+  source_arn    = "${aws_apigatewayv2_api.agent_http_api.execution_arn}/*/*"
+}
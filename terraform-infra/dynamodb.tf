@@ -9,6 +9,86 @@ resource "aws_dynamodb_table" "job_results_table" {
     name = "jobId"
     type = "S"
   }
+
+  attribute {
+    name = "schedQueue"
+    type = "S"
+  }
+
+  attribute {
+    name = "schedRank"
+    type = "S"
+  }
+
+  # Sparse index of QUEUED jobs per workload, in admission order (see job_scheduler.py)
+  global_secondary_index {
+    name            = "scheduler-queue-index"
+    hash_key        = "schedQueue"
+    range_key       = "schedRank"
+    projection_type = "ALL"
+  }
+
+  attribute {
+    name = "userId"
+    type = "S"
+  }
+
+  attribute {
+    name = "createdAtMs"
+    type = "N"
+  }
+
+  attribute {
+    name = "archiveDay"
+    type = "S"
+  }
+
+  attribute {
+    name = "finishedAt"
+    type = "N"
+  }
+
+  # Each user's jobs, newest first, with just the fields list_jobs_lambda returns
+  global_secondary_index {
+    name               = "user-jobs-index"
+    hash_key           = "userId"
+    range_key          = "createdAtMs"
+    projection_type    = "INCLUDE"
+    non_key_attributes = ["status", "version", "queryPreview", "queryFingerprint", "workload", "priority",
+                          "finishedAt", "resultSize", "waitMs", "archivedAt"]
+  }
+
+  # Sparse index of finished jobs not yet archived, per day (see job_lifecycle.py)
+  global_secondary_index {
+    name            = "archive-queue-index"
+    hash_key        = "archiveDay"
+    range_key       = "finishedAt"
+    projection_type = "KEYS_ONLY"
+  }
+
+  attribute {
+    name = "leaseQueue"
+    type = "S"
+  }
+
+  attribute {
+    name = "leaseExpiresAt"
+    type = "N"
+  }
+
+  # Sparse index of RUNNING jobs per worker function, oldest lease first (see job_store.reclaim_expired)
+  global_secondary_index {
+    name            = "lease-expiry-index"
+    hash_key        = "leaseQueue"
+    range_key       = "leaseExpiresAt"
+    projection_type = "KEYS_ONLY"
+  }
+
+  # Expires finished jobs, response-cache entries and anything else that sets expiresAt
+  ttl {
+    attribute_name = "expiresAt"
+    enabled        = true
+  }
 }
 
 # Add this block to your dynamodb.tf file, or a new .tf file
@@ -6,4 +6,7 @@ resource "aws_ecr_repository" "standard_agent_worker_repo" {
 
 resource "aws_ecr_repository" "interleaved_agent_worker_repo" {
   name = "interleaved-agent-worker"
-}
\ No newline at end of file
+}
+resource "aws_ecr_repository" "agent_stream_repo" {
+  name = "agent-stream"
+}
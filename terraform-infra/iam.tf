@@ -17,7 +17,7 @@ resource "aws_iam_role" "agent_orchestrator_role" {
 
 resource "aws_iam_policy" "agent_permissions_policy" {
   name        = "${var.project_name}AgentPermissionsPolicy"
-  description = "Policy with permissions for Lambda, Bedrock, and DynamoDB."
+  description = "Policy with permissions for Lambda, Bedrock, DynamoDB, and SQS."
 
   policy = jsonencode({
     Version = "2012-10-17",
@@ -38,9 +38,43 @@ resource "aws_iam_policy" "agent_permissions_policy" {
         Action   = [
           "dynamodb:GetItem",
           "dynamodb:PutItem",
-          "dynamodb:UpdateItem"
+          "dynamodb:UpdateItem",
+          "dynamodb:DeleteItem",
+          "dynamodb:BatchGetItem",
+          "dynamodb:BatchWriteItem",
+          "dynamodb:Query"
         ],
-        Resource = aws_dynamodb_table.job_results_table.arn
+        Resource = [
+          aws_dynamodb_table.job_results_table.arn,
+          "${aws_dynamodb_table.job_results_table.arn}/index/*"
+        ]
+      },
+      {
+        Sid      = "JobQueueAccess",
+        Effect   = "Allow",
+        Action   = [
+          "sqs:SendMessage",
+          "sqs:ReceiveMessage",
+          "sqs:DeleteMessage",
+          "sqs:ChangeMessageVisibility",
+          "sqs:GetQueueAttributes"
+        ],
+        Resource = [
+          aws_sqs_queue.standard_job_queue.arn,
+          aws_sqs_queue.interleaved_job_queue.arn
+        ]
+      },
+      {
+        Sid      = "JobRetrySchedules",
+        Effect   = "Allow",
+        Action   = ["scheduler:CreateSchedule"],
+        Resource = "arn:aws:scheduler:*:*:schedule/default/job-retry-*"
+      },
+      {
+        Sid      = "PassRetrySchedulerRole",
+        Effect   = "Allow",
+        Action   = ["iam:PassRole"],
+        Resource = aws_iam_role.retry_scheduler_role.arn
       },
       {
         Sid      = "CloudWatchLogsAccess",
@@ -11,8 +11,8 @@ resource "aws_lambda_function" "start_job" {
   runtime       = "python3.12"
   handler       = "start_job_lambda.lambda_handler"
   
-  filename         = "../agent/lambda_functions/start_job.zip" // Assumes source is in the other folder
-  source_code_hash = filebase64sha256("../agent-express-backend/start_job.zip")
+  filename         = data.archive_file.handler["start_job"].output_path
+  source_code_hash = data.archive_file.handler["start_job"].output_base64sha256
 
   environment {
     variables = {
@@ -24,18 +24,19 @@ resource "aws_lambda_function" "start_job" {
 >>>>>>> Stashed changes
 
 resource "aws_lambda_function" "get_status" {
-  filename      = "../agent/lambda_functions/get_status.zip"
+  filename      = data.archive_file.handler["get_status"].output_path
   # Use a unique function name
   function_name = "get_status_lambda-${random_string.suffix.result}"
   role          = aws_iam_role.agent_orchestrator_role.arn
   handler       = "get_status_lambda.lambda_handler"
+  timeout       = 25 // long polls block for up to 20 seconds
 <<<<<<< Updated upstream
   runtime       = "python3.12"
-  source_code_hash = filebase64sha256("../agent/lambda_functions/get_status.zip")
+  source_code_hash = data.archive_file.handler["get_status"].output_base64sha256
 =======
   
-  filename         = "../agent/lambda_functions/get_status.zip"
-  source_code_hash = filebase64sha256("../agent-express-backend/get_status.zip")
+  filename         = data.archive_file.handler["get_status"].output_path
+  source_code_hash = data.archive_file.handler["get_status"].output_base64sha256
 >>>>>>> Stashed changes
 
   environment {
@@ -46,14 +47,30 @@ resource "aws_lambda_function" "get_status" {
   }
 }
 
+resource "aws_lambda_function" "list_jobs" {
+  filename      = data.archive_file.handler["list_jobs"].output_path
+  # Use a unique function name
+  function_name = "list_jobs_lambda-${random_string.suffix.result}"
+  role          = aws_iam_role.agent_orchestrator_role.arn
+  handler       = "list_jobs_lambda.lambda_handler"
+  runtime       = "python3.12"
+  source_code_hash = data.archive_file.handler["list_jobs"].output_base64sha256
+
+  environment {
+    variables = {
+      "TABLE_NAME" = aws_dynamodb_table.job_results_table.name
+    }
+  }
+}
+
 resource "aws_lambda_function" "start_job" {
-  filename      = "../agent/lambda_functions/start_job.zip"
+  filename      = data.archive_file.handler["start_job"].output_path
   # Use a unique function name
   function_name = "start_job_lambda-${random_string.suffix.result}"
   role          = aws_iam_role.agent_orchestrator_role.arn
   handler       = "start_job_lambda.lambda_handler"
   runtime       = "python3.12"
-  source_code_hash = filebase64sha256("../agent/lambda_functions/start_job.zip")
+  source_code_hash = data.archive_file.handler["start_job"].output_base64sha256
   
   environment {
     variables = {
@@ -65,13 +82,13 @@ resource "aws_lambda_function" "start_job" {
 }
 
 resource "aws_lambda_function" "start_interleaved_job" {
-  filename      = "../agent/lambda_functions/start_interleaved_job.zip"
+  filename      = data.archive_file.handler["start_interleaved_job"].output_path
   # Use a unique function name
   function_name = "start_interleaved_job_lambda-${random_string.suffix.result}"
   role          = aws_iam_role.agent_orchestrator_role.arn
   handler       = "start_interleaved_job_lambda.lambda_handler"
   runtime       = "python3.12"
-  source_code_hash = filebase64sha256("../agent/lambda_functions/start_interleaved_job.zip")
+  source_code_hash = data.archive_file.handler["start_interleaved_job"].output_base64sha256
 
   environment {
     variables = {
@@ -92,7 +109,8 @@ resource "aws_lambda_function" "standard_agent_worker" {
 
   environment {
     variables = {
-      TABLE_NAME = aws_dynamodb_table.job_results_table.name
+      TABLE_NAME                   = aws_dynamodb_table.job_results_table.name
+      JOB_RETRY_SCHEDULER_ROLE_ARN = aws_iam_role.retry_scheduler_role.arn
     }
   }
 }
@@ -104,8 +122,8 @@ resource "aws_lambda_function" "start_interleaved_job" {
   runtime       = "python3.12"
   handler       = "start_interleaved_job_lambda.lambda_handler"
   
-  filename         = "../agent/lambda_functions/start_interleaved_job.zip"
-  source_code_hash = filebase64sha256("../agent-express-backend/start_interleaved_job.zip")
+  filename         = data.archive_file.handler["start_interleaved_job"].output_path
+  source_code_hash = data.archive_file.handler["start_interleaved_job"].output_base64sha256
 
   environment {
     variables = {
@@ -127,7 +145,8 @@ resource "aws_lambda_function" "interleaved_agent_worker" {
   environment {
     variables = {
       # Refer to the unique table name directly
-      "TABLE_NAME" = aws_dynamodb_table.job_results_table.name
+      "TABLE_NAME"                   = aws_dynamodb_table.job_results_table.name
+      "JOB_RETRY_SCHEDULER_ROLE_ARN" = aws_iam_role.retry_scheduler_role.arn
     }
   }
 }
@@ -144,7 +163,8 @@ resource "aws_lambda_function" "interleaved_agent_worker" {
   environment {
     variables = {
       # Refer to the unique table name directly
-      "TABLE_NAME" = aws_dynamodb_table.job_results_table.name
+      "TABLE_NAME"                   = aws_dynamodb_table.job_results_table.name
+      "JOB_RETRY_SCHEDULER_ROLE_ARN" = aws_iam_role.retry_scheduler_role.arn
     }
   }
 }
\ No newline at end of file
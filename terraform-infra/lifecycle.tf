@@ -0,0 +1,24 @@
+# lifecycle.tf
+
+# Hourly compaction pass: the standard worker archives jobs that finished more
+# than JOB_ARCHIVE_AFTER_DAYS ago (see job_lifecycle.py). DynamoDB's TTL on
+# expiresAt deletes them later.
+
+resource "aws_cloudwatch_event_rule" "job_compaction" {
+  name                = "agent-job-compaction-${random_string.suffix.result}"
+  schedule_expression = "rate(1 hour)"
+}
+
+resource "aws_cloudwatch_event_target" "job_compaction" {
+  rule  = aws_cloudwatch_event_rule.job_compaction.name
+  arn   = aws_lambda_function.standard_agent_worker.arn
+  input = jsonencode({ jobCompaction = true })
+}
+
+resource "aws_lambda_permission" "job_compaction" {
+  statement_id  = "AllowJobCompaction"
+  action        = "lambda:InvokeFunction"
+  function_name = aws_lambda_function.standard_agent_worker.function_name
+  principal     = "events.amazonaws.com"
+  source_arn    = aws_cloudwatch_event_rule.job_compaction.arn
+}
@@ -0,0 +1,42 @@
+# packaging.tf
+
+# The zip-deployed handlers import sibling modules from dockercode/ (the same
+# files the worker images COPY). Each zip is built at plan time from the
+# handler and every module it imports, directly or not; boto3 comes with the
+# Lambda runtime. Keep these lists in step with the handlers' imports
+# (dockercode/tests/test_packaging.py checks them).
+
+locals {
+  handler_source_dir = "${path.module}/../dockercode"
+
+  handler_modules = {
+    start_job = [
+      "start_job_lambda", "admission", "job_coalescing", "job_lifecycle", "job_scheduler", "job_store",
+      "job_submission", "pre_router", "response_cache", "result_store", "startup", "tracing",
+    ]
+    start_interleaved_job = [
+      "start_interleaved_job_lambda", "admission", "job_coalescing", "job_lifecycle", "job_scheduler", "job_store",
+      "job_submission", "pre_router", "response_cache", "result_store", "startup", "tracing",
+    ]
+    get_status = [
+      "get_status_lambda", "change_feed", "job_lifecycle", "progress_stream", "result_store",
+    ]
+    list_jobs = [
+      "list_jobs_lambda", "job_lifecycle", "job_scheduler", "job_store", "result_store",
+    ]
+  }
+}
+
+data "archive_file" "handler" {
+  for_each    = local.handler_modules
+  type        = "zip"
+  output_path = "${path.module}/build/${each.key}.zip"
+
+  dynamic "source" {
+    for_each = toset(each.value)
+    content {
+      content  = file("${local.handler_source_dir}/${source.value}.py")
+      filename = "${source.value}.py"
+    }
+  }
+}
@@ -0,0 +1,77 @@
+# scheduler.tf
+
+# Periodic scheduler pump. Workers dispatch queued jobs whenever one of theirs
+# finishes; this catches what that misses, such as a slot that only frees up
+# when its lease expires after a crashed worker. It also delivers such a job
+# again: Lambda's own retries arrive while the lease still holds and are dropped.
+
+resource "aws_cloudwatch_event_rule" "scheduler_pump" {
+  name                = "agent-scheduler-pump-${random_string.suffix.result}"
+  schedule_expression = "rate(1 minute)"
+}
+
+resource "aws_cloudwatch_event_target" "standard_scheduler_pump" {
+  rule  = aws_cloudwatch_event_rule.scheduler_pump.name
+  arn   = aws_lambda_function.standard_agent_worker.arn
+  input = jsonencode({ schedulerPump = true })
+}
+
+resource "aws_cloudwatch_event_target" "interleaved_scheduler_pump" {
+  rule  = aws_cloudwatch_event_rule.scheduler_pump.name
+  arn   = aws_lambda_function.interleaved_agent_worker.arn
+  input = jsonencode({ schedulerPump = true })
+}
+
+resource "aws_lambda_permission" "standard_scheduler_pump" {
+  statement_id  = "AllowSchedulerPump"
+  action        = "lambda:InvokeFunction"
+  function_name = aws_lambda_function.standard_agent_worker.function_name
+  principal     = "events.amazonaws.com"
+  source_arn    = aws_cloudwatch_event_rule.scheduler_pump.arn
+}
+
+resource "aws_lambda_permission" "interleaved_scheduler_pump" {
+  statement_id  = "AllowSchedulerPump"
+  action        = "lambda:InvokeFunction"
+  function_name = aws_lambda_function.interleaved_agent_worker.function_name
+  principal     = "events.amazonaws.com"
+  source_arn    = aws_cloudwatch_event_rule.scheduler_pump.arn
+}
+
+# Delayed retries. In async-invoke mode a worker that hands jobs back (e.g. while
+# the model circuit is open) re-invokes itself through a one-time EventBridge
+# Scheduler schedule, created under this role (see job_batch.RetryScheduler).
+
+data "aws_iam_policy_document" "retry_scheduler_assume_role_policy" {
+  statement {
+    actions = ["sts:AssumeRole"]
+    principals {
+      type        = "Service"
+      identifiers = ["scheduler.amazonaws.com"]
+    }
+  }
+}
+
+resource "aws_iam_role" "retry_scheduler_role" {
+  name               = "${var.project_name}JobRetrySchedulerRole"
+  assume_role_policy = data.aws_iam_policy_document.retry_scheduler_assume_role_policy.json
+}
+
+resource "aws_iam_role_policy" "retry_scheduler_invoke" {
+  name = "InvokeAgentWorkers"
+  role = aws_iam_role.retry_scheduler_role.id
+
+  policy = jsonencode({
+    Version = "2012-10-17",
+    Statement = [
+      {
+        Effect   = "Allow",
+        Action   = ["lambda:InvokeFunction"],
+        Resource = [
+          aws_lambda_function.standard_agent_worker.arn,
+          aws_lambda_function.interleaved_agent_worker.arn
+        ]
+      }
+    ]
+  })
+}
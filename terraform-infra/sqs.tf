@@ -0,0 +1,37 @@
+# sqs.tf
+
+# Job queues drained by the worker lambdas in queue-consumer mode. The start
+# lambdas send to them when JOB_QUEUE_URL is set; otherwise they keep invoking
+# the workers directly.
+
+resource "aws_sqs_queue" "standard_job_queue" {
+  name                       = "standard-agent-jobs-${random_string.suffix.result}"
+  # Must exceed the worker timeout (900s) so in-flight messages aren't redelivered.
+  # Messages a worker hands back get a short retry delay instead (see job_batch.hand_back)
+  visibility_timeout_seconds = 5400
+  message_retention_seconds  = 86400
+}
+
+resource "aws_sqs_queue" "interleaved_job_queue" {
+  name                       = "interleaved-agent-jobs-${random_string.suffix.result}"
+  visibility_timeout_seconds = 5400
+  message_retention_seconds  = 86400
+}
+
+resource "aws_lambda_event_source_mapping" "standard_job_queue" {
+  event_source_arn                   = aws_sqs_queue.standard_job_queue.arn
+  function_name                      = aws_lambda_function.standard_agent_worker.function_name
+  batch_size                         = 10
+  maximum_batching_window_in_seconds = 5
+  # Unstarted and failed jobs are reported back individually (batchItemFailures),
+  # after the worker has set their messages' visibility timeout to the retry delay
+  function_response_types            = ["ReportBatchItemFailures"]
+}
+
+resource "aws_lambda_event_source_mapping" "interleaved_job_queue" {
+  event_source_arn                   = aws_sqs_queue.interleaved_job_queue.arn
+  function_name                      = aws_lambda_function.interleaved_agent_worker.function_name
+  batch_size                         = 10
+  maximum_batching_window_in_seconds = 5
+  function_response_types            = ["ReportBatchItemFailures"]
+}
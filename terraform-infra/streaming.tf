@@ -0,0 +1,59 @@
+# streaming.tf
+
+# The synchronous handlers with real response streaming (server-sent events).
+# Built from dockercode/Dockerfile.stream: the Lambda Web Adapter forwards each
+# request to response_stream.py and streams its events back as they are
+# produced. API Gateway's Lambda proxy integration buffers responses, so these
+# are served through function URLs in RESPONSE_STREAM mode. The URLs take
+# SigV4-signed requests (AWS_IAM); put CloudFront with origin access control
+# in front of them for browser clients.
+
+resource "aws_lambda_function" "standard_agent_stream" {
+  function_name = "StandardAgentStream-${random_string.suffix.result}"
+  role          = aws_iam_role.agent_orchestrator_role.arn
+  package_type  = "Image"
+  image_uri     = "${aws_ecr_repository.agent_stream_repo.repository_url}:latest"
+  timeout       = 900
+  memory_size   = 1024
+
+  image_config {
+    command = ["python", "response_stream.py", "lambda_function_standard"]
+  }
+
+  environment {
+    variables = {
+      AWS_LWA_INVOKE_MODE = "response_stream"
+    }
+  }
+}
+
+resource "aws_lambda_function" "interleaved_agent_stream" {
+  function_name = "InterleavedAgentStream-${random_string.suffix.result}"
+  role          = aws_iam_role.agent_orchestrator_role.arn
+  package_type  = "Image"
+  image_uri     = "${aws_ecr_repository.agent_stream_repo.repository_url}:latest"
+  timeout       = 900
+  memory_size   = 1024
+
+  image_config {
+    command = ["python", "response_stream.py", "lambda_function_interleaved"]
+  }
+
+  environment {
+    variables = {
+      AWS_LWA_INVOKE_MODE = "response_stream"
+    }
+  }
+}
+
+resource "aws_lambda_function_url" "standard_agent_stream" {
+  function_name      = aws_lambda_function.standard_agent_stream.function_name
+  authorization_type = "AWS_IAM"
+  invoke_mode        = "RESPONSE_STREAM"
+}
+
+resource "aws_lambda_function_url" "interleaved_agent_stream" {
+  function_name      = aws_lambda_function.interleaved_agent_stream.function_name
+  authorization_type = "AWS_IAM"
+  invoke_mode        = "RESPONSE_STREAM"
+}